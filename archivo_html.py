@@ -0,0 +1,86 @@
+"""
+Archivo local del HTML de las páginas de detalle
+
+Con SAO_ARCHIVO_HTML definido, los scrapers guardan el HTML de cada ficha de
+empresa que visitan en <directorio>/<id_empresa>.html.gz (la última versión
+de cada empresa). reproduccion.py vuelve a extraer los campos de ese archivo
+sin navegador, de modo que un cambio en el parser no obliga a repetir el
+scraping.
+"""
+import gzip
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from configuracion import obtener_directorio_html
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONES = (".html.gz", ".html")
+
+
+class ArchivoHTML:
+    """Directorio con el HTML comprimido de cada página de detalle"""
+
+    def __init__(self, directorio: str):
+        """
+        Inicializa el archivo, creando el directorio si no existe
+
+        Args:
+            directorio: Directorio donde se guardan las páginas
+        """
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    @classmethod
+    def desde_entorno(cls) -> Optional['ArchivoHTML']:
+        """Archivo en el directorio de SAO_ARCHIVO_HTML, o None si no se archiva"""
+        directorio = obtener_directorio_html()
+        return cls(directorio) if directorio else None
+
+    def guardar(self, id_empresa: str, html: str) -> None:
+        """
+        Guarda el HTML de la página de detalle de una empresa (escritura atómica)
+
+        Args:
+            id_empresa: ID de la empresa
+            html: Código fuente de la página
+        """
+        ruta = os.path.join(self.directorio, f"{id_empresa}.html.gz")
+        temporal = f"{ruta}.tmp"
+        try:
+            with gzip.open(temporal, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(html)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            logger.warning(f"No se pudo archivar el HTML de la empresa {id_empresa}: {e}")
+
+
+def paginas_archivo(directorio: str) -> List[Tuple[str, str]]:
+    """
+    Páginas de un archivo HTML
+
+    Args:
+        directorio: Directorio con <id_empresa>.html.gz o <id_empresa>.html
+
+    Returns:
+        List[Tuple[str, str]]: (id_empresa, ruta) ordenadas por id_empresa
+    """
+    paginas = {}
+    for ruta in Path(directorio).iterdir():
+        for extension in EXTENSIONES:
+            if ruta.name.endswith(extension):
+                paginas[ruta.name[:-len(extension)]] = str(ruta)
+                break
+    return sorted(paginas.items())
+
+
+def leer_pagina(ruta: str) -> str:
+    """HTML de una página del archivo, comprimida o no"""
+    if ruta.endswith(".gz"):
+        with gzip.open(ruta, 'rt', encoding='utf-8') as f:
+            return f.read()
+    with open(ruta, 'r', encoding='utf-8') as f:
+        return f.read()
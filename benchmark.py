@@ -0,0 +1,281 @@
+"""
+Benchmark de rendimiento de extremo a extremo de los scrapers contra el servidor simulado
+
+Cada motor se ejecuta en un proceso aparte y en un directorio temporal (los
+archivos de progreso no se comparten entre motores), contra un servidor
+simulado nuevo con las mismas empresas sintéticas. Se mide:
+
+- empresas por segundo y tiempo total
+- peticiones HTTP y comandos WebDriver por empresa
+- pico de memoria (RSS) del proceso y de su mayor proceso hijo (navegador)
+
+Uso:
+    python benchmark.py --empresas 100 --escala-esperas 0
+    python benchmark.py --motores paginacion localidades --comparar benchmarks/anterior.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from servidor_simulado import ServidorSAOSimulado
+
+
+DIRECTORIO_REPO = Path(__file__).resolve().parent
+
+# nombre -> (módulo, clase, método de entrada, argumentos, método de cierre)
+MOTORES = {
+    "scraper": ("scraper", "SAOScraper", "extraer_todas_empresas", {}, "cerrar_navegador"),
+    "paginacion": ("scraper_paginacion", "SAOScraperPaginacion", "procesar_todas_las_empresas", {}, "cerrar"),
+    "empresas_completo": ("scraper_empresas_completo", "SAOScraperEmpresasCompleto",
+                          "procesar_todas_las_empresas", {"max_empresas": None}, "cerrar"),
+    "continuar": ("scraper_continuar", "SAOScraperContinuar", "procesar_localidades",
+                  {"max_localidades": None}, "cerrar"),
+    "localidades": ("scraper_localidades", "SAOScraperLocalidades", "procesar_localidades",
+                    {"max_localidades": None}, "cerrar_navegador"),
+}
+
+MARCA_RESULTADO = "RESULTADO_BENCHMARK "
+
+
+def _rss_pico_mb() -> Optional[float]:
+    """
+    Pico de RSS del proceso actual y de su mayor hijo ya terminado
+
+    Returns:
+        Optional[float]: Megabytes, o None si la plataforma no lo permite (Windows)
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(max(propio, hijos) / divisor, 1)
+
+
+def ejecutar_motor(nombre: str) -> int:
+    """
+    Ejecuta un motor en el proceso actual y escribe sus medidas en stdout
+
+    Args:
+        nombre: Clave del motor en MOTORES
+
+    Returns:
+        int: Código de salida (0 si el motor terminó sin excepción)
+    """
+    from selenium.webdriver.remote.webdriver import WebDriver
+
+    comandos = Counter()
+    execute_original = WebDriver.execute
+
+    def execute_contado(self, driver_command, params=None):
+        comandos[driver_command] += 1
+        return execute_original(self, driver_command, params)
+
+    WebDriver.execute = execute_contado
+
+    modulo, clase, metodo, kwargs, cierre = MOTORES[nombre]
+    scraper = None
+    error = None
+    try:
+        Path("output").mkdir(exist_ok=True)
+        scraper = getattr(importlib.import_module(modulo), clase)(headless=True)
+        getattr(scraper, metodo)(**kwargs)
+    except Exception as e:
+        error = str(e)
+    finally:
+        if scraper:
+            try:
+                getattr(scraper, cierre)()
+            except Exception as e:
+                error = error or f"Error cerrando: {e}"
+
+    print(MARCA_RESULTADO + json.dumps({
+        "comandos_webdriver": sum(comandos.values()),
+        "comandos_por_tipo": dict(comandos.most_common()),
+        "rss_pico_mb": _rss_pico_mb(),
+        "rss_navegador_pico_mb": round(scraper.recursos.rss_pico / (1024 * 1024), 1)
+        if scraper and scraper.recursos.muestras else None,
+        "errores_scraper": getattr(scraper, "errores", None),
+        "metricas": scraper.tiempos.resumen() if scraper else None,
+        "error": error
+    }, ensure_ascii=False), flush=True)
+
+    return 0 if error is None else 1
+
+
+def medir_motor(nombre: str, args: argparse.Namespace) -> Dict:
+    """
+    Lanza un motor en un subproceso contra un servidor simulado nuevo
+
+    Args:
+        nombre: Clave del motor en MOTORES
+        args: Argumentos de línea de comandos
+
+    Returns:
+        Dict: Medidas del motor
+    """
+    with ServidorSAOSimulado(empresas=args.empresas, latencia=args.latencia, tasa_error=args.tasa_error,
+                             por_pagina=args.por_pagina, semilla=args.semilla) as servidor:
+        entorno = dict(os.environ)
+        entorno.update({
+            "SAO_BASE_URL": servidor.url,
+            "SAO_USUARIO": "benchmark",
+            "SAO_PASSWORD": "benchmark",
+            "SAO_ESCALA_ESPERAS": str(args.escala_esperas),
+            "SAO_MONITOR_INTERVALO": os.getenv("SAO_MONITOR_INTERVALO", "1"),
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(DIRECTORIO_REPO), entorno.get("PYTHONPATH")])),
+            "PYTHONIOENCODING": "utf-8",
+        })
+
+        with tempfile.TemporaryDirectory(prefix=f"bench_{nombre}_") as directorio:
+            inicio = time.perf_counter()
+            proceso = subprocess.run(
+                [sys.executable, str(DIRECTORIO_REPO / "benchmark.py"), "--ejecutar-motor", nombre],
+                cwd=directorio, env=entorno, capture_output=True, text=True, encoding="utf-8",
+                timeout=args.timeout
+            )
+            tiempo_total = time.perf_counter() - inicio
+
+        medidas = {}
+        for linea in proceso.stdout.splitlines():
+            if linea.startswith(MARCA_RESULTADO):
+                medidas = json.loads(linea[len(MARCA_RESULTADO):])
+        if not medidas:
+            medidas["error"] = (proceso.stderr.strip().splitlines() or ["Sin salida del motor"])[-1]
+
+        empresas = len(servidor.ids_detalle)
+        return {
+            "motor": nombre,
+            "codigo_salida": proceso.returncode,
+            "empresas": empresas,
+            "tiempo_total_s": round(tiempo_total, 2),
+            "empresas_por_segundo": round(empresas / tiempo_total, 3) if tiempo_total else 0.0,
+            "peticiones_http": servidor.peticiones,
+            "peticiones_http_por_empresa": round(servidor.peticiones / empresas, 2) if empresas else None,
+            "comandos_webdriver": medidas.get("comandos_webdriver"),
+            "comandos_webdriver_por_empresa": round(medidas["comandos_webdriver"] / empresas, 2)
+            if empresas and medidas.get("comandos_webdriver") is not None else None,
+            "logins": servidor.logins,
+            "rss_pico_mb": medidas.get("rss_pico_mb"),
+            "rss_navegador_pico_mb": medidas.get("rss_navegador_pico_mb"),
+            "errores_scraper": medidas.get("errores_scraper"),
+            "comandos_por_tipo": medidas.get("comandos_por_tipo"),
+            "metricas": medidas.get("metricas"),
+            "error": medidas.get("error")
+        }
+
+
+def _version_codigo() -> Optional[str]:
+    """Commit actual del repositorio, si está disponible"""
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRECTORIO_REPO,
+                                capture_output=True, text=True, timeout=10)
+        return salida.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def comparar(actual: List[Dict], archivo_anterior: str) -> List[str]:
+    """
+    Compara los resultados con los de una ejecución anterior
+
+    Args:
+        actual: Resultados de esta ejecución
+        archivo_anterior: JSON generado por una ejecución anterior
+
+    Returns:
+        List[str]: Una línea por motor presente en ambas ejecuciones
+    """
+    with open(archivo_anterior, 'r', encoding='utf-8') as f:
+        anteriores = {r["motor"]: r for r in json.load(f)["resultados"]}
+
+    lineas = []
+    for r in actual:
+        previo = anteriores.get(r["motor"])
+        if not previo or not previo["empresas_por_segundo"]:
+            continue
+        cambio = (r["empresas_por_segundo"] / previo["empresas_por_segundo"] - 1) * 100
+        lineas.append(f"{r['motor']:<18} {previo['empresas_por_segundo']:>8.3f} -> "
+                      f"{r['empresas_por_segundo']:>8.3f} empresas/s ({cambio:+.1f}%)")
+    return lineas
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Benchmark de los scrapers contra el servidor simulado")
+    parser.add_argument("--motores", nargs="+", choices=list(MOTORES), default=list(MOTORES))
+    parser.add_argument("--empresas", type=int, default=100, help="Empresas sintéticas del servidor")
+    parser.add_argument("--por-pagina", type=int, default=50, help="Empresas por página del listado")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de retardo por petición")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de error 500 (0-1)")
+    parser.add_argument("--escala-esperas", type=float, default=1.0,
+                        help="Factor aplicado a las esperas fijas de los scrapers (0 para eliminarlas)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=3600, help="Segundos máximos por motor")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/)")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--ejecutar-motor", choices=list(MOTORES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.ejecutar_motor:
+        return ejecutar_motor(args.ejecutar_motor)
+
+    resultados = []
+    for nombre in args.motores:
+        print(f"⏱️  {nombre}...", flush=True)
+        try:
+            resultado = medir_motor(nombre, args)
+        except subprocess.TimeoutExpired:
+            resultado = {"motor": nombre, "empresas": 0, "empresas_por_segundo": 0.0,
+                         "error": f"Superado el timeout de {args.timeout}s"}
+        resultados.append(resultado)
+        if resultado.get("error"):
+            print(f"   ❌ {resultado['error']}")
+        print(f"   {resultado['empresas']} empresas, {resultado['empresas_por_segundo']} empresas/s, "
+              f"{resultado.get('peticiones_http_por_empresa')} peticiones/empresa, "
+              f"{resultado.get('comandos_webdriver_por_empresa')} comandos/empresa, "
+              f"RSS {resultado.get('rss_pico_mb')} MB")
+
+    salida = args.salida
+    if not salida:
+        Path("benchmarks").mkdir(exist_ok=True)
+        salida = f"benchmarks/benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({
+            "metadata": {
+                "timestamp": datetime.now().isoformat(),
+                "version": _version_codigo(),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "parametros": {k: v for k, v in vars(args).items()
+                               if k not in ("salida", "comparar", "ejecutar_motor")}
+            },
+            "resultados": resultados
+        }, f, ensure_ascii=False, indent=2)
+    print(f"💾 Resultados en {salida}")
+
+    if args.comparar:
+        print("\nComparación con", args.comparar)
+        for linea in comparar(resultados, args.comparar):
+            print("  " + linea)
+
+    return 0 if all(not r.get("error") for r in resultados) else 1
+
+
+if __name__ == "__main__":
+    exit(main())
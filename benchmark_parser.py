@@ -0,0 +1,461 @@
+"""
+Micro-benchmark y corpus de regresión de los parsers de las páginas de detalle y de listado
+
+Comprobación (sin navegador): cada página de detalle de corpus/ se lee con
+LectorTablaDetalle y se extrae con secciones_desde_filas + ExtractorDetalle,
+la misma ruta que usa reproduccion.py sobre el archivo HTML, y el resultado se
+compara campo a campo con corpus/esperado.json. Cualquier diferencia termina
+con error.
+
+Con --webdriver, además, cada página se carga una vez en un Firefox headless y
+sobre ella se cronometra cada ruta de extracción de los scrapers:
+
+Detalle (los 13 campos de EmpresaCompleta):
+- esquema: ExtractorDetalle (esquema_detalle.py), una llamada execute_script
+  por página y un mapa de índices por disposición de encabezados; es la ruta
+  que usan todos los scrapers
+- subcadena, exacta, posicional: rutas anteriores de _extraer_campo (varias
+  consultas WebDriver por campo), conservadas aquí como referencia
+
+Listado:
+- elementos: una consulta WebDriver por fila y celda (SAOScraperEmpresasCompleto)
+- script: una sola llamada execute_script (BuscadorLocalidad)
+
+El número de aciertos de cada ruta se compara con corpus/referencia.json: si
+una ruta acierta menos campos que en la referencia, el benchmark termina con
+error. La referencia se genera con --actualizar-referencia en una máquina con
+Firefox; mientras no exista, solo se informa de los aciertos.
+
+Uso:
+    python benchmark_parser.py
+    python benchmark_parser.py --webdriver --repeticiones 10
+    python benchmark_parser.py --webdriver --actualizar-referencia
+    python benchmark_parser.py --regenerar-corpus
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Tuple
+
+from esquema_detalle import ExtractorDetalle
+from reproduccion import extraer_de_html
+from servidor_simulado import generar_empresas, renderizar_detalle, renderizar_listado
+
+
+DIRECTORIO_CORPUS = Path(__file__).resolve().parent / "corpus"
+
+# (atributo de EmpresaCompleta, nombre con el que lo buscan los scrapers)
+CAMPOS_DETALLE = [
+    ("cif", "CIF"),
+    ("nombre", "Nombre"),
+    ("direccion", "Dirección"),
+    ("provincia", "Provincia"),
+    ("localidad", "Localidad"),
+    ("cp", "CP"),
+    ("telefono", "Teléfono"),
+    ("fax", "Fax"),
+    ("actividad", "Actividad"),
+    ("nombre_gerente", "Nombre de gerente"),
+    ("nif_gerente", "NIF gerente"),
+    ("email", "E-mail"),
+    ("tipo", "Tipo"),
+]
+
+logger = logging.getLogger("benchmark_parser")
+
+
+# Posición de cada campo en la primera sección, usada por las rutas anteriores
+MAPEO_CAMPOS_POSICION = {
+    "cif": 0,
+    "nombre": 1,
+    "direccion": 3,
+    "provincia": 4,
+    "localidad": 5,
+    "cp": 6
+}
+
+
+def _extraer_campo_subcadena(contexto, nombre_campo: str) -> str:
+    """Ruta anterior de SAOScraper y SAOScraperLocalidades: encabezado que contiene el nombre"""
+    from selenium.webdriver.common.by import By
+
+    try:
+        tabla = contexto.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
+        filas = tabla.find_elements(By.TAG_NAME, "tr")
+
+        if len(filas) >= 2:
+            encabezados = filas[0].find_elements(By.TAG_NAME, "th")
+            valores = filas[1].find_elements(By.TAG_NAME, "td")
+            for i, encabezado in enumerate(encabezados):
+                if nombre_campo.lower() in encabezado.text.lower():
+                    if i < len(valores):
+                        return valores[i].text.strip()
+                    break
+
+            posicion = MAPEO_CAMPOS_POSICION.get(nombre_campo.lower())
+            if posicion is not None and posicion < len(valores):
+                return valores[posicion].text.strip()
+
+        if len(filas) >= 4:
+            encabezados = filas[2].find_elements(By.TAG_NAME, "th")
+            valores = filas[3].find_elements(By.TAG_NAME, "td")
+            for i, encabezado in enumerate(encabezados):
+                if nombre_campo.lower() in encabezado.text.lower():
+                    if i < len(valores):
+                        return valores[i].text.strip()
+                    break
+
+        return ""
+    except Exception as e:
+        contexto.logger.warning(f"Error extrayendo campo '{nombre_campo}': {e}")
+        return ""
+
+
+def _extraer_campo_exacta(contexto, nombre_campo: str) -> str:
+    """Ruta anterior de SAOScraperPaginacion, SAOScraperContinuar y SAOScraperEmpresasCompleto"""
+    from selenium.webdriver.common.by import By
+
+    try:
+        tabla = contexto.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
+        filas = tabla.find_elements(By.TAG_NAME, "tr")
+        if len(filas) >= 2:
+            encabezados = filas[0].find_elements(By.TAG_NAME, "th")
+            valores = filas[1].find_elements(By.TAG_NAME, "td")
+            for i, encabezado in enumerate(encabezados):
+                if encabezado.text.strip() == nombre_campo and i < len(valores):
+                    return valores[i].text.strip()
+        return ""
+    except Exception as e:
+        contexto.logger.warning(f"Error extrayendo campo {nombre_campo}: {e}")
+        return ""
+
+
+def _extraer_campo_posicional(contexto, nombre_campo: str) -> str:
+    """Ruta anterior de respaldo por posición, aislada"""
+    from selenium.webdriver.common.by import By
+
+    try:
+        posicion = MAPEO_CAMPOS_POSICION.get(nombre_campo.lower())
+        if posicion is None:
+            return ""
+        tabla = contexto.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
+        valores = tabla.find_elements(By.TAG_NAME, "tr")[1].find_elements(By.TAG_NAME, "td")
+        return valores[posicion].text.strip() if posicion < len(valores) else ""
+    except Exception as e:
+        contexto.logger.warning(f"Error extrayendo campo '{nombre_campo}': {e}")
+        return ""
+
+
+def _por_campo(extraer_campo: Callable) -> Callable:
+    """Convierte una ruta campo a campo en una función (contexto) -> valores de la página"""
+    return lambda contexto: {campo: extraer_campo(contexto, etiqueta) for campo, etiqueta in CAMPOS_DETALLE}
+
+
+def rutas_detalle() -> Dict[str, Callable]:
+    """Funciones (contexto) -> {atributo: valor} de cada ruta de extracción del detalle"""
+    extractor = ExtractorDetalle()
+
+    return {
+        "esquema": lambda contexto: extractor.extraer_de_driver(contexto.driver),
+        "subcadena": _por_campo(_extraer_campo_subcadena),
+        "exacta": _por_campo(_extraer_campo_exacta),
+        "posicional": _por_campo(_extraer_campo_posicional),
+    }
+
+
+def rutas_listado() -> Dict[str, Callable]:
+    """Funciones (contexto) -> filas de cada ruta de extracción del listado"""
+    from scraper_empresas_completo import SAOScraperEmpresasCompleto
+    from filtro_localidad import BuscadorLocalidad
+
+    return {
+        "elementos": SAOScraperEmpresasCompleto._extraer_filas_pagina,
+        "script": lambda contexto: BuscadorLocalidad._leer_filas(contexto.driver),
+    }
+
+
+def generar_corpus(directorio: Path = DIRECTORIO_CORPUS) -> None:
+    """
+    Escribe las páginas del corpus y sus valores esperados
+
+    Las páginas parten del marcado del servidor simulado, con variantes que
+    reproducen casos difíciles: campos vacíos, espacios y entidades HTML,
+    encabezados con otros nombres y filas irregulares en el listado.
+
+    Args:
+        directorio: Directorio del corpus
+    """
+    (directorio / "detalle").mkdir(parents=True, exist_ok=True)
+    (directorio / "listado").mkdir(parents=True, exist_ok=True)
+    empresas = generar_empresas(60, semilla=33)
+    esperado = {"detalle": {}, "listado": {}}
+
+    def detalle(nombre: str, empresa: Dict, html: str) -> None:
+        (directorio / "detalle" / nombre).write_text(html, encoding="utf-8")
+        esperado["detalle"][nombre] = {campo: empresa[campo] for campo, _ in CAMPOS_DETALLE}
+
+    detalle("estandar.html", empresas[0], renderizar_detalle(empresas[0]))
+
+    vacia = dict(empresas[1], fax="", email="", nombre_gerente="", nif_gerente="")
+    detalle("campos_vacios.html", vacia, renderizar_detalle(vacia))
+
+    con_entidades = dict(empresas[2], nombre="Turia & Llorens <Serveis> S.L.", direccion="Av. del Port, 12 - 3º")
+    html = renderizar_detalle(con_entidades)
+    html = html.replace("<td>", "<td>\n      ").replace("</td>", "\n    </td>").replace("<th>", "<th> ")
+    detalle("espacios_entidades.html", con_entidades, html)
+
+    html = renderizar_detalle(empresas[3])
+    for original, alternativo in [("<th>CIF</th>", "<th>C.I.F.</th>"), ("<th>Nombre</th>", "<th>Razón social</th>"),
+                                  ("<th>Dirección</th>", "<th>Domicilio</th>"),
+                                  ("<th>Localidad</th>", "<th>Municipio</th>"), ("<th>CP</th>", "<th>Código postal</th>")]:
+        html = html.replace(original, alternativo, 1)
+    detalle("cabeceras_alternativas.html", empresas[3], html)
+
+    def listado(nombre: str, filas: List[Dict], html: str) -> None:
+        (directorio / "listado" / nombre).write_text(html, encoding="utf-8")
+        esperado["listado"][nombre] = [[f["id_empresa"], f["nombre"], f["localidad"]] for f in filas]
+
+    parametros = {"orden": "localidad", "sentido": "asc"}
+    ordenadas = sorted(empresas, key=lambda e: (e["localidad"], e["id_empresa"]))
+    listado("estandar.html", ordenadas[:25], renderizar_listado(ordenadas[:25], 1, 3, parametros))
+
+    html = renderizar_listado(ordenadas[25:50], 2, 3, parametros)
+    sin_enlace = (f"<tr><td>—</td><td>Empresa dada de baja</td><td></td><td></td><td></td>"
+                  f"<td></td><td>{ordenadas[30]['localidad']}</td><td></td></tr>")
+    separador = f"<tr><td colspan=\"8\">{ordenadas[40]['localidad']}</td></tr>"
+    fila_30 = html.index(f"idEmpresa={ordenadas[30]['id_empresa']}\"")
+    fila_30 = html.rindex("<tr>", 0, fila_30)
+    html = html[:fila_30] + sin_enlace + html[fila_30:]
+    fila_40 = html.rindex("<tr>", 0, html.index(f"idEmpresa={ordenadas[40]['id_empresa']}\""))
+    html = html[:fila_40] + separador + html[fila_40:]
+    listado("filas_irregulares.html", ordenadas[25:50], html)
+
+    with open(directorio / "esperado.json", 'w', encoding='utf-8') as f:
+        json.dump(esperado, f, ensure_ascii=False, indent=2)
+
+
+def comprobar_detalle(directorio: Path) -> List[str]:
+    """
+    Compara la extracción sin navegador de las páginas de detalle con los valores esperados
+
+    Args:
+        directorio: Directorio del corpus
+
+    Returns:
+        List[str]: Diferencias encontradas (vacía si todo coincide)
+    """
+    with open(directorio / "esperado.json", 'r', encoding='utf-8') as f:
+        esperado = json.load(f)
+
+    extractor = ExtractorDetalle()
+    diferencias = []
+    for pagina, campos_esperados in esperado["detalle"].items():
+        try:
+            html = (directorio / "detalle" / pagina).read_text(encoding="utf-8")
+            extraidos = extraer_de_html(html, extractor)
+        except (OSError, ValueError) as e:
+            diferencias.append(f"detalle/{pagina}: {e}")
+            continue
+        for campo, valor in campos_esperados.items():
+            if extraidos.get(campo) != valor:
+                diferencias.append(f"detalle/{pagina} [{campo}]: esperado {valor!r}, "
+                                   f"extraído {extraidos.get(campo)!r}")
+    return diferencias
+
+
+def crear_driver(espera_implicita: float):
+    """
+    Firefox headless con la misma configuración básica que los scrapers
+
+    Args:
+        espera_implicita: Segundos de espera implícita (los scrapers usan 10)
+    """
+    from selenium import webdriver
+    from selenium.webdriver.firefox.options import Options
+    from selenium.webdriver.firefox.service import Service as FirefoxService
+    from webdriver_manager.firefox import GeckoDriverManager
+
+    opciones = Options()
+    opciones.add_argument("--headless")
+    driver = webdriver.Firefox(service=FirefoxService(GeckoDriverManager().install()), options=opciones)
+    driver.implicitly_wait(espera_implicita)
+    return driver
+
+
+def _cronometrar(driver, funcion: Callable, repeticiones: int) -> Tuple[object, Dict]:
+    """
+    Ejecuta una ruta de extracción varias veces sobre la página cargada
+
+    Returns:
+        Tuple[object, Dict]: Resultado de la primera ejecución y medidas
+        (mediana y mínimo en ms, comandos WebDriver por ejecución)
+    """
+    comandos = [0]
+    execute_original = driver.execute
+
+    def execute_contado(driver_command, params=None):
+        comandos[0] += 1
+        return execute_original(driver_command, params)
+
+    driver.execute = execute_contado
+    try:
+        resultado = None
+        duraciones = []
+        for i in range(repeticiones):
+            comandos[0] = 0
+            inicio = time.perf_counter()
+            valor = funcion()
+            duraciones.append((time.perf_counter() - inicio) * 1000)
+            if i == 0:
+                resultado = valor
+    finally:
+        driver.execute = execute_original
+
+    return resultado, {
+        "mediana_ms": round(statistics.median(duraciones), 3),
+        "minimo_ms": round(min(duraciones), 3),
+        "comandos_webdriver": comandos[0]
+    }
+
+
+def ejecutar(directorio: Path, repeticiones: int, espera_implicita: float) -> Dict:
+    """
+    Cronometra y valida cada ruta sobre todas las páginas del corpus
+
+    Returns:
+        Dict: {'detalle': {pagina: {ruta: medidas}}, 'listado': {...}}
+    """
+    with open(directorio / "esperado.json", 'r', encoding='utf-8') as f:
+        esperado = json.load(f)
+
+    driver = crear_driver(espera_implicita)
+    contexto = SimpleNamespace(driver=driver, logger=logger)
+    resultados = {"detalle": {}, "listado": {}}
+
+    # Una sola instancia por ruta para todo el corpus, como en un scraping real
+    detalle = rutas_detalle()
+
+    try:
+        for pagina, campos_esperados in esperado["detalle"].items():
+            driver.get((directorio / "detalle" / pagina).resolve().as_uri())
+            resultados["detalle"][pagina] = {}
+            for ruta, extraer_pagina in detalle.items():
+                extraidos, medidas = _cronometrar(driver, lambda: extraer_pagina(contexto), repeticiones)
+                fallos = {campo: {"esperado": valor, "extraido": extraidos[campo]}
+                          for campo, valor in campos_esperados.items() if extraidos[campo] != valor}
+                medidas.update({"aciertos": len(campos_esperados) - len(fallos), "total": len(campos_esperados),
+                                "fallos": fallos})
+                resultados["detalle"][pagina][ruta] = medidas
+
+        for pagina, filas_esperadas in esperado["listado"].items():
+            driver.get((directorio / "listado" / pagina).resolve().as_uri())
+            resultados["listado"][pagina] = {}
+            esperadas = {tuple(f) for f in filas_esperadas}
+            for ruta, extraer_filas in rutas_listado().items():
+                filas, medidas = _cronometrar(driver, lambda: extraer_filas(contexto), repeticiones)
+                obtenidas = {(f["id_empresa"], f["nombre"], f["localidad"]) for f in filas}
+                medidas.update({"aciertos": len(esperadas & obtenidas), "total": len(esperadas),
+                                "sobrantes": sorted(obtenidas - esperadas)})
+                resultados["listado"][pagina][ruta] = medidas
+    finally:
+        driver.quit()
+
+    return resultados
+
+
+def comprobar_referencia(resultados: Dict, referencia: Dict) -> List[str]:
+    """
+    Compara los aciertos de cada ruta con la referencia guardada
+
+    Returns:
+        List[str]: Regresiones encontradas (vacía si no hay ninguna)
+    """
+    regresiones = []
+    for tipo, paginas in resultados.items():
+        for pagina, rutas in paginas.items():
+            for ruta, medidas in rutas.items():
+                minimo = referencia.get(tipo, {}).get(pagina, {}).get(ruta)
+                if minimo is not None and medidas["aciertos"] < minimo:
+                    regresiones.append(f"{tipo}/{pagina} [{ruta}]: {medidas['aciertos']} aciertos, "
+                                       f"la referencia es {minimo}")
+    return regresiones
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Micro-benchmark de los parsers de detalle y listado")
+    parser.add_argument("--corpus", default=str(DIRECTORIO_CORPUS), help="Directorio del corpus")
+    parser.add_argument("--webdriver", action="store_true",
+                        help="Cronometrar también las rutas WebDriver en un Firefox headless")
+    parser.add_argument("--repeticiones", type=int, default=5, help="Ejecuciones de cada ruta por página")
+    parser.add_argument("--espera-implicita", type=float, default=0.0,
+                        help="Espera implícita de WebDriver en segundos (los scrapers usan 10)")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto en benchmarks/)")
+    parser.add_argument("--regenerar-corpus", action="store_true", help="Reescribir las páginas del corpus")
+    parser.add_argument("--actualizar-referencia", action="store_true",
+                        help="Guardar los aciertos de esta ejecución como referencia (implica --webdriver)")
+    args = parser.parse_args()
+
+    directorio = Path(args.corpus)
+    if args.regenerar_corpus:
+        generar_corpus(directorio)
+        print(f"📁 Corpus regenerado en {directorio}")
+        return 0
+
+    diferencias = comprobar_detalle(directorio)
+    for diferencia in diferencias:
+        print(f"❌ {diferencia}")
+    if not diferencias:
+        print("✅ Las páginas de detalle del corpus coinciden con esperado.json")
+
+    if not (args.webdriver or args.actualizar_referencia):
+        return 1 if diferencias else 0
+
+    resultados = ejecutar(directorio, max(1, args.repeticiones), args.espera_implicita)
+
+    for tipo, paginas in resultados.items():
+        print(f"\n{tipo:<10} {'página':<28} {'ruta':<12} {'mediana ms':>11} {'comandos':>9} {'aciertos':>9}")
+        for pagina, rutas in paginas.items():
+            for ruta, m in rutas.items():
+                print(f"{'':<10} {pagina:<28} {ruta:<12} {m['mediana_ms']:>11.2f} "
+                      f"{m['comandos_webdriver']:>9} {m['aciertos']:>5}/{m['total']:<3}")
+
+    salida = args.salida
+    if not salida:
+        Path("benchmarks").mkdir(exist_ok=True)
+        salida = f"benchmarks/parser_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump({"timestamp": datetime.now().isoformat(), "repeticiones": args.repeticiones,
+                   "resultados": resultados}, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 Resultados en {salida}")
+
+    archivo_referencia = directorio / "referencia.json"
+    if args.actualizar_referencia:
+        referencia = {tipo: {pagina: {ruta: m["aciertos"] for ruta, m in rutas.items()}
+                             for pagina, rutas in paginas.items()}
+                      for tipo, paginas in resultados.items()}
+        with open(archivo_referencia, 'w', encoding='utf-8') as f:
+            json.dump(referencia, f, ensure_ascii=False, indent=2)
+        print(f"📌 Referencia actualizada en {archivo_referencia}")
+        return 1 if diferencias else 0
+
+    if not archivo_referencia.exists():
+        print(f"⚠️  No hay referencia en {archivo_referencia}: no se comprueban regresiones "
+              f"(genérala con --actualizar-referencia)")
+        return 1 if diferencias else 0
+    with open(archivo_referencia, 'r', encoding='utf-8') as f:
+        referencia = json.load(f)
+
+    regresiones = comprobar_referencia(resultados, referencia)
+    for regresion in regresiones:
+        print(f"❌ {regresion}")
+    return 1 if diferencias or regresiones else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,401 @@
+"""
+Catálogo consultable de empresas con índices secundarios persistentes
+
+Las empresas se guardan en catalogo/empresas.jsonl, un archivo de solo
+añadido con una línea por versión de cada empresa; catalogo/indices.json
+guarda la posición de la versión vigente de cada id_empresa y los índices
+secundarios (valor normalizado -> ids) de localidad, provincia, CP, tipo,
+actividad y de si tienen email o teléfono. Una consulta interseca los
+índices y solo lee del archivo las empresas que cumplen los filtros, sin
+recorrer output/ ni el catálogo entero.
+
+Los scrapers añaden al catálogo cada lote de empresas que guardan, y el
+catálogo se puede rellenar desde archivos de salida ya generados. Al indexar
+cada versión se actualizan también las estadísticas agregadas
+(catalogo/estadisticas.json, ver estadisticas.py).
+
+Uso:
+    python catalogo.py --importar output/
+    python catalogo.py --provincia Valencia --actividad software --con-email
+    python catalogo.py --cp 46 --orden nombre --campos id_empresa,nombre,email --formato csv
+"""
+import argparse
+import bisect
+import csv
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from dataclasses import fields
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from esquema_detalle import normalizar_etiqueta
+from estadisticas import EstadisticasCatalogo
+from lectura_salida import iterar_empresas, rutas_snapshot
+from models import CAMPOS_VOLATILES, EmpresaCompleta
+
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_EMPRESA = [c.name for c in fields(EmpresaCompleta)]
+# Campos con índice por valor normalizado (sin acentos ni mayúsculas)
+CAMPOS_INDEXADOS = ("localidad", "provincia", "tipo", "actividad")
+# Índices de empresas que tienen el campo relleno
+CAMPOS_PRESENCIA = ("email", "telefono")
+
+
+def clave(valor: str) -> str:
+    """Valor normalizado de un campo indexado"""
+    return normalizar_etiqueta(valor)
+
+
+class Catalogo:
+    """Almacén JSONL de empresas con índices secundarios"""
+
+    def __init__(self, directorio: str = "catalogo"):
+        """
+        Abre el catálogo, creándolo si no existe
+
+        Args:
+            directorio: Directorio con empresas.jsonl e indices.json
+        """
+        self.directorio = directorio
+        self.archivo_datos = os.path.join(directorio, "empresas.jsonl")
+        self.archivo_indices = os.path.join(directorio, "indices.json")
+        self.archivo_estadisticas = os.path.join(directorio, "estadisticas.json")
+
+        # id_empresa -> [posición, longitud, hash del contenido] de la versión vigente
+        self.posiciones: Dict[str, list] = {}
+        # campo -> valor normalizado -> ids
+        self.indices: Dict[str, Dict[str, Set[str]]] = {}
+        # campo -> ids con el campo relleno
+        self.presencia: Dict[str, Set[str]] = {}
+        # Bytes de empresas.jsonl que reflejan los índices
+        self.tamano = 0
+        # Contadores agregados de las versiones vigentes
+        self.estadisticas = EstadisticasCatalogo()
+        self._vaciar()
+
+        self._cps_ordenados: Optional[List[str]] = None
+        self._modificado = False
+
+        os.makedirs(directorio, exist_ok=True)
+        self._cargar()
+
+    def _cargar(self) -> None:
+        """Carga los índices y añade las líneas escritas después del último guardado"""
+        if os.path.exists(self.archivo_indices):
+            try:
+                with open(self.archivo_indices, 'r', encoding='utf-8') as f:
+                    datos = json.load(f)
+                self.posiciones = datos["posiciones"]
+                for campo, valores in datos["indices"].items():
+                    self.indices[campo] = defaultdict(set, {v: set(ids) for v, ids in valores.items()})
+                self.presencia = {c: set(ids) for c, ids in datos["presencia"].items()}
+                self.tamano = datos["tamano"]
+            except Exception as e:
+                logger.warning(f"Error cargando los índices del catálogo, se reconstruyen: {e}")
+                self._vaciar()
+        if self.posiciones:
+            self._cargar_estadisticas()
+
+        if os.path.exists(self.archivo_datos) and os.path.getsize(self.archivo_datos) > self.tamano:
+            self._recuperar_cola()
+
+    def _cargar_estadisticas(self) -> None:
+        """Carga las estadísticas guardadas, o las recalcula si no corresponden a los índices"""
+        try:
+            with open(self.archivo_estadisticas, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get("tamano") == self.tamano:
+                self.estadisticas = EstadisticasCatalogo.from_dict(datos)
+                return
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Error cargando las estadísticas del catálogo: {e}")
+
+        logger.info("Recalculando las estadísticas del catálogo")
+        self.estadisticas = EstadisticasCatalogo()
+        for empresa in self.leer_varias(self.posiciones):
+            self.estadisticas.sumar(empresa)
+        self._modificado = True
+
+    def _vaciar(self) -> None:
+        """Deja los índices vacíos, que se reconstruyen desde el principio del archivo"""
+        self.posiciones = {}
+        self.indices = {c: defaultdict(set) for c in CAMPOS_INDEXADOS + ("cp",)}
+        self.presencia = {c: set() for c in CAMPOS_PRESENCIA}
+        self.tamano = 0
+        self.estadisticas = EstadisticasCatalogo()
+
+    def _recuperar_cola(self) -> None:
+        """Indexa las líneas que no llegaron a los índices (cierre antes de guardar)"""
+        with open(self.archivo_datos, 'rb+') as f:
+            f.seek(self.tamano)
+            posicion = self.tamano
+            for linea in f:
+                try:
+                    empresa = EmpresaCompleta.from_dict(json.loads(linea.decode('utf-8')))
+                except (ValueError, TypeError, UnicodeDecodeError):
+                    # Última línea a medio escribir
+                    logger.warning("Línea incompleta al final del catálogo descartada")
+                    f.truncate(posicion)
+                    break
+                self._indexar(empresa, posicion, len(linea))
+                posicion += len(linea)
+            self.tamano = posicion
+        self._modificado = True
+
+    def _indexar(self, empresa: EmpresaCompleta, posicion: int, longitud: int) -> None:
+        """Apunta la versión de la empresa escrita en posicion y actualiza los índices"""
+        id_empresa = empresa.id_empresa
+        if id_empresa in self.posiciones:
+            self._desindexar(self.leer(id_empresa))
+        self.posiciones[id_empresa] = [posicion, longitud, empresa.hash_contenido(CAMPOS_VOLATILES)]
+
+        for campo in CAMPOS_INDEXADOS:
+            self.indices[campo][clave(getattr(empresa, campo))].add(id_empresa)
+        self.indices["cp"][empresa.cp].add(id_empresa)
+        self._cps_ordenados = None
+        for campo in CAMPOS_PRESENCIA:
+            if getattr(empresa, campo):
+                self.presencia[campo].add(id_empresa)
+        self.estadisticas.sumar(empresa)
+
+    def _desindexar(self, empresa: EmpresaCompleta) -> None:
+        """Quita la versión anterior de una empresa de los índices"""
+        valores = {campo: clave(getattr(empresa, campo)) for campo in CAMPOS_INDEXADOS}
+        valores["cp"] = empresa.cp
+        for campo, valor in valores.items():
+            ids = self.indices[campo].get(valor)
+            if ids is not None:
+                ids.discard(empresa.id_empresa)
+                if not ids:
+                    del self.indices[campo][valor]
+                    self._cps_ordenados = None
+        for campo in CAMPOS_PRESENCIA:
+            self.presencia[campo].discard(empresa.id_empresa)
+        self.estadisticas.restar(empresa)
+
+    def agregar_varias(self, empresas: Iterable[EmpresaCompleta]) -> int:
+        """
+        Añade las empresas nuevas o cambiadas al catálogo
+
+        Args:
+            empresas: Empresas a añadir; las que no han cambiado (sin contar CAMPOS_VOLATILES) no se escriben
+
+        Returns:
+            int: Empresas escritas
+        """
+        escritas = 0
+        with open(self.archivo_datos, 'ab') as f:
+            for empresa in empresas:
+                actual = self.posiciones.get(empresa.id_empresa)
+                if actual is not None and actual[2] == empresa.hash_contenido(CAMPOS_VOLATILES):
+                    continue
+                if actual is not None:
+                    # _indexar lee la versión anterior, que puede estar aún en el búfer
+                    f.flush()
+                linea = (json.dumps(empresa.to_dict(), ensure_ascii=False) + "\n").encode('utf-8')
+                f.write(linea)
+                self._indexar(empresa, self.tamano, len(linea))
+                self.tamano += len(linea)
+                escritas += 1
+        if escritas:
+            self._modificado = True
+        return escritas
+
+    def guardar(self) -> None:
+        """Escribe los índices y las estadísticas si han cambiado (escritura atómica)"""
+        if not self._modificado:
+            return
+        self.estadisticas.guardar(self.archivo_estadisticas, self.tamano)
+        datos = {
+            "tamano": self.tamano,
+            "posiciones": self.posiciones,
+            "indices": {campo: {v: sorted(ids) for v, ids in valores.items()}
+                        for campo, valores in self.indices.items()},
+            "presencia": {campo: sorted(ids) for campo, ids in self.presencia.items()}
+        }
+        temporal = f"{self.archivo_indices}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporal, self.archivo_indices)
+        self._modificado = False
+
+    def leer(self, id_empresa: str) -> EmpresaCompleta:
+        """Versión vigente de una empresa, leída directamente de su posición en el archivo"""
+        return next(self.leer_varias([id_empresa]))
+
+    def leer_varias(self, ids: Iterable[str]) -> Iterator[EmpresaCompleta]:
+        """
+        Versiones vigentes de varias empresas, en orden de posición en el archivo
+
+        Args:
+            ids: id_empresa a leer (deben estar en el catálogo)
+        """
+        with open(self.archivo_datos, 'rb') as f:
+            for posicion, longitud, _ in sorted(self.posiciones[i] for i in ids):
+                f.seek(posicion)
+                yield EmpresaCompleta.from_dict(json.loads(f.read(longitud).decode('utf-8')))
+
+    def _ids_valor(self, campo: str, valor: str, parcial: bool = False) -> Set[str]:
+        """ids con el valor normalizado en el campo (o que lo contienen, si parcial)"""
+        buscado = clave(valor)
+        if not parcial:
+            return set(self.indices[campo].get(buscado, ()))
+        ids: Set[str] = set()
+        # Se recorren los valores distintos del índice, no las empresas
+        for clave_indice, ids_valor in self.indices[campo].items():
+            if buscado in clave_indice:
+                ids |= ids_valor
+        return ids
+
+    def _ids_cp(self, prefijo: str) -> Set[str]:
+        """ids cuyo CP empieza por el prefijo"""
+        if self._cps_ordenados is None:
+            self._cps_ordenados = sorted(self.indices["cp"])
+        inicio = bisect.bisect_left(self._cps_ordenados, prefijo)
+        ids: Set[str] = set()
+        for cp in self._cps_ordenados[inicio:]:
+            if not cp.startswith(prefijo):
+                break
+            ids |= self.indices["cp"][cp]
+        return ids
+
+    def consultar(self, localidad: Optional[str] = None, provincia: Optional[str] = None,
+                  cp: Optional[str] = None, tipo: Optional[str] = None, actividad: Optional[str] = None,
+                  con_email: bool = False, con_telefono: bool = False,
+                  orden: Optional[str] = None, descendente: bool = False) -> Iterator[EmpresaCompleta]:
+        """
+        Empresas que cumplen todos los filtros indicados
+
+        Args:
+            localidad: Localidad (sin distinguir acentos ni mayúsculas)
+            provincia: Provincia
+            cp: Prefijo del código postal ('46', '460', '46001')
+            tipo: Tipo de empresa
+            actividad: Texto contenido en la actividad
+            con_email: Solo empresas con email
+            con_telefono: Solo empresas con teléfono
+            orden: Campo por el que ordenar (sin orden, se devuelven según están en el archivo)
+            descendente: Orden descendente
+
+        Yields:
+            EmpresaCompleta: Empresas que cumplen los filtros
+        """
+        conjuntos: List[Set[str]] = []
+        if localidad:
+            conjuntos.append(self._ids_valor("localidad", localidad))
+        if provincia:
+            conjuntos.append(self._ids_valor("provincia", provincia))
+        if tipo:
+            conjuntos.append(self._ids_valor("tipo", tipo))
+        if actividad:
+            conjuntos.append(self._ids_valor("actividad", actividad, parcial=True))
+        if cp:
+            conjuntos.append(self._ids_cp(cp))
+        if con_email:
+            conjuntos.append(self.presencia["email"])
+        if con_telefono:
+            conjuntos.append(self.presencia["telefono"])
+
+        if conjuntos:
+            conjuntos.sort(key=len)
+            ids = set(conjuntos[0]).intersection(*conjuntos[1:])
+        else:
+            ids = set(self.posiciones)
+
+        empresas = self.leer_varias(ids)
+        if orden:
+            yield from sorted(empresas, key=lambda e: (clave(getattr(e, orden)), e.id_empresa), reverse=descendente)
+        else:
+            yield from empresas
+
+
+def escribir_resultados(empresas: Iterable[EmpresaCompleta], campos: List[str], formato: str, salida) -> int:
+    """
+    Escribe las empresas en JSONL o CSV con los campos pedidos
+
+    Args:
+        empresas: Empresas a escribir
+        campos: Campos de cada empresa que se escriben
+        formato: 'jsonl' o 'csv'
+        salida: Archivo de texto abierto
+
+    Returns:
+        int: Empresas escritas
+    """
+    escritor = None
+    if formato == "csv":
+        escritor = csv.writer(salida)
+        escritor.writerow(campos)
+
+    n = 0
+    for empresa in empresas:
+        valores = [getattr(empresa, campo) for campo in campos]
+        if escritor:
+            escritor.writerow(valores)
+        else:
+            salida.write(json.dumps(dict(zip(campos, valores)), ensure_ascii=False) + "\n")
+        n += 1
+    return n
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Consulta del catálogo de empresas")
+    parser.add_argument("--catalogo", default="catalogo", help="Directorio del catálogo")
+    parser.add_argument("--importar", metavar="RUTA", help="Añadir las empresas de un archivo o directorio de salida")
+    parser.add_argument("--localidad")
+    parser.add_argument("--provincia")
+    parser.add_argument("--cp", help="Prefijo del código postal")
+    parser.add_argument("--tipo")
+    parser.add_argument("--actividad", help="Texto contenido en la actividad")
+    parser.add_argument("--con-email", action="store_true")
+    parser.add_argument("--con-telefono", action="store_true")
+    parser.add_argument("--orden", choices=CAMPOS_EMPRESA, help="Campo por el que ordenar")
+    parser.add_argument("--desc", action="store_true", help="Orden descendente")
+    parser.add_argument("--campos", default=",".join(CAMPOS_EMPRESA),
+                        help="Campos a mostrar, separados por comas")
+    parser.add_argument("--formato", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("-o", "--salida", help="Archivo de salida (por defecto, salida estándar)")
+    args = parser.parse_args()
+
+    campos = [c.strip() for c in args.campos.split(",") if c.strip()]
+    desconocidos = [c for c in campos if c not in CAMPOS_EMPRESA]
+    if desconocidos:
+        parser.error(f"Campos desconocidos: {', '.join(desconocidos)}")
+
+    catalogo = Catalogo(args.catalogo)
+
+    if args.importar:
+        try:
+            escritas = catalogo.agregar_varias(e for _, e in iterar_empresas(rutas_snapshot(args.importar)))
+        except (OSError, ValueError) as e:
+            print(f"❌ Error importando {args.importar}: {e}", file=sys.stderr)
+            return 1
+        catalogo.guardar()
+        print(f"✅ {escritas} empresas nuevas o cambiadas; {len(catalogo.posiciones)} en el catálogo",
+              file=sys.stderr)
+        return 0
+
+    catalogo.guardar()
+    resultados = catalogo.consultar(
+        localidad=args.localidad, provincia=args.provincia, cp=args.cp, tipo=args.tipo,
+        actividad=args.actividad, con_email=args.con_email, con_telefono=args.con_telefono,
+        orden=args.orden, descendente=args.desc
+    )
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8', newline='') as f:
+            n = escribir_resultados(resultados, campos, args.formato, f)
+    else:
+        n = escribir_resultados(resultados, campos, args.formato, sys.stdout)
+    print(f"{n} empresas", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
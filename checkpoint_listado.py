@@ -0,0 +1,92 @@
+"""
+Checkpoint incremental del recorrido paginado del listado de empresas
+"""
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointListado:
+    """
+    Guarda página a página las filas extraídas del listado y la URL de la
+    siguiente página, para reanudar un recorrido interrumpido.
+
+    El archivo es JSONL de solo añadido: una línea por página completada, de
+    modo que cada checkpoint cuesta escribir solo las filas de esa página.
+    """
+
+    def __init__(self, archivo: str):
+        """
+        Inicializa el checkpoint
+
+        Args:
+            archivo: Ruta del archivo JSONL de checkpoint
+        """
+        self.archivo = archivo
+
+    def guardar_pagina(self, pagina: int, empresas: List[Dict], url_siguiente: Optional[str]) -> None:
+        """
+        Registra una página completada
+
+        Args:
+            pagina: Número de la página completada (empezando en 1)
+            empresas: Filas extraídas de esa página
+            url_siguiente: URL de la página siguiente, o None si no se conoce
+        """
+        linea = json.dumps({
+            "pagina": pagina,
+            "url_siguiente": url_siguiente,
+            "empresas": empresas
+        }, ensure_ascii=False)
+
+        with open(self.archivo, 'a', encoding='utf-8') as f:
+            f.write(linea + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def cargar(self) -> Optional[Dict]:
+        """
+        Reconstruye el estado a partir de las páginas registradas
+
+        Returns:
+            Optional[Dict]: {'pagina', 'url_siguiente', 'empresas'} de la última
+            página completada, con las filas acumuladas, o None si no hay checkpoint
+        """
+        if not os.path.exists(self.archivo):
+            return None
+
+        empresas = []
+        ultima = None
+
+        with open(self.archivo, 'rb+') as f:
+            posicion_valida = 0
+            for linea in f:
+                try:
+                    registro = json.loads(linea.decode('utf-8'))
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    # Última línea a medio escribir por un cierre inesperado: se
+                    # trunca para que las siguientes páginas se añadan limpias
+                    logger.warning("Línea de checkpoint incompleta descartada")
+                    f.truncate(posicion_valida)
+                    break
+                empresas.extend(registro.get('empresas', []))
+                ultima = registro
+                posicion_valida += len(linea)
+
+        if ultima is None:
+            return None
+
+        return {
+            "pagina": ultima['pagina'],
+            "url_siguiente": ultima.get('url_siguiente'),
+            "empresas": empresas
+        }
+
+    def borrar(self) -> None:
+        """Elimina el checkpoint una vez completado el listado"""
+        if os.path.exists(self.archivo):
+            os.remove(self.archivo)
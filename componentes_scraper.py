@@ -0,0 +1,111 @@
+"""
+Componentes comunes de los scrapers
+
+Los cinco scrapers crean los mismos componentes de instrumentación, control
+del navegador y destino de las empresas extraídas. ComponentesScraper los
+crea en un solo sitio, después de comprobar las credenciales, y reúne los
+métodos que los usan y que eran iguales en todos los scrapers.
+"""
+from models import EmpresaCompleta
+from instrumentacion import RegistroTiempos
+from metricas import MetricasCrawl
+from progreso import ProgresoGlobal
+from monitor_recursos import MonitorRecursos
+from reciclaje_navegador import PoliticaReciclaje
+from vigilancia import Vigilante
+from esquema_detalle import ExtractorDetalle
+from indice_busqueda import IndiceBusqueda
+from catalogo import Catalogo
+from registro_hashes import RegistroHashes
+from archivo_html import ArchivoHTML
+from resumen_ejecucion import ResumenEjecucion
+
+
+class ComponentesScraper:
+    """
+    Mixin con los componentes comunes de los scrapers
+
+    La clase que lo usa define driver, errores, logger, _setup_driver(),
+    iniciar_sesion() y extraer_detalle_empresa(), y llama a
+    _iniciar_componentes() una vez comprobadas las credenciales: algunos
+    componentes arrancan hilos (y el servidor de métricas) al crearse.
+    """
+
+    def _iniciar_componentes(self, motor: str) -> None:
+        """
+        Crea los componentes comunes del scraper
+
+        Args:
+            motor: Nombre del scraper (métricas, recursos y progreso global)
+        """
+        self.tiempos = RegistroTiempos()
+        self.metricas = MetricasCrawl.desde_entorno(motor, self.tiempos)
+        self.progreso = ProgresoGlobal(f"progreso_global_{motor}.json")
+        self.metricas.progreso = self.progreso
+        self.recursos = MonitorRecursos.desde_entorno(motor, lambda: self.driver)
+        self.metricas.recursos = self.recursos
+        self.reciclaje = PoliticaReciclaje.desde_entorno(self.tiempos, self.recursos)
+        self.vigilante = Vigilante.desde_entorno(self.tiempos, lambda: self.driver)
+        self.extractor_detalle = ExtractorDetalle()
+        self.indice = IndiceBusqueda()
+        self.catalogo = Catalogo()
+        self.hashes = RegistroHashes()
+        self.archivo_html = ArchivoHTML.desde_entorno()
+        self.ejecucion = ResumenEjecucion(motor)
+
+    def _detener_componentes(self) -> None:
+        """Detiene los hilos de los componentes, guarda el índice pendiente y el resumen de la ejecución"""
+        self.vigilante.detener()
+        self.recursos.detener()
+        self.metricas.detener()
+        with self.tiempos.medir("escritura"):
+            self.indice.guardar()
+        self.ejecucion.guardar(self.tiempos.resumen(), self.errores)
+
+    def _reciclar_navegador_si_necesario(self):
+        """
+        Reinicia el navegador si ha cargado demasiadas páginas, usa demasiada
+        memoria o lo ha matado el vigilante, restaurando la sesión para
+        continuar por la misma empresa
+        """
+        motivo = "terminado por el vigilante" if self.vigilante.atender() else self.reciclaje.motivo()
+        if motivo:
+            self._reiniciar_navegador(motivo)
+
+    def _reiniciar_navegador(self, motivo: str):
+        """
+        Cierra el navegador actual, abre uno nuevo y restaura la sesión
+
+        Args:
+            motivo: Causa del reinicio (para el log)
+        """
+        self.logger.info(f"Reciclando navegador ({motivo})")
+        with self.tiempos.medir("reciclaje"):
+            try:
+                self.driver.quit()
+            except Exception as e:
+                self.logger.warning(f"Error cerrando el navegador a reciclar: {e}")
+
+            self._setup_driver()
+            if not self.iniciar_sesion():
+                raise Exception("No se pudo iniciar sesión tras reciclar el navegador")
+
+        self.reciclaje.reiniciado()
+
+    def _extraer_detalle_vigilado(self, empresa: EmpresaCompleta) -> EmpresaCompleta:
+        """
+        Extrae el detalle de una empresa y, si el vigilante mata el navegador
+        colgado mientras tanto, lo reinicia y repite la misma empresa
+
+        Args:
+            empresa: Objeto EmpresaCompleta con datos básicos
+
+        Returns:
+            EmpresaCompleta: Empresa con datos completos
+        """
+        self._reciclar_navegador_si_necesario()
+        empresa_completa = self.extraer_detalle_empresa(empresa)
+        if self.vigilante.atender():
+            self._reiniciar_navegador("terminado por el vigilante")
+            empresa_completa = self.extraer_detalle_empresa(empresa)
+        return empresa_completa
@@ -0,0 +1,137 @@
+"""
+Configuración común de los scrapers del sistema SAÓ FCT
+"""
+import os
+from typing import Optional, Tuple
+
+
+BASE_URL_SAO = "https://foremp.edu.gva.es"
+
+
+def obtener_base_url() -> str:
+    """
+    URL base del sistema SAÓ, configurable con SAO_BASE_URL (p. ej. para
+    apuntar al servidor simulado local)
+
+    Returns:
+        str: URL base sin barra final
+    """
+    return os.getenv('SAO_BASE_URL', BASE_URL_SAO).rstrip('/')
+
+
+def obtener_escala_esperas() -> float:
+    """
+    Factor por el que se multiplican las esperas fijas entre peticiones,
+    configurable con SAO_ESCALA_ESPERAS (p. ej. 0 contra el servidor simulado)
+
+    Returns:
+        float: Factor de escala (1.0 por defecto)
+    """
+    try:
+        return max(0.0, float(os.getenv('SAO_ESCALA_ESPERAS', '1')))
+    except ValueError:
+        return 1.0
+
+
+def obtener_config_metricas() -> Tuple[Optional[str], Optional[int]]:
+    """
+    Destino de las métricas de Prometheus: archivo (SAO_METRICAS_ARCHIVO) y
+    puerto del endpoint HTTP local (SAO_METRICAS_PUERTO)
+
+    Returns:
+        Tuple[Optional[str], Optional[int]]: Archivo y puerto, None si no se usan
+    """
+    archivo = os.getenv('SAO_METRICAS_ARCHIVO') or None
+    puerto = os.getenv('SAO_METRICAS_PUERTO')
+    return archivo, int(puerto) if puerto and puerto.isdigit() else None
+
+
+def obtener_config_logs() -> Tuple[str, float]:
+    """
+    Nivel de log (SAO_LOG_NIVEL) y segundos entre mensajes muestreados de una
+    misma línea en los bucles (SAO_LOG_MUESTREO, 0 para no muestrear)
+
+    Returns:
+        Tuple[str, float]: Nivel ('INFO' por defecto) e intervalo (5 segundos por defecto)
+    """
+    nivel = os.getenv('SAO_LOG_NIVEL', 'INFO').upper()
+    try:
+        intervalo = max(0.0, float(os.getenv('SAO_LOG_MUESTREO', '5')))
+    except ValueError:
+        intervalo = 5.0
+    return nivel, intervalo
+
+
+def obtener_intervalo_monitor() -> float:
+    """
+    Segundos entre muestras del monitor de recursos del navegador,
+    configurable con SAO_MONITOR_INTERVALO (0 para desactivarlo)
+
+    Returns:
+        float: Intervalo en segundos (10 por defecto)
+    """
+    try:
+        return max(0.0, float(os.getenv('SAO_MONITOR_INTERVALO', '10')))
+    except ValueError:
+        return 10.0
+
+
+def obtener_config_reciclaje() -> Tuple[int, int]:
+    """
+    Umbrales para reiniciar el navegador en ejecuciones largas: páginas
+    cargadas (SAO_RECICLAR_PAGINAS) y memoria del navegador en MB
+    (SAO_RECICLAR_RSS_MB); 0 desactiva cada umbral
+
+    Returns:
+        Tuple[int, int]: Páginas (1000 por defecto) y MB (2048 por defecto)
+    """
+    valores = []
+    for variable, defecto in (('SAO_RECICLAR_PAGINAS', 1000), ('SAO_RECICLAR_RSS_MB', 2048)):
+        try:
+            valores.append(max(0, int(os.getenv(variable, str(defecto)))))
+        except ValueError:
+            valores.append(defecto)
+    return valores[0], valores[1]
+
+
+def obtener_timeouts() -> Tuple[int, int, int]:
+    """
+    Timeouts de los comandos WebDriver en segundos: carga de página
+    (SAO_TIMEOUT_PAGINA), ejecución de scripts (SAO_TIMEOUT_SCRIPT) y
+    respuesta HTTP del driver a cualquier comando (SAO_TIMEOUT_COMANDO)
+
+    Returns:
+        Tuple[int, int, int]: Página (30), script (30) y comando (120) por defecto
+    """
+    valores = []
+    for variable, defecto in (('SAO_TIMEOUT_PAGINA', 30), ('SAO_TIMEOUT_SCRIPT', 30), ('SAO_TIMEOUT_COMANDO', 120)):
+        try:
+            valores.append(max(1, int(os.getenv(variable, str(defecto)))))
+        except ValueError:
+            valores.append(defecto)
+    return valores[0], valores[1], valores[2]
+
+
+def obtener_limite_vigilante() -> float:
+    """
+    Segundos sin progreso tras los que el vigilante mata el navegador
+    colgado, configurable con SAO_VIGILANTE_SEGUNDOS (0 para desactivarlo)
+
+    Returns:
+        float: Límite en segundos (300 por defecto)
+    """
+    try:
+        return max(0.0, float(os.getenv('SAO_VIGILANTE_SEGUNDOS', '300')))
+    except ValueError:
+        return 300.0
+
+
+def obtener_directorio_html() -> Optional[str]:
+    """
+    Directorio donde se archiva el HTML de cada página de detalle visitada,
+    configurable con SAO_ARCHIVO_HTML (sin definir, no se archiva)
+
+    Returns:
+        Optional[str]: Directorio del archivo HTML o None
+    """
+    return os.getenv('SAO_ARCHIVO_HTML') or None
@@ -12,6 +12,8 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from configuracion import obtener_base_url
+
 def diagnostico_completo():
     """Realiza un diagnóstico completo del sistema"""
     print("=== DIAGNÓSTICO DE CIERRE DEL NAVEGADOR ===\n")
@@ -20,6 +22,7 @@ def diagnostico_completo():
         # 1. Verificar credenciales
         print("1. Verificando credenciales...")
         load_dotenv()
+        base_url = obtener_base_url()
         usuario = os.getenv('SAO_USUARIO')
         password = os.getenv('SAO_PASSWORD')
         
@@ -58,7 +61,7 @@ def diagnostico_completo():
         # 4. Probar navegación básica
         print("\n4. Probando navegación básica...")
         try:
-            driver.get("https://foremp.edu.gva.es/index.php?op=4&subop=0")
+            driver.get(f"{base_url}/index.php?op=4&subop=0")
             time.sleep(3)
             print(f"   ✅ Página cargada: {driver.current_url}")
         except Exception as e:
@@ -89,7 +92,7 @@ def diagnostico_completo():
         # 6. Probar navegación a listado
         print("\n6. Probando navegación a listado...")
         try:
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
+            listado_url = f"{base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
             driver.get(listado_url)
             time.sleep(3)
             print(f"   ✅ Listado cargado: {driver.current_url}")
@@ -155,7 +158,7 @@ def diagnostico_completo():
         # 10. Probar navegación de vuelta
         print("\n10. Probando navegación de vuelta...")
         try:
-            driver.get("https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc")
+            driver.get(f"{base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc")
             time.sleep(3)
             print(f"   ✅ Navegación de vuelta exitosa: {driver.current_url}")
         except Exception as e:
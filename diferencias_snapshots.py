@@ -0,0 +1,193 @@
+"""
+Diferencias entre dos snapshots de empresas (dos ejecuciones del scraping)
+
+Un snapshot es un archivo JSON consolidado, un directorio de salida (si una
+empresa aparece en varios archivos vale la versión del más reciente) o un
+directorio de catálogo. Como los scrapers solo escriben en output/ las
+empresas nuevas o cambiadas, un snapshot debe ser una copia del output/
+acumulado (o del catálogo) en el momento de la ejecución, no los archivos de
+una sola ejecución: en ellos faltarían las empresas sin cambios, que se
+tomarían por bajas. Si el snapshot nuevo tiene muchas menos empresas que el
+anterior se rechaza la comparación salvo con --permitir-parcial.
+
+La comparación se hace en dos pasadas en streaming sobre cada lado:
+
+1. Se guarda por id_empresa solo la huella del contenido y la posición de la
+   versión vigente, lo que basta para saber qué empresas son altas, bajas o
+   han cambiado.
+2. Se vuelve a leer cada lado escribiendo altas y bajas según aparecen; solo
+   se retienen en memoria las empresas modificadas del snapshot anterior hasta
+   encontrar su versión nueva y calcular las diferencias campo a campo.
+
+El resultado es un registro de cambios JSONL, una línea por empresa:
+    {"id_empresa": "67331", "cambio": "modificada", "campos": {"telefono": ["963...", "961..."]}}
+
+Uso:
+    cp -r output/ snapshots/output_semana1/      # tras cada ejecución
+    python diferencias_snapshots.py snapshots/output_semana1/ snapshots/output_semana2/
+    python diferencias_snapshots.py snapshots/catalogo_semana1/ catalogo/
+    python diferencias_snapshots.py antes.json despues.json -o cambios.jsonl
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from dataclasses import fields
+from typing import Dict, Iterator, List, Tuple
+
+from catalogo import Catalogo
+from lectura_salida import iterar_empresas, rutas_snapshot
+from models import CAMPOS_VOLATILES, EmpresaCompleta
+
+
+# Campos que no se comparan salvo con --todos-los-campos
+CAMPOS_IGNORADOS = CAMPOS_VOLATILES
+
+CAMPOS_EMPRESA = [c.name for c in fields(EmpresaCompleta) if c.name != "id_empresa"]
+
+# Por debajo de esta fracción de las empresas del snapshot anterior, el nuevo se considera parcial
+PROPORCION_MINIMA = 0.5
+
+
+def _iterar_snapshot(ruta: str) -> Iterator[Tuple[int, EmpresaCompleta]]:
+    """(orden de lectura, empresa) de todas las empresas del snapshot"""
+    if os.path.exists(os.path.join(ruta, "indices.json")):
+        empresas = Catalogo(ruta).consultar()
+    else:
+        empresas = (empresa for _, empresa in iterar_empresas(rutas_snapshot(ruta)))
+    yield from enumerate(empresas)
+
+
+def huellas_snapshot(ruta: str, excluir: Tuple[str, ...]) -> Dict[str, Tuple[str, int]]:
+    """
+    Primera pasada: huella y posición de la versión vigente de cada empresa
+
+    Args:
+        ruta: Archivo JSON o directorio de salida
+        excluir: Campos que no cuentan para la huella
+
+    Returns:
+        Dict[str, Tuple[str, int]]: id_empresa -> (hash del contenido, orden de lectura)
+    """
+    return {empresa.id_empresa: (empresa.hash_contenido(excluir), orden)
+            for orden, empresa in _iterar_snapshot(ruta)}
+
+
+def diferencias_campos(antes: EmpresaCompleta, despues: EmpresaCompleta,
+                       campos: List[str]) -> Dict[str, List[str]]:
+    """
+    Campos con distinto valor en dos versiones de una empresa
+
+    Returns:
+        Dict[str, List[str]]: campo -> [valor anterior, valor nuevo]
+    """
+    diferencias = {}
+    for campo in campos:
+        anterior, nuevo = getattr(antes, campo), getattr(despues, campo)
+        if anterior != nuevo:
+            diferencias[campo] = [anterior, nuevo]
+    return diferencias
+
+
+def comparar_snapshots(ruta_antes: str, ruta_despues: str, salida,
+                       excluir: Tuple[str, ...] = CAMPOS_IGNORADOS, permitir_parcial: bool = False) -> Dict:
+    """
+    Compara dos snapshots y escribe el registro de cambios
+
+    Args:
+        ruta_antes: Snapshot anterior (archivo JSON, directorio de salida o catálogo)
+        ruta_despues: Snapshot nuevo (archivo JSON, directorio de salida o catálogo)
+        salida: Archivo de texto abierto donde se escribe el JSONL de cambios
+        excluir: Campos que no se comparan
+        permitir_parcial: Comparar aunque el snapshot nuevo tenga muchas menos empresas
+
+    Returns:
+        Dict: Resumen con el número de altas, bajas, modificadas y sin cambios
+            y cuántas veces ha cambiado cada campo
+
+    Raises:
+        ValueError: Si el snapshot nuevo parece parcial (menos de PROPORCION_MINIMA
+            de las empresas del anterior) y no se permite
+    """
+    campos = [c for c in CAMPOS_EMPRESA if c not in excluir]
+    huellas_antes = huellas_snapshot(ruta_antes, excluir)
+    huellas_despues = huellas_snapshot(ruta_despues, excluir)
+    if not permitir_parcial and len(huellas_despues) < PROPORCION_MINIMA * len(huellas_antes):
+        raise ValueError(f"{ruta_despues} tiene {len(huellas_despues)} empresas frente a {len(huellas_antes)} "
+                         f"de {ruta_antes}: ¿es el output/ de una sola ejecución en lugar de una copia del "
+                         f"acumulado? Usa --permitir-parcial si las bajas son reales")
+
+    modificadas = {i for i, (huella, _) in huellas_antes.items()
+                   if i in huellas_despues and huellas_despues[i][0] != huella}
+    resumen = {
+        "altas": sum(1 for i in huellas_despues if i not in huellas_antes),
+        "bajas": sum(1 for i in huellas_antes if i not in huellas_despues),
+        "modificadas": len(modificadas),
+        "sin_cambios": sum(1 for i, (huella, _) in huellas_antes.items()
+                           if i in huellas_despues and huellas_despues[i][0] == huella),
+        "campos": Counter()
+    }
+
+    def escribir(registro: Dict) -> None:
+        salida.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    # Segunda pasada sobre el snapshot anterior: bajas y versiones anteriores de las modificadas
+    anteriores: Dict[str, EmpresaCompleta] = {}
+    for orden, empresa in _iterar_snapshot(ruta_antes):
+        if huellas_antes[empresa.id_empresa][1] != orden:
+            continue
+        if empresa.id_empresa not in huellas_despues:
+            escribir({"id_empresa": empresa.id_empresa, "cambio": "baja", "empresa": empresa.to_dict()})
+        elif empresa.id_empresa in modificadas:
+            anteriores[empresa.id_empresa] = empresa
+
+    # Segunda pasada sobre el nuevo: altas y diferencias de las modificadas
+    for orden, empresa in _iterar_snapshot(ruta_despues):
+        if huellas_despues[empresa.id_empresa][1] != orden:
+            continue
+        if empresa.id_empresa not in huellas_antes:
+            escribir({"id_empresa": empresa.id_empresa, "cambio": "alta", "empresa": empresa.to_dict()})
+        elif empresa.id_empresa in modificadas:
+            cambios = diferencias_campos(anteriores.pop(empresa.id_empresa), empresa, campos)
+            resumen["campos"].update(cambios.keys())
+            escribir({"id_empresa": empresa.id_empresa, "cambio": "modificada", "campos": cambios})
+
+    resumen["campos"] = dict(resumen["campos"].most_common())
+    return resumen
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Altas, bajas y cambios de empresas entre dos ejecuciones")
+    parser.add_argument("antes", help="Snapshot anterior: archivo JSON, copia de output/ o del catálogo")
+    parser.add_argument("despues", help="Snapshot nuevo: archivo JSON, copia de output/ o del catálogo")
+    parser.add_argument("-o", "--salida", help="Archivo JSONL de cambios (por defecto, salida estándar)")
+    parser.add_argument("--todos-los-campos", action="store_true",
+                        help=f"Comparar también {', '.join(CAMPOS_IGNORADOS)}")
+    parser.add_argument("--permitir-parcial", action="store_true",
+                        help="Comparar aunque el snapshot nuevo tenga menos de la mitad de empresas que el anterior")
+    args = parser.parse_args()
+
+    excluir = () if args.todos_los_campos else CAMPOS_IGNORADOS
+    inicio = time.perf_counter()
+    try:
+        if args.salida:
+            with open(args.salida, 'w', encoding='utf-8') as f:
+                resumen = comparar_snapshots(args.antes, args.despues, f, excluir, args.permitir_parcial)
+        else:
+            resumen = comparar_snapshots(args.antes, args.despues, sys.stdout, excluir, args.permitir_parcial)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error comparando snapshots: {e}", file=sys.stderr)
+        return 1
+
+    campos = ", ".join(f"{campo} {n}" for campo, n in resumen["campos"].items()) or "ninguno"
+    print(f"✅ {resumen['altas']} altas, {resumen['bajas']} bajas, {resumen['modificadas']} modificadas, "
+          f"{resumen['sin_cambios']} sin cambios ({time.perf_counter() - inicio:.1f}s)\n"
+          f"   Campos cambiados: {campos}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,475 @@
+"""
+Detección de empresas duplicadas con distinto id_empresa
+
+Una misma empresa puede estar registrada varias veces en SAÓ con nombres
+ligeramente distintos. Solo se comparan empresas del mismo sitio (misma
+localidad o, si a alguna le falta la localidad, mismo CP) y son duplicadas:
+
+- las que tienen el mismo CIF (normalizado) y el nombre o la dirección parecidos
+- las que tienen nombre y dirección parecidos, puntuados por separado: la
+  similitud de Jaccard de los trigramas de caracteres del nombre (sin forma
+  jurídica) y la de la dirección (sin tipo de vía) deben superar cada una su
+  umbral, y los números de la dirección deben coincidir ('Calle Mayor 5' y
+  'Calle Mayor 15' son sitios distintos aunque se parezcan)
+
+Dos empresas con CIF válidos y distintos nunca son la misma, y una sin CIF
+que se parece a dos con CIF distintos se deja fuera por ambigua.
+
+Para no comparar todas las parejas, cada nombre se resume en una firma
+MinHash de una sola permutación y las firmas se reparten por bandas (LSH)
+dentro de cada localidad y CP: solo se comparan las empresas que coinciden
+en alguna banda completa y en los números de la dirección.
+
+Los grupos no se forman por cadenas de parejas (A~B y B~C no hacen A~C): se
+recorren las empresas de la más completa a la menos completa y cada una que
+aún no está en un grupo es el representante de uno nuevo, al que solo se
+admiten las empresas que se parecen directamente a él. La confianza de un
+grupo es la similitud más baja de un miembro con el representante (1.0 para
+el mismo CIF o el mismo texto, el menor de los Jaccard de nombre y dirección
+en otro caso).
+
+Uso:
+    python duplicados.py output/
+    python duplicados.py output/ -o duplicados.json --umbral 0.8
+    python duplicados.py --simulado 50000     # comprobación con empresas sintéticas
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import fields
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from indice_busqueda import tokenizar
+from lectura_salida import iterar_empresas, rutas_snapshot
+from models import EmpresaCompleta
+from normalizacion import normalizar_documento, validar_documento
+
+
+FORMAS_JURIDICAS = {"sl", "sa", "slu", "sll", "slp", "sc", "scp", "cb", "coop", "v", "sociedad", "limitada", "anonima"}
+TIPOS_VIA = {"c", "cl", "calle", "av", "avda", "avenida", "pl", "pza", "plaza", "pg", "poligono", "cm", "cami",
+             "camino", "ctra", "carretera", "ps", "po", "paseo", "passeig", "carrer", "avinguda", "placa", "partida"}
+
+# 32 valores por firma en 8 bandas de 4: las parejas con Jaccard >= 0.6 coinciden
+# en alguna banda con probabilidad > 0.6 y las de 0.8 con probabilidad > 0.99
+BANDAS = 8
+FILAS_BANDA = 4
+UMBRAL_SIMILITUD = 0.7
+UMBRAL_DIRECCION = 0.7
+# Las cubetas LSH más grandes (nombres y calles muy comunes) no se comparan por parejas
+MAX_CUBETA = 100
+
+VALORES_FIRMA = BANDAS * FILAS_BANDA
+# Desplazamiento de los valores prestados a las casillas vacías de la firma, mayor
+# que cualquier valor propio (crc32 // VALORES_FIRMA)
+SALTO_DENSIFICACION = 1 << 32
+
+CAMPOS_EMPRESA = [c.name for c in fields(EmpresaCompleta)]
+RE_NUMERO = re.compile(r"\d+")
+
+
+def texto_nombre(nombre: str) -> str:
+    """Nombre sin forma jurídica ni acentos"""
+    return " ".join(t for t in tokenizar(nombre) if t not in FORMAS_JURIDICAS)
+
+
+def texto_direccion(direccion: str) -> str:
+    """Dirección sin tipo de vía ni acentos"""
+    return " ".join(t for t in tokenizar(direccion) if t not in TIPOS_VIA)
+
+
+def numeros(texto: str) -> Tuple[str, ...]:
+    """Números de una dirección (portal, piso, km), sin ceros a la izquierda"""
+    return tuple(str(int(n)) for n in RE_NUMERO.findall(texto))
+
+
+def tejas(texto: str) -> Set[int]:
+    """Trigramas de caracteres del texto, como enteros de 32 bits"""
+    codificado = texto.encode("utf-8")
+    return {zlib.crc32(codificado[i:i + 3]) for i in range(max(len(codificado) - 2, 1))}
+
+
+def firma_minhash(conjunto: Set[int]) -> Tuple[int, ...]:
+    """
+    Firma MinHash de una sola permutación
+
+    Cada teja cae en una de las VALORES_FIRMA casillas según su hash y cada
+    casilla guarda el mínimo: una sola pasada por el conjunto en lugar de una
+    por función de hash. Las casillas vacías toman el valor de la siguiente
+    casilla llena (densificación por rotación) desplazado según la distancia.
+    """
+    firma: List[Optional[int]] = [None] * VALORES_FIRMA
+    for teja in conjunto:
+        casilla, valor = teja % VALORES_FIRMA, teja // VALORES_FIRMA
+        actual = firma[casilla]
+        if actual is None or valor < actual:
+            firma[casilla] = valor
+
+    llenas = firma[:]
+    for casilla in range(VALORES_FIRMA):
+        if llenas[casilla] is None:
+            distancia = 1
+            while llenas[(casilla + distancia) % VALORES_FIRMA] is None:
+                distancia += 1
+            firma[casilla] = llenas[(casilla + distancia) % VALORES_FIRMA] + distancia * SALTO_DENSIFICACION
+    return tuple(firma)
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    """Similitud de Jaccard de dos conjuntos"""
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def completitud(empresa: EmpresaCompleta) -> int:
+    """Número de campos con valor de una empresa"""
+    return sum(1 for campo in CAMPOS_EMPRESA if getattr(empresa, campo))
+
+
+class FichaComparable:
+    """Datos de una empresa preparados para compararla"""
+
+    __slots__ = ("localidad", "cp", "cif", "nombre", "direccion", "tejas_nombre", "tejas_direccion", "portal")
+
+    def __init__(self, empresa: EmpresaCompleta, cache: Optional[Dict[Tuple[str, str], object]] = None):
+        """
+        Normaliza localidad, CP, CIF, nombre y dirección de la empresa
+
+        Args:
+            empresa: Empresa a preparar
+            cache: (tipo, texto) -> resultado, compartida entre fichas porque
+                localidades, nombres y calles se repiten mucho
+        """
+        cache = {} if cache is None else cache
+
+        def memo(tipo: str, texto: str, funcion):
+            clave = (tipo, texto)
+            if clave not in cache:
+                cache[clave] = funcion(texto)
+            return cache[clave]
+
+        self.localidad = memo("localidad", empresa.localidad, lambda t: " ".join(tokenizar(t)))
+        self.cp = empresa.cp.strip()
+        cif = normalizar_documento(empresa.cif)
+        # Solo los CIF válidos cuentan: uno mal escrito no prueba que sean empresas distintas
+        self.cif = cif if cif and validar_documento(cif) else ""
+        self.nombre = memo("nombre", empresa.nombre, texto_nombre)
+        self.direccion = memo("direccion", empresa.direccion, texto_direccion)
+        self.tejas_nombre = memo("tejas", self.nombre, lambda t: tejas(t) if t else set())
+        self.tejas_direccion = memo("tejas", self.direccion, lambda t: tejas(t) if t else set())
+        self.portal = numeros(empresa.direccion)
+
+    def bloques(self) -> List[Tuple[str, str]]:
+        """Bloques (localidad y CP) dentro de los que se busca a sus duplicados"""
+        bloques = []
+        if self.localidad:
+            bloques.append(("localidad", self.localidad))
+        if self.cp:
+            bloques.append(("cp", self.cp))
+        return bloques
+
+
+def mismo_sitio(a: FichaComparable, b: FichaComparable) -> bool:
+    """Misma localidad o, si a alguna le falta, mismo CP"""
+    if a.localidad and b.localidad:
+        return a.localidad == b.localidad
+    return bool(a.cp) and a.cp == b.cp
+
+
+def cif_incompatible(a: FichaComparable, b: FichaComparable) -> bool:
+    """Las dos tienen un CIF válido y son distintos"""
+    return bool(a.cif) and bool(b.cif) and a.cif != b.cif
+
+
+def comparar(a: FichaComparable, b: FichaComparable, umbral: float,
+             umbral_direccion: float) -> Optional[Tuple[float, str]]:
+    """
+    Decide si dos empresas son la misma
+
+    Returns:
+        Optional[Tuple[float, str]]: (confianza, motivo) o None si no son duplicadas
+    """
+    if not mismo_sitio(a, b) or cif_incompatible(a, b):
+        return None
+    nombre = jaccard(a.tejas_nombre, b.tejas_nombre)
+    direccion = jaccard(a.tejas_direccion, b.tejas_direccion) if a.portal == b.portal else 0.0
+    if a.cif and a.cif == b.cif:
+        # El mismo CIF con otro nombre y otra dirección es más probable que sea un error de tecleo
+        return (1.0, "cif") if nombre >= umbral or direccion >= umbral_direccion else None
+    if nombre >= umbral and direccion >= umbral_direccion:
+        identicas = a.nombre == b.nombre and a.direccion == b.direccion
+        return (1.0 if identicas else min(nombre, direccion)), "nombre_direccion"
+    return None
+
+
+def detectar_duplicados(empresas: Iterable[EmpresaCompleta], umbral: float = UMBRAL_SIMILITUD,
+                        umbral_direccion: float = UMBRAL_DIRECCION) -> List[Dict]:
+    """
+    Agrupa las empresas duplicadas
+
+    Args:
+        empresas: Empresas a revisar (si un id_empresa se repite, vale la última versión)
+        umbral: Similitud de Jaccard mínima del nombre
+        umbral_direccion: Similitud de Jaccard mínima de la dirección
+
+    Returns:
+        List[Dict]: Grupos de dos o más empresas con 'ids', 'confianza', 'motivos'
+            y 'empresas' (el representante, la más completa, primero), de mayor a
+            menor confianza
+    """
+    datos: Dict[str, EmpresaCompleta] = {}
+    for empresa in empresas:
+        datos[empresa.id_empresa] = empresa
+    cache: Dict[Tuple[str, str], object] = {}
+    fichas = {id_empresa: FichaComparable(empresa, cache) for id_empresa, empresa in datos.items()}
+
+    # Parejas candidatas: mismo CIF o misma firma LSH del nombre en un mismo bloque
+    candidatas: Set[Tuple[str, str]] = set()
+
+    def proponer(ids: List[str]) -> None:
+        if len(ids) < 2 or len(ids) > MAX_CUBETA:
+            return
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                candidatas.add((a, b) if a < b else (b, a))
+
+    por_cif: Dict[Tuple, List[str]] = defaultdict(list)
+    # Los textos idénticos se agrupan y solo el primero pasa por LSH
+    por_texto: Dict[Tuple, List[str]] = defaultdict(list)
+    for id_empresa, ficha in fichas.items():
+        for bloque in ficha.bloques():
+            if ficha.cif:
+                por_cif[(bloque, ficha.cif)].append(id_empresa)
+            if ficha.nombre and ficha.direccion:
+                por_texto[(bloque, ficha.nombre, ficha.direccion)].append(id_empresa)
+    for ids in por_cif.values():
+        proponer(ids)
+
+    cubetas: Dict[Tuple, List[str]] = defaultdict(list)
+    copias: Dict[str, List[str]] = {}
+    for (bloque, _, _), ids in por_texto.items():
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                candidatas.add((a, b) if a < b else (b, a))
+        primero = ids[0]
+        copias[primero] = ids
+        ficha = fichas[primero]
+        firma = cache.get(("firma", ficha.nombre))
+        if firma is None:
+            firma = cache[("firma", ficha.nombre)] = firma_minhash(ficha.tejas_nombre)
+        for banda in range(BANDAS):
+            cubetas[(bloque, ficha.portal, banda, firma[banda * FILAS_BANDA:(banda + 1) * FILAS_BANDA])].append(primero)
+
+    for ids in cubetas.values():
+        if len(ids) < 2 or len(ids) > MAX_CUBETA:
+            continue
+        # Cada texto representa a todas sus copias
+        for i, a in enumerate(ids):
+            for b in ids[i + 1:]:
+                for copia_a in copias[a]:
+                    for copia_b in copias[b]:
+                        if copia_a != copia_b:
+                            candidatas.add((copia_a, copia_b) if copia_a < copia_b else (copia_b, copia_a))
+
+    # Parejas confirmadas: cada empresa con las que se parecen directamente a ella
+    vecinos: Dict[str, Dict[str, Tuple[float, str]]] = defaultdict(dict)
+    for a, b in candidatas:
+        resultado = comparar(fichas[a], fichas[b], umbral, umbral_direccion)
+        if resultado:
+            vecinos[a][b] = vecinos[b][a] = resultado
+
+    # Una empresa sin CIF que se parece a dos empresas con CIF distintos no se
+    # sabe de cuál es duplicada: no se agrupa con ninguna
+    ambiguas = {i for i, otros in vecinos.items()
+                if not fichas[i].cif and len({fichas[o].cif for o in otros} - {""}) > 1}
+
+    # Grupos en estrella alrededor de la empresa más completa
+    orden = sorted((i for i in vecinos if i not in ambiguas), key=lambda i: (-completitud(datos[i]), i))
+    asignadas: Set[str] = set(ambiguas)
+    resultado = []
+    for representante in orden:
+        if representante in asignadas:
+            continue
+        miembros = [representante]
+        cifs = {fichas[representante].cif} - {""}
+        confianza, motivos = 1.0, set()
+        for otro, (valor, motivo) in sorted(vecinos[representante].items(),
+                                            key=lambda x: (-completitud(datos[x[0]]), x[0])):
+            cif = fichas[otro].cif
+            if otro in asignadas or (cif and cifs and cif not in cifs):
+                continue
+            miembros.append(otro)
+            if cif:
+                cifs.add(cif)
+            confianza = min(confianza, valor)
+            motivos.add(motivo)
+        if len(miembros) < 2:
+            continue
+        asignadas.update(miembros)
+        resultado.append({
+            "ids": miembros,
+            "confianza": round(confianza, 3),
+            "motivos": sorted(motivos),
+            "empresas": [datos[i].to_dict() for i in miembros]
+        })
+    resultado.sort(key=lambda g: (-g["confianza"], g["ids"][0]))
+    return resultado
+
+
+def ids_descartables(grupos: List[Dict], confianza_minima: float = 0.0) -> Set[str]:
+    """
+    Empresas que sobran al quedarse con la más completa de cada grupo
+
+    Args:
+        grupos: Resultado de detectar_duplicados
+        confianza_minima: Solo se descartan empresas de grupos con al menos esta confianza
+
+    Returns:
+        Set[str]: id_empresa de todas las empresas de cada grupo salvo la primera
+    """
+    return {i for grupo in grupos if grupo["confianza"] >= confianza_minima for i in grupo["ids"][1:]}
+
+
+def grupos_mezclados(grupos: List[Dict]) -> List[Dict]:
+    """Grupos con empresas de más de una localidad (no debería haber ninguno)"""
+    return [g for g in grupos
+            if len({" ".join(tokenizar(e["localidad"])) for e in g["empresas"] if e["localidad"]}) > 1]
+
+
+def empresas_simuladas(n: int) -> Tuple[List[EmpresaCompleta], Dict[str, str]]:
+    """
+    Empresas sintéticas del servidor simulado con duplicados conocidos
+
+    A una de cada 100 se le añade un duplicado con otro id_empresa, la forma
+    jurídica cambiada o quitada, el nombre en mayúsculas sin acentos y la
+    vía abreviada; a la mitad de ellos se les quita además el CIF.
+
+    Returns:
+        Tuple: (empresas, id del duplicado -> id del original)
+    """
+    from servidor_simulado import generar_empresas
+
+    empresas = [EmpresaCompleta.from_dict(d) for d in generar_empresas(n)]
+    originales: Dict[str, str] = {}
+    for i, original in enumerate(empresas[::100]):
+        nombre = " ".join(t for t in original.nombre.split() if t.rstrip(".").upper() not in ("S.L", "S.A", "S.L.U"))
+        copia = EmpresaCompleta.from_dict({
+            **original.to_dict(),
+            "id_empresa": f"9{original.id_empresa}",
+            "nombre": (nombre + (" SL" if i % 3 == 0 else "")).upper().replace("À", "A").replace("Í", "I"),
+            "direccion": original.direccion.replace("Calle ", "C/ "),
+            "cif": "" if i % 2 else original.cif,
+            "email": ""
+        })
+        originales[copia.id_empresa] = original.id_empresa
+        empresas.append(copia)
+    return empresas, originales
+
+
+def copias_ambiguas(empresas: List[EmpresaCompleta], originales: Dict[str, str], umbral: float,
+                    umbral_direccion: float) -> Set[str]:
+    """
+    Duplicados añadidos que no se pueden atribuir a su original
+
+    Los nombres sintéticos se repiten, así que una copia sin CIF puede
+    parecerse también a otra empresa de la misma localidad con otro CIF; la
+    detección la deja entonces fuera por ambigua, como debe.
+
+    Args:
+        empresas: Empresas de empresas_simuladas
+        originales: Id del duplicado -> id del original
+        umbral: Similitud mínima del nombre
+        umbral_direccion: Similitud mínima de la dirección
+
+    Returns:
+        Set[str]: id_empresa de las copias ambiguas
+    """
+    cache: Dict[Tuple[str, str], object] = {}
+    fichas = {e.id_empresa: FichaComparable(e, cache) for e in empresas}
+    por_localidad: Dict[str, List[str]] = defaultdict(list)
+    for id_empresa, ficha in fichas.items():
+        por_localidad[ficha.localidad].append(id_empresa)
+
+    ambiguas = set()
+    for copia, original in originales.items():
+        ficha = fichas[copia]
+        if ficha.cif:
+            continue
+        for otro in por_localidad[ficha.localidad]:
+            if otro in (copia, original) or fichas[otro].cif == fichas[original].cif:
+                continue
+            if comparar(ficha, fichas[otro], umbral, umbral_direccion):
+                ambiguas.add(copia)
+                break
+    return ambiguas
+
+
+def comprobar_simulado(n: int, umbral: float, umbral_direccion: float) -> int:
+    """
+    Comprueba la detección con empresas sintéticas: ningún grupo mezcla
+    localidades y se encuentra al menos el 99% de los duplicados añadidos que
+    no son ambiguos (ver copias_ambiguas); los ambiguos se cuentan aparte
+
+    Returns:
+        int: 0 si la comprobación pasa, 1 si no
+    """
+    empresas, originales = empresas_simuladas(n)
+    inicio = time.perf_counter()
+    grupos = detectar_duplicados(empresas, umbral, umbral_direccion)
+    duracion = time.perf_counter() - inicio
+
+    ambiguas = copias_ambiguas(empresas, originales, umbral, umbral_direccion)
+    grupo_de = {i: n for n, g in enumerate(grupos) for i in g["ids"]}
+    encontrados = sum(1 for copia, original in originales.items()
+                      if copia not in ambiguas and copia in grupo_de and grupo_de[copia] == grupo_de.get(original))
+    atribuibles = len(originales) - len(ambiguas)
+    agrupadas = sum(1 for copia in ambiguas if copia in grupo_de)
+    mezclados = grupos_mezclados(grupos)
+    mayor = max((len(g["ids"]) for g in grupos), default=0)
+    print(f"{len(empresas)} empresas, {len(originales)} duplicados añadidos: {encontrados} de {atribuibles} "
+          f"encontrados, {len(ambiguas)} ambiguos ({agrupadas} agrupados); "
+          f"{len(grupos)} grupos (el mayor de {mayor}), {sum(len(g['ids']) for g in grupos)} empresas agrupadas, "
+          f"{len(mezclados)} con varias localidades ({duracion:.1f}s)")
+    return 0 if not mezclados and encontrados >= 0.99 * atribuibles else 1
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Detecta empresas duplicadas con distinto id_empresa")
+    parser.add_argument("snapshot", nargs="?", default="output", help="Archivo JSON o directorio de salida")
+    parser.add_argument("-o", "--salida", default="duplicados.json", help="Archivo JSON con los grupos")
+    parser.add_argument("--umbral", type=float, default=UMBRAL_SIMILITUD,
+                        help="Similitud mínima del nombre (0-1)")
+    parser.add_argument("--umbral-direccion", type=float, default=UMBRAL_DIRECCION,
+                        help="Similitud mínima de la dirección (0-1)")
+    parser.add_argument("--simulado", type=int, metavar="N",
+                        help="Comprobar la detección con N empresas sintéticas en lugar de leer un snapshot")
+    args = parser.parse_args()
+
+    if args.simulado:
+        return comprobar_simulado(args.simulado, args.umbral, args.umbral_direccion)
+
+    inicio = time.perf_counter()
+    try:
+        grupos = detectar_duplicados((e for _, e in iterar_empresas(rutas_snapshot(args.snapshot))),
+                                     args.umbral, args.umbral_direccion)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error leyendo {args.snapshot}: {e}", file=sys.stderr)
+        return 1
+
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(grupos, f, ensure_ascii=False, indent=2)
+
+    sobrantes = sum(len(g["ids"]) - 1 for g in grupos)
+    print(f"✅ {len(grupos)} grupos de duplicados, {sobrantes} empresas sobrantes "
+          f"({time.perf_counter() - inicio:.1f}s) -> {args.salida}")
+    for grupo in grupos[:10]:
+        nombres = " / ".join(sorted({e["nombre"] for e in grupo["empresas"]}))
+        print(f"   {grupo['confianza']:.2f} {','.join(grupo['motivos'])}: {', '.join(grupo['ids'])} ({nombres})")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,228 @@
+"""
+Esquema declarativo de los campos de la página de detalle de una empresa
+
+La tabla table.infoUsuario.infoEmpresa tiene secciones formadas por una fila
+de encabezados (th) y una fila de valores (td). El esquema indica en qué
+sección y con qué etiquetas aparece cada campo de EmpresaCompleta. La primera
+vez que se ve una disposición de encabezados se compila en un mapa
+campo -> (sección, índice), que se guarda en caché con la tupla de
+encabezados como huella; las páginas siguientes con la misma disposición se
+resuelven leyendo directamente cada índice.
+
+La tabla se lee con una sola llamada execute_script, y el mapeo trabaja
+sobre listas de textos, así que sirve igual para páginas leídas sin
+navegador.
+"""
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class CampoDetalle:
+    """Campo de EmpresaCompleta en la página de detalle"""
+    atributo: str
+    etiquetas: Tuple[str, ...]
+    seccion: int
+    # Posición de respaldo, solo para secciones sin fila de encabezados
+    posicion: Optional[int] = None
+
+
+ESQUEMA_DETALLE: List[CampoDetalle] = [
+    CampoDetalle("cif", ("CIF", "C.I.F.", "NIF"), 0, 0),
+    CampoDetalle("nombre", ("Nombre", "Razón social"), 0, 1),
+    CampoDetalle("direccion", ("Dirección", "Domicilio"), 0, 3),
+    CampoDetalle("provincia", ("Provincia",), 0, 4),
+    CampoDetalle("localidad", ("Localidad", "Municipio", "Población"), 0, 5),
+    CampoDetalle("cp", ("CP", "C.P.", "Código postal"), 0, 6),
+    CampoDetalle("telefono", ("Teléfono",), 1, 0),
+    CampoDetalle("fax", ("Fax",), 1, 1),
+    CampoDetalle("actividad", ("Actividad",), 1, 2),
+    CampoDetalle("nombre_gerente", ("Nombre de gerente", "Gerente"), 1, 3),
+    CampoDetalle("nif_gerente", ("NIF gerente", "NIF del gerente"), 1, 4),
+    CampoDetalle("email", ("E-mail", "Email", "Correo electrónico"), 1, 5),
+    CampoDetalle("tipo", ("Tipo",), 1, 6),
+]
+
+# Filas de la tabla de detalle en una sola llamada: [es_encabezado, [textos de las celdas]]
+SCRIPT_TABLA_DETALLE = """
+const tabla = document.querySelector('table.infoUsuario.infoEmpresa');
+if (!tabla) { return null; }
+return Array.from(tabla.rows).map(fila => [
+    fila.cells.length > 0 && Array.from(fila.cells).every(c => c.tagName === 'TH'),
+    Array.from(fila.cells).map(c => c.textContent)
+]);
+"""
+
+# Sección de la tabla: (encabezados, valores)
+Seccion = Tuple[List[str], List[str]]
+
+
+def limpiar_texto(texto: Optional[str]) -> str:
+    """Colapsa los espacios de un texto de celda, como .text de WebDriver"""
+    return " ".join((texto or "").split())
+
+
+def normalizar_etiqueta(texto: str) -> str:
+    """Etiqueta comparable: minúsculas, sin acentos ni puntuación ('C.I.F.' -> 'cif')"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return " ".join(re.sub(r"[^\w]+", " ", texto.replace(".", "")).split())
+
+
+def secciones_desde_filas(filas: List[Tuple[bool, List[str]]]) -> List[Seccion]:
+    """
+    Agrupa las filas de la tabla en secciones de encabezados y valores
+
+    Args:
+        filas: Filas como (es_encabezado, textos de las celdas)
+
+    Returns:
+        List[Seccion]: Secciones en orden; una fila de valores sin encabezados
+            previos forma una sección con encabezados vacíos
+    """
+    secciones: List[Seccion] = []
+    cabeceras: Optional[List[str]] = None
+    for es_encabezado, celdas in filas:
+        textos = [limpiar_texto(c) for c in celdas]
+        if es_encabezado:
+            if cabeceras is not None:
+                secciones.append((cabeceras, []))
+            cabeceras = textos
+        else:
+            secciones.append((cabeceras or [], textos))
+            cabeceras = None
+    if cabeceras is not None:
+        secciones.append((cabeceras, []))
+    return secciones
+
+
+def leer_secciones_driver(driver) -> List[Seccion]:
+    """
+    Lee la tabla de detalle de la página cargada con una sola llamada al navegador
+
+    Args:
+        driver: WebDriver con la página de detalle cargada
+
+    Returns:
+        List[Seccion]: Secciones de la tabla
+
+    Raises:
+        ValueError: Si la página no tiene la tabla de detalle
+    """
+    filas = driver.execute_script(SCRIPT_TABLA_DETALLE)
+    if filas is None:
+        raise ValueError("No se encontró la tabla de detalle (table.infoUsuario.infoEmpresa)")
+    return secciones_desde_filas(filas)
+
+
+class ExtractorDetalle:
+    """Extrae los campos del esquema con un mapa de índices por disposición de encabezados"""
+
+    def __init__(self, esquema: List[CampoDetalle] = None):
+        """
+        Inicializa el extractor con la caché de disposiciones vacía
+
+        Args:
+            esquema: Campos a extraer (por defecto, ESQUEMA_DETALLE)
+        """
+        self.esquema = esquema or ESQUEMA_DETALLE
+        self.mapas: Dict[Tuple[Tuple[str, ...], ...], Dict[str, Tuple[int, int]]] = {}
+
+    def compilar(self, cabeceras: List[List[str]]) -> Dict[str, Tuple[int, int]]:
+        """
+        Resuelve la sección e índice de cada campo para una disposición de encabezados
+
+        Primero se buscan coincidencias exactas con alguna etiqueta; los campos
+        que no la tienen se buscan como subcadena entre los encabezados que no
+        ha reclamado ningún otro campo. En secciones sin encabezados se usa la
+        posición de respaldo.
+
+        Args:
+            cabeceras: Encabezados de cada sección
+
+        Returns:
+            Dict[str, Tuple[int, int]]: atributo -> (sección, índice) de los campos encontrados
+        """
+        normalizadas = [[normalizar_etiqueta(c) for c in seccion] for seccion in cabeceras]
+        mapa: Dict[str, Tuple[int, int]] = {}
+        usados = set()
+
+        for campo in self.esquema:
+            if campo.seccion >= len(normalizadas):
+                continue
+            etiquetas = [normalizar_etiqueta(e) for e in campo.etiquetas]
+            for i, cabecera in enumerate(normalizadas[campo.seccion]):
+                if cabecera in etiquetas:
+                    mapa[campo.atributo] = (campo.seccion, i)
+                    usados.add((campo.seccion, i))
+                    break
+
+        for campo in self.esquema:
+            if campo.atributo in mapa or campo.seccion >= len(normalizadas):
+                continue
+            encabezados = normalizadas[campo.seccion]
+            if not encabezados:
+                if campo.posicion is not None:
+                    mapa[campo.atributo] = (campo.seccion, campo.posicion)
+                continue
+            etiquetas = [normalizar_etiqueta(e) for e in campo.etiquetas]
+            for i, cabecera in enumerate(encabezados):
+                if (campo.seccion, i) not in usados and any(e in cabecera for e in etiquetas):
+                    mapa[campo.atributo] = (campo.seccion, i)
+                    usados.add((campo.seccion, i))
+                    break
+
+        return mapa
+
+    def mapa(self, secciones: List[Seccion]) -> Dict[str, Tuple[int, int]]:
+        """
+        Mapa de índices de la disposición de la página, compilándolo la primera vez
+
+        Args:
+            secciones: Secciones de la tabla de detalle
+        """
+        huella = tuple(tuple(cabeceras) for cabeceras, _ in secciones)
+        mapa = self.mapas.get(huella)
+        if mapa is None:
+            mapa = self.compilar([cabeceras for cabeceras, _ in secciones])
+            self.mapas[huella] = mapa
+        return mapa
+
+    def extraer(self, secciones: List[Seccion]) -> Dict[str, str]:
+        """
+        Valores de todos los campos del esquema
+
+        Args:
+            secciones: Secciones de la tabla de detalle
+
+        Returns:
+            Dict[str, str]: atributo -> valor ('' si el campo no está en la página)
+        """
+        mapa = self.mapa(secciones)
+        valores = {}
+        for campo in self.esquema:
+            posicion = mapa.get(campo.atributo)
+            if posicion is None:
+                valores[campo.atributo] = ""
+                continue
+            seccion, indice = posicion
+            celdas = secciones[seccion][1]
+            valores[campo.atributo] = celdas[indice] if indice < len(celdas) else ""
+        return valores
+
+    def extraer_de_driver(self, driver) -> Dict[str, str]:
+        """
+        Valores de todos los campos de la página de detalle cargada
+
+        Args:
+            driver: WebDriver con la página de detalle cargada
+
+        Returns:
+            Dict[str, str]: atributo -> valor
+
+        Raises:
+            ValueError: Si la página no tiene la tabla de detalle
+        """
+        return self.extraer(leer_secciones_driver(driver))
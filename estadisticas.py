@@ -0,0 +1,206 @@
+"""
+Estadísticas agregadas del catálogo, mantenidas de forma incremental
+
+El catálogo suma cada empresa que añade (y resta la versión anterior de las
+que cambian) a unos contadores que se guardan en catalogo/estadisticas.json
+junto a los índices: empresas por provincia, localidad, tipo y actividad,
+cuántas tienen email y teléfono y cuántos valores no válidos hay por campo
+según las reglas de normalizacion.py. Consultarlas solo lee ese archivo, sin
+recorrer las empresas.
+
+Uso:
+    python estadisticas.py
+    python estadisticas.py catalogo/ --top 20
+    python estadisticas.py --json
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+from typing import Dict
+
+from esquema_detalle import normalizar_etiqueta
+from models import EmpresaCompleta
+from normalizacion import REGLAS
+
+
+# Campos con recuento por valor
+CAMPOS_AGRUPADOS = ("provincia", "localidad", "tipo", "actividad")
+# Campos cuya tasa de completitud se calcula
+CAMPOS_COMPLETITUD = ("email", "telefono")
+
+SIN_VALOR = "(sin valor)"
+
+
+class EstadisticasCatalogo:
+    """Contadores de las empresas vigentes del catálogo"""
+
+    def __init__(self):
+        """Inicializa los contadores a cero"""
+        self.total = 0
+        # campo -> valor normalizado -> empresas
+        self.valores: Dict[str, Counter] = {c: Counter() for c in CAMPOS_AGRUPADOS}
+        # campo -> valor normalizado -> valor tal como se vio por primera vez
+        self.etiquetas: Dict[str, Dict[str, str]] = {c: {} for c in CAMPOS_AGRUPADOS}
+        # campo -> empresas con el campo relleno
+        self.con_valor: Counter = Counter()
+        # campo -> empresas con un valor no válido en el campo
+        self.invalidos: Counter = Counter()
+        # Empresas con algún valor no válido
+        self.con_errores = 0
+        # Valor -> valor normalizado (provincias, localidades, tipos y actividades se repiten mucho)
+        self._claves: Dict[str, str] = {}
+
+    def _clave(self, valor: str) -> str:
+        """Valor normalizado, calculado una sola vez por valor distinto"""
+        clave = self._claves.get(valor)
+        if clave is None:
+            clave = self._claves[valor] = normalizar_etiqueta(valor)
+        return clave
+
+    def sumar(self, empresa: EmpresaCompleta, signo: int = 1) -> None:
+        """
+        Suma (o resta, con signo -1) una empresa a los contadores
+
+        Args:
+            empresa: Versión de la empresa que entra o sale del catálogo
+            signo: 1 para añadirla, -1 para quitarla
+        """
+        self.total += signo
+        for campo in CAMPOS_AGRUPADOS:
+            valor = getattr(empresa, campo).strip()
+            clave = self._clave(valor)
+            contador = self.valores[campo]
+            contador[clave] += signo
+            if contador[clave] > 0:
+                self.etiquetas[campo].setdefault(clave, valor)
+            else:
+                del contador[clave]
+                self.etiquetas[campo].pop(clave, None)
+
+        for campo in CAMPOS_COMPLETITUD:
+            if getattr(empresa, campo):
+                self.con_valor[campo] += signo
+
+        erronea = False
+        for campo, (normalizar, validar) in REGLAS.items():
+            valor = normalizar(getattr(empresa, campo))
+            if valor and not validar(valor):
+                self.invalidos[campo] += signo
+                erronea = True
+        if erronea:
+            self.con_errores += signo
+
+    def restar(self, empresa: EmpresaCompleta) -> None:
+        """Quita una empresa de los contadores"""
+        self.sumar(empresa, -1)
+
+    def to_dict(self) -> Dict:
+        """Contadores en formato JSON"""
+        return {
+            "total": self.total,
+            "valores": {campo: {self.etiquetas[campo].get(k, k): n for k, n in contador.most_common()}
+                        for campo, contador in self.valores.items()},
+            "claves": {campo: {k: self.etiquetas[campo].get(k, k) for k in contador}
+                       for campo, contador in self.valores.items()},
+            "con_valor": {campo: self.con_valor[campo] for campo in CAMPOS_COMPLETITUD},
+            "invalidos": dict(+self.invalidos),
+            "con_errores": self.con_errores
+        }
+
+    @classmethod
+    def from_dict(cls, datos: Dict) -> 'EstadisticasCatalogo':
+        """Reconstruye los contadores guardados con to_dict"""
+        estadisticas = cls()
+        estadisticas.total = datos["total"]
+        for campo in CAMPOS_AGRUPADOS:
+            claves = datos["claves"].get(campo, {})
+            recuentos = datos["valores"].get(campo, {})
+            for clave, etiqueta in claves.items():
+                estadisticas.valores[campo][clave] = recuentos[etiqueta]
+                estadisticas.etiquetas[campo][clave] = etiqueta
+        estadisticas.con_valor.update(datos["con_valor"])
+        estadisticas.invalidos.update(datos["invalidos"])
+        estadisticas.con_errores = datos["con_errores"]
+        return estadisticas
+
+    def guardar(self, archivo: str, tamano: int) -> None:
+        """
+        Escribe los contadores (escritura atómica)
+
+        Args:
+            archivo: Ruta del JSON de estadísticas
+            tamano: Bytes del catálogo que reflejan los contadores
+        """
+        temporal = f"{archivo}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({"tamano": tamano, **self.to_dict()}, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, archivo)
+
+
+def leer_estadisticas(archivo: str) -> Dict:
+    """
+    Estadísticas guardadas, listas para mostrar
+
+    Args:
+        archivo: catalogo/estadisticas.json
+
+    Returns:
+        Dict: Contadores guardados más las tasas de completitud y de errores (0-1)
+    """
+    with open(archivo, 'r', encoding='utf-8') as f:
+        datos = json.load(f)
+    datos.pop("claves", None)
+    total = datos["total"]
+    datos["completitud"] = {campo: round(datos["con_valor"].get(campo, 0) / total, 4) if total else 0.0
+                            for campo in CAMPOS_COMPLETITUD}
+    datos["tasa_errores"] = round(datos["con_errores"] / total, 4) if total else 0.0
+    return datos
+
+
+def formatear_estadisticas(datos: Dict, top: int = 10) -> str:
+    """Resumen legible de las estadísticas con los valores más frecuentes de cada campo"""
+    lineas = [f"📊 {datos['total']} empresas en el catálogo"]
+    for campo, tasa in datos["completitud"].items():
+        lineas.append(f"   Con {campo}: {datos['con_valor'].get(campo, 0)} ({tasa:.1%})")
+    invalidos = ", ".join(f"{campo} {n}" for campo, n in sorted(datos["invalidos"].items(), key=lambda x: -x[1]))
+    lineas.append(f"   Con valores no válidos: {datos['con_errores']} ({datos['tasa_errores']:.1%})"
+                  f"{' - ' + invalidos if invalidos else ''}")
+    for campo in CAMPOS_AGRUPADOS:
+        valores = list(datos["valores"].get(campo, {}).items())
+        lineas.append(f"\nPor {campo} ({len(valores)} valores distintos):")
+        for valor, n in valores[:top]:
+            lineas.append(f"   {n:>7}  {valor or SIN_VALOR}")
+        if len(valores) > top:
+            lineas.append(f"   {sum(n for _, n in valores[top:]):>7}  (otros {len(valores) - top})")
+    return "\n".join(lineas)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Estadísticas del catálogo de empresas")
+    parser.add_argument("catalogo", nargs="?", default="catalogo", help="Directorio del catálogo")
+    parser.add_argument("--top", type=int, default=10, help="Valores a mostrar por campo")
+    parser.add_argument("--json", action="store_true", help="Mostrar todas las estadísticas en JSON")
+    args = parser.parse_args()
+
+    archivo = os.path.join(args.catalogo, "estadisticas.json")
+    try:
+        datos = leer_estadisticas(archivo)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ No se pudieron leer las estadísticas de {archivo}: {e}\n"
+              f"   Se generan al guardar empresas en el catálogo (python catalogo.py --importar output/)",
+              file=sys.stderr)
+        return 1
+
+    if args.json:
+        json.dump(datos, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print(formatear_estadisticas(datos, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
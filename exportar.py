@@ -0,0 +1,344 @@
+"""
+Exportación de las empresas a CSV y XLSX para los coordinadores
+
+Las empresas se leen en streaming de los archivos de salida o del catálogo
+y cada fila se escribe en cuanto se lee, así que la memoria no depende del
+tamaño del catálogo. Al agrupar por provincia o localidad, cada grupo va a
+su propio archivo CSV o a su propia hoja del XLSX: las filas de cada grupo
+se van acumulando en archivos temporales (con un número acotado de archivos
+abiertos a la vez) y al final se copian en orden.
+
+El XLSX se escribe directamente con zipfile (SpreadsheetML con cadenas en
+línea), sin cargar el libro en memoria ni depender de una librería de Excel.
+
+Uso:
+    python exportar.py output/ -o empresas.csv
+    python exportar.py catalogo/ -o empresas.xlsx --agrupar provincia
+    python exportar.py output/ -o empresas.xlsx --agrupar localidad --sin-duplicados duplicados.json
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+from collections import OrderedDict
+from dataclasses import fields
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Set
+from xml.sax.saxutils import escape
+
+from catalogo import Catalogo
+from duplicados import ids_descartables
+from lectura_salida import iterar_empresas_vigentes, rutas_snapshot
+from models import EmpresaCompleta
+
+
+CAMPOS_EMPRESA = [c.name for c in fields(EmpresaCompleta)]
+
+# Archivos temporales de grupo abiertos a la vez (el resto se reabre al escribir)
+MAX_ABIERTOS = 64
+# Caracteres de control que no admite XML 1.0
+RE_CONTROL_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+RE_NOMBRE_HOJA = re.compile(r"[\[\]:*?/\\]")
+COMILLAS_XML = {'"': "&quot;"}
+
+
+class ArchivosPorGrupo:
+    """Archivos de texto por grupo con un máximo de descriptores abiertos"""
+
+    def __init__(self, ruta_grupo, max_abiertos: int = MAX_ABIERTOS):
+        """
+        Inicializa el conjunto sin archivos abiertos
+
+        Args:
+            ruta_grupo: Función grupo -> ruta del archivo
+            max_abiertos: Archivos abiertos a la vez como máximo
+        """
+        self.ruta_grupo = ruta_grupo
+        self.max_abiertos = max_abiertos
+        # Grupos en el orden en que aparecieron
+        self.grupos: Dict[str, str] = {}
+        self._abiertos: "OrderedDict[str, IO[str]]" = OrderedDict()
+
+    def archivo(self, grupo: str) -> IO[str]:
+        """Archivo del grupo abierto para añadir, cerrando el menos usado si hace falta"""
+        f = self._abiertos.get(grupo)
+        if f is not None:
+            self._abiertos.move_to_end(grupo)
+            return f
+
+        if len(self._abiertos) >= self.max_abiertos:
+            _, antiguo = self._abiertos.popitem(last=False)
+            antiguo.close()
+        ruta = self.grupos.setdefault(grupo, self.ruta_grupo(grupo))
+        f = open(ruta, 'a', encoding='utf-8', newline='')
+        self._abiertos[grupo] = f
+        return f
+
+    def cerrar(self) -> None:
+        """Cierra todos los archivos abiertos"""
+        for f in self._abiertos.values():
+            f.close()
+        self._abiertos.clear()
+
+
+def nombre_archivo(texto: str) -> str:
+    """Texto apto para nombre de archivo"""
+    return re.sub(r"[^\w\-]+", "_", texto).strip("_") or "sin_valor"
+
+
+def filtrar(empresas: Iterable[EmpresaCompleta], descartar: Set[str]) -> Iterator[EmpresaCompleta]:
+    """Empresas salvo las de id descartado"""
+    return (e for e in empresas if e.id_empresa not in descartar)
+
+
+def exportar_csv(empresas: Iterable[EmpresaCompleta], salida: str, campos: List[str],
+                 agrupar: Optional[str] = None) -> Dict[str, int]:
+    """
+    Exporta a CSV (UTF-8 con BOM, para que Excel reconozca los acentos)
+
+    Args:
+        empresas: Empresas a exportar
+        salida: Archivo CSV; al agrupar, prefijo de un archivo por grupo
+        campos: Columnas
+        agrupar: Campo por el que separar en varios archivos (None, un solo archivo)
+
+    Returns:
+        Dict[str, int]: Filas escritas por archivo
+    """
+    filas: Dict[str, int] = {}
+    if not agrupar:
+        with open(salida, 'w', encoding='utf-8-sig', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(campos)
+            filas[salida] = 0
+            for empresa in empresas:
+                escritor.writerow([getattr(empresa, c) for c in campos])
+                filas[salida] += 1
+        return filas
+
+    base, extension = os.path.splitext(salida)
+    archivos = ArchivosPorGrupo(lambda grupo: f"{base}_{nombre_archivo(grupo)}{extension or '.csv'}")
+    try:
+        for empresa in empresas:
+            grupo = getattr(empresa, agrupar) or "sin_valor"
+            nuevo = grupo not in archivos.grupos
+            f = archivos.archivo(grupo)
+            if nuevo:
+                f.write("\ufeff")
+                csv.writer(f).writerow(campos)
+            csv.writer(f).writerow([getattr(empresa, c) for c in campos])
+            ruta = archivos.grupos[grupo]
+            filas[ruta] = filas.get(ruta, 0) + 1
+    finally:
+        archivos.cerrar()
+    return filas
+
+
+# XLSX
+
+def _celda(valor: str) -> str:
+    """Celda de cadena en línea"""
+    texto = escape(RE_CONTROL_XML.sub("", valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _fila(valores: List[str], estilo: int = 0) -> str:
+    """Fila de la hoja; estilo 1 es la cabecera en negrita"""
+    if estilo:
+        celdas = "".join(_celda(v).replace('<c ', f'<c s="{estilo}" ', 1) for v in valores)
+    else:
+        celdas = "".join(_celda(v) for v in valores)
+    return f"<row>{celdas}</row>\n"
+
+
+def nombres_hojas(grupos: Iterable[str]) -> List[str]:
+    """Nombres de hoja válidos (máx. 31 caracteres, sin []:*?/\\) y únicos"""
+    nombres: List[str] = []
+    usados: Set[str] = set()
+    for grupo in grupos:
+        nombre = RE_NOMBRE_HOJA.sub("_", grupo).strip("'")[:31] or "Sin valor"
+        candidato, n = nombre, 2
+        while candidato.lower() in usados:
+            sufijo = f" ({n})"
+            candidato, n = nombre[:31 - len(sufijo)] + sufijo, n + 1
+        usados.add(candidato.lower())
+        nombres.append(candidato)
+    return nombres
+
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{hojas}</Types>'
+)
+RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/></Relationships>'
+)
+ESTILOS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    '</sheetView></sheetViews><sheetData>\n'
+)
+FIN_HOJA = '</sheetData></worksheet>'
+
+
+def _libro(nombres: List[str]) -> str:
+    """xl/workbook.xml con una hoja por nombre"""
+    hojas = "".join(f'<sheet name="{escape(n, COMILLAS_XML)}" sheetId="{i}" r:id="rId{i}"/>'
+                    for i, n in enumerate(nombres, 1))
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{hojas}</sheets></workbook>')
+
+
+def _relaciones_libro(n: int) -> str:
+    """xl/_rels/workbook.xml.rels con las hojas y la hoja de estilos"""
+    hojas = "".join(
+        f'<Relationship Id="rId{i}" '
+        f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, n + 1))
+    estilos = ('<Relationship Id="rIdEstilos" '
+               'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+               'Target="styles.xml"/>')
+    return ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{hojas}{estilos}</Relationships>')
+
+
+def exportar_xlsx(empresas: Iterable[EmpresaCompleta], salida: str, campos: List[str],
+                  agrupar: Optional[str] = None) -> Dict[str, int]:
+    """
+    Exporta a XLSX, con una hoja por grupo si se agrupa
+
+    Args:
+        empresas: Empresas a exportar
+        salida: Archivo XLSX
+        campos: Columnas
+        agrupar: Campo por el que separar en hojas (None, una sola hoja 'Empresas')
+
+    Returns:
+        Dict[str, int]: Filas escritas por hoja
+    """
+    filas: Dict[str, int] = {}
+    with tempfile.TemporaryDirectory(prefix="exportar_") as temporal:
+        archivos = ArchivosPorGrupo(lambda grupo: os.path.join(temporal, f"{len(archivos.grupos)}.xml"))
+        try:
+            for empresa in empresas:
+                grupo = (getattr(empresa, agrupar) or "Sin valor") if agrupar else "Empresas"
+                archivos.archivo(grupo).write(_fila([getattr(empresa, c) for c in campos]))
+                filas[grupo] = filas.get(grupo, 0) + 1
+        finally:
+            archivos.cerrar()
+
+        grupos = sorted(archivos.grupos) if agrupar else list(archivos.grupos)
+        if not grupos:
+            grupos = ["Empresas"]
+        nombres = nombres_hojas(grupos)
+
+        with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as libro:
+            hojas = "".join(
+                f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                for i in range(1, len(grupos) + 1))
+            libro.writestr("[Content_Types].xml", CONTENT_TYPES.format(hojas=hojas))
+            libro.writestr("_rels/.rels", RELS)
+            libro.writestr("xl/workbook.xml", _libro(nombres))
+            libro.writestr("xl/_rels/workbook.xml.rels", _relaciones_libro(len(grupos)))
+            libro.writestr("xl/styles.xml", ESTILOS)
+
+            for i, grupo in enumerate(grupos, 1):
+                with libro.open(f"xl/worksheets/sheet{i}.xml", 'w', force_zip64=True) as hoja:
+                    hoja.write(INICIO_HOJA.encode('utf-8'))
+                    hoja.write(_fila(campos, estilo=1).encode('utf-8'))
+                    ruta = archivos.grupos.get(grupo)
+                    if ruta:
+                        with open(ruta, 'rb') as filas_grupo:
+                            shutil.copyfileobj(filas_grupo, hoja)
+                    hoja.write(FIN_HOJA.encode('utf-8'))
+
+    return {nombre: filas.get(grupo, 0) for nombre, grupo in zip(nombres, grupos)}
+
+
+def iterar_origen(origen: str) -> Iterator[EmpresaCompleta]:
+    """
+    Empresas de un catálogo (directorio con indices.json) o de archivos de salida
+
+    Args:
+        origen: Directorio del catálogo, directorio de salida o archivo JSON
+    """
+    if os.path.exists(os.path.join(origen, "indices.json")):
+        return Catalogo(origen).consultar()
+    return iterar_empresas_vigentes(rutas_snapshot(origen))
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Exporta las empresas a CSV o XLSX")
+    parser.add_argument("origen", nargs="?", default="output",
+                        help="Directorio de salida, archivo JSON o directorio del catálogo")
+    parser.add_argument("-o", "--salida", required=True, help="Archivo .csv o .xlsx")
+    parser.add_argument("--agrupar", choices=("provincia", "localidad"),
+                        help="Un archivo CSV u hoja XLSX por provincia o localidad")
+    parser.add_argument("--campos", default=",".join(CAMPOS_EMPRESA), help="Columnas, separadas por comas")
+    parser.add_argument("--sin-duplicados", metavar="DUPLICADOS_JSON",
+                        help="Omitir las empresas sobrantes de los grupos de duplicados.py")
+    args = parser.parse_args()
+
+    campos = [c.strip() for c in args.campos.split(",") if c.strip()]
+    desconocidos = [c for c in campos if c not in CAMPOS_EMPRESA]
+    if desconocidos:
+        parser.error(f"Campos desconocidos: {', '.join(desconocidos)}")
+
+    descartar: Set[str] = set()
+    if args.sin_duplicados:
+        with open(args.sin_duplicados, 'r', encoding='utf-8') as f:
+            descartar = ids_descartables(json.load(f))
+
+    empresas = filtrar(iterar_origen(args.origen), descartar)
+    try:
+        if args.salida.lower().endswith(".xlsx"):
+            filas = exportar_xlsx(empresas, args.salida, campos, args.agrupar)
+        else:
+            filas = exportar_csv(empresas, args.salida, campos, args.agrupar)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error exportando: {e}", file=sys.stderr)
+        return 1
+
+    print(f"✅ {sum(filas.values())} empresas exportadas en {len(filas)} "
+          f"{'hojas' if args.salida.lower().endswith('.xlsx') else 'archivos'} -> {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,321 @@
+"""
+Búsqueda de las empresas de una localidad sin recorrer el listado completo
+
+Estrategias, de más a menos barata:
+1. Filtro del propio listado (campo del formulario de búsqueda por localidad)
+2. Búsqueda binaria sobre las páginas del listado ordenado por localidad
+3. Recorrido secuencial que se detiene al sobrepasar la localidad buscada
+"""
+import logging
+import re
+import time
+import unicodedata
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlencode, urlsplit, urlunsplit
+
+from configuracion import BASE_URL_SAO
+
+
+# Nombres de campo con los que el formulario del listado puede filtrar por localidad
+PATRON_CAMPO_LOCALIDAD = re.compile(r'localidad|municipio|poblaci', re.IGNORECASE)
+
+# Lee en una sola llamada a WebDriver las filas (enlace, nombre, localidad) de la tabla
+JS_FILAS_LISTADO = """
+var tabla = document.querySelector('table');
+if (!tabla) { return []; }
+var filas = [];
+var trs = tabla.querySelectorAll('tr');
+for (var i = 1; i < trs.length; i++) {
+    var tds = trs[i].querySelectorAll('td');
+    if (tds.length < 7) { continue; }
+    var enlace = trs[i].querySelector('a');
+    filas.push([enlace ? enlace.href : '', tds[1].innerText.trim(), tds[6].innerText.trim()]);
+}
+return filas;
+"""
+
+JS_ENLACES = "return Array.from(document.querySelectorAll('a[href]')).map(function (a) { return [a.href, a.innerText.trim()]; });"
+
+JS_CAMPOS_FORMULARIO = "return Array.from(document.querySelectorAll('form input[name], form select[name]')).map(function (e) { return e.name; });"
+
+logger = logging.getLogger(__name__)
+
+
+def clave_localidad(localidad: str) -> str:
+    """
+    Normaliza una localidad para compararla con el orden del servidor
+
+    Args:
+        localidad: Nombre de la localidad
+
+    Returns:
+        str: Nombre sin tildes y en minúsculas
+    """
+    sin_tildes = unicodedata.normalize('NFKD', localidad)
+    sin_tildes = ''.join(c for c in sin_tildes if not unicodedata.combining(c))
+    return sin_tildes.casefold().strip()
+
+
+class BuscadorLocalidad:
+    """
+    Localiza las empresas de una localidad con el mínimo de cargas de página.
+
+    La estrategia disponible (filtro o parámetro de página) se detecta una vez
+    y se reutiliza para todas las localidades.
+    """
+
+    def __init__(self, base_url: str = BASE_URL_SAO, espera: float = 3.0, tiempos=None):
+        """
+        Inicializa el buscador
+
+        Args:
+            base_url: URL base del sistema SAÓ
+            espera: Segundos de espera tras cada carga de página
+            tiempos: RegistroTiempos del scraper en el que contabilizar las cargas
+        """
+        self.listado_url = f"{base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
+        self.espera = espera
+        self.tiempos = tiempos
+        self.campo_filtro: Optional[str] = None
+        self.filtro_probado = False
+        self.filtro_validado = False
+        self.parametro_pagina: Optional[Tuple[str, int, int]] = None
+        self.ultima_pagina_conocida = 1
+        self.paginacion_probada = False
+        self.cargas_pagina = 0
+
+    def extraer(self, driver, localidad: str) -> List[Dict]:
+        """
+        Obtiene las filas del listado que pertenecen a una localidad
+
+        Args:
+            driver: WebDriver con sesión iniciada
+            localidad: Nombre exacto de la localidad
+
+        Returns:
+            List[Dict]: Filas con id_empresa, nombre, localidad y url_detalle
+        """
+        cargas_inicio = self.cargas_pagina
+
+        filas = self._extraer_con_filtro(driver, localidad)
+        if filas is None:
+            filas = self._extraer_con_busqueda_binaria(driver, localidad)
+        if filas is None:
+            filas = self._extraer_secuencial(driver, localidad)
+
+        logger.info(f"{localidad}: {len(filas)} empresas en {self.cargas_pagina - cargas_inicio} cargas de página")
+        return filas
+
+    def _cargar(self, driver, url: str) -> List[Dict]:
+        """Carga una página del listado y devuelve sus filas"""
+        if self.tiempos:
+            with self.tiempos.medir("pagina_listado"):
+                driver.get(url)
+            self.tiempos.esperar(self.espera)
+        else:
+            driver.get(url)
+            time.sleep(self.espera)
+        self.cargas_pagina += 1
+        return self._leer_filas(driver)
+
+    @staticmethod
+    def _leer_filas(driver) -> List[Dict]:
+        """Lee las filas de la página cargada en una única llamada a WebDriver"""
+        filas = []
+        for href, nombre, localidad in driver.execute_script(JS_FILAS_LISTADO):
+            id_empresa = re.search(r'idEmpresa=(\d+)', href or "")
+            if id_empresa and nombre:
+                filas.append({
+                    "id_empresa": id_empresa.group(1),
+                    "nombre": nombre,
+                    "localidad": localidad,
+                    "url_detalle": href
+                })
+        return filas
+
+    def _seguir_paginas(self, driver, filas: List[Dict], localidad: str) -> List[Dict]:
+        """
+        Acumula filas de la localidad siguiendo el enlace 'Siguiente' mientras
+        la última fila de la página siga siendo de la localidad
+        """
+        coincidentes = [f for f in filas if f['localidad'] == localidad]
+        while filas and filas[-1]['localidad'] == localidad:
+            url_siguiente = self._url_siguiente(driver)
+            if not url_siguiente:
+                break
+            filas = self._cargar(driver, url_siguiente)
+            coincidentes.extend(f for f in filas if f['localidad'] == localidad)
+        return coincidentes
+
+    @staticmethod
+    def _url_siguiente(driver) -> Optional[str]:
+        """URL del enlace a la página siguiente, si existe"""
+        for href, texto in driver.execute_script(JS_ENLACES):
+            if texto in ('Siguiente', '>', '>>') and not href.startswith('javascript'):
+                return href
+        return None
+
+    # Estrategia 1: filtro del servidor
+
+    def _extraer_con_filtro(self, driver, localidad: str) -> Optional[List[Dict]]:
+        """Usa el campo de filtro del formulario; None si el servidor no lo admite"""
+        if self.filtro_probado and not self.campo_filtro:
+            return None
+
+        if not self.filtro_probado:
+            self.filtro_probado = True
+            self._cargar(driver, self.listado_url)
+            campos = driver.execute_script(JS_CAMPOS_FORMULARIO) or []
+            candidatos = [c for c in campos if PATRON_CAMPO_LOCALIDAD.search(c)]
+            if not candidatos:
+                logger.info("El listado no tiene campo de filtro por localidad")
+                return None
+            self.campo_filtro = candidatos[0]
+
+        filas = self._cargar(driver, f"{self.listado_url}&{self.campo_filtro}={quote(localidad)}")
+
+        # El filtro solo se da por bueno si todas las filas devueltas son de la localidad
+        if filas and all(f['localidad'] == localidad for f in filas):
+            self.filtro_validado = True
+            return self._seguir_paginas(driver, filas, localidad)
+
+        if not filas:
+            # Sin filas: localidad vacía si el filtro ya funcionó antes, si no es dudoso
+            return [] if self.filtro_validado else None
+
+        logger.info(f"El parámetro '{self.campo_filtro}' no filtra el listado, se descarta")
+        self.campo_filtro = None
+        return None
+
+    # Estrategia 2: búsqueda binaria sobre el listado ordenado
+
+    def _detectar_paginacion(self, driver) -> None:
+        """
+        Deduce de los enlaces de paginación el parámetro de página y su
+        correspondencia con el número de página
+        """
+        self.paginacion_probada = True
+        if driver.current_url != self.listado_url:
+            self._cargar(driver, self.listado_url)
+
+        valores: Dict[str, List[int]] = {}
+        siguiente: Dict[str, int] = {}
+        for href, texto in driver.execute_script(JS_ENLACES):
+            partes = urlsplit(href)
+            if 'op=4' not in partes.query or 'subop=0' not in partes.query:
+                continue
+            for nombre, valor in parse_qsl(partes.query):
+                if valor.isdigit() and nombre not in ('op', 'subop'):
+                    valores.setdefault(nombre, []).append(int(valor))
+                    if texto in ('Siguiente', '>'):
+                        siguiente[nombre] = int(valor)
+
+        for nombre, numeros in valores.items():
+            if nombre not in siguiente:
+                continue
+            # El valor del enlace 'Siguiente' en la página 1 corresponde a la página 2:
+            # 2 → número de página, 1 → página empezando en 0, otro → desplazamiento por filas
+            paso = siguiente[nombre]
+            if paso == 2:
+                self.parametro_pagina = (nombre, 1, 1)
+            elif paso == 1:
+                self.parametro_pagina = (nombre, 0, 1)
+            else:
+                self.parametro_pagina = (nombre, 0, paso)
+            _, base, incremento = self.parametro_pagina
+            self.ultima_pagina_conocida = max(1, (max(numeros) - base) // incremento + 1)
+            logger.info(f"Paginación detectada: parámetro '{nombre}', "
+                        f"al menos {self.ultima_pagina_conocida} páginas")
+            return
+
+        logger.info("No se pudo deducir el parámetro de paginación del listado")
+
+    def _url_pagina(self, pagina: int) -> str:
+        """URL directa de una página del listado (empezando en 1)"""
+        nombre, base, incremento = self.parametro_pagina
+        partes = urlsplit(self.listado_url)
+        query = [(k, v) for k, v in parse_qsl(partes.query) if k != nombre]
+        query.append((nombre, str(base + (pagina - 1) * incremento)))
+        return urlunsplit(partes._replace(query=urlencode(query)))
+
+    def _extraer_con_busqueda_binaria(self, driver, localidad: str) -> Optional[List[Dict]]:
+        """Busca la primera página de la localidad por bisección; None si no hay paginación directa"""
+        if not self.paginacion_probada:
+            self._detectar_paginacion(driver)
+        if not self.parametro_pagina:
+            return None
+
+        objetivo = clave_localidad(localidad)
+        cache: Dict[int, List[Dict]] = {}
+
+        def pagina(n: int) -> List[Dict]:
+            if n not in cache:
+                cache[n] = self._cargar(driver, self._url_pagina(n))
+            return cache[n]
+
+        def repetida(a: int, b: int) -> bool:
+            """El servidor devuelve la misma página para a y b (recorta los números que se pasan)"""
+            return bool(pagina(a)) and bool(pagina(b)) and pagina(a)[0]['id_empresa'] == pagina(b)[0]['id_empresa']
+
+        # La paginación puede mostrar solo una ventana de páginas: ampliar el límite
+        # mientras la última página conocida siga estando antes de la localidad
+        alto = self.ultima_pagina_conocida
+        anterior = None
+        while pagina(alto) and clave_localidad(pagina(alto)[-1]['localidad']) < objetivo:
+            if anterior is not None and repetida(anterior, alto):
+                # Se ha llegado al final del listado y todo queda antes de la localidad
+                self.ultima_pagina_conocida = max(self.ultima_pagina_conocida, anterior)
+                return []
+            anterior, alto = alto, alto * 2
+        if anterior is not None and repetida(anterior, alto):
+            # Las páginas a partir de 'anterior' son copias de la última: no bisecar sobre ellas
+            alto = anterior
+        self.ultima_pagina_conocida = max(self.ultima_pagina_conocida, alto)
+
+        # Primera página cuya última fila no queda antes de la localidad
+        bajo, encontrada = 1, None
+        while bajo <= alto:
+            medio = (bajo + alto) // 2
+            filas = pagina(medio)
+            if filas and clave_localidad(filas[-1]['localidad']) < objetivo:
+                bajo = medio + 1
+            else:
+                encontrada = medio
+                alto = medio - 1
+
+        if encontrada is None or not pagina(encontrada):
+            return []
+
+        # Si ninguna fila coincide pero la página está en el rango, la intercalación
+        # del servidor no coincide con la nuestra: mejor recorrer secuencialmente
+        filas = pagina(encontrada)
+        if not any(f['localidad'] == localidad for f in filas) and \
+                clave_localidad(filas[0]['localidad']) <= objetivo <= clave_localidad(filas[-1]['localidad']):
+            return None
+
+        coincidentes = []
+        numero = encontrada
+        while True:
+            filas = pagina(numero)
+            if numero > encontrada and repetida(numero - 1, numero):
+                # Pasada la última página el servidor repite la última
+                return coincidentes
+            coincidentes.extend(f for f in filas if f['localidad'] == localidad)
+            if not filas or filas[-1]['localidad'] != localidad:
+                return coincidentes
+            numero += 1
+
+    # Estrategia 3: recorrido secuencial con corte temprano
+
+    def _extraer_secuencial(self, driver, localidad: str) -> List[Dict]:
+        """Recorre el listado ordenado y se detiene al pasar la localidad"""
+        objetivo = clave_localidad(localidad)
+        filas = self._cargar(driver, self.listado_url)
+
+        while filas and clave_localidad(filas[-1]['localidad']) < objetivo:
+            url_siguiente = self._url_siguiente(driver)
+            if not url_siguiente:
+                return []
+            filas = self._cargar(driver, url_siguiente)
+
+        return self._seguir_paginas(driver, filas, localidad)
@@ -0,0 +1,315 @@
+"""
+Índice de búsqueda de texto completo y aproximada sobre las empresas extraídas
+
+Índice invertido token -> empresas sobre nombre, actividad, dirección,
+localidad y nombre del gerente. Los tokens se normalizan sin acentos ni
+mayúsculas, así que 'Valéncia' y 'VALENCIA' coinciden. Cada término de la
+consulta se busca:
+
+- exacto en el índice invertido
+- como prefijo de tokens del vocabulario ('constru' encuentra 'construcciones')
+- si no hay coincidencia exacta, por similitud de trigramas con el vocabulario
+  ('fontaneria' encuentra 'fontanería' y 'fontaneira')
+
+Los scrapers añaden cada empresa al índice según la extraen y, como guardarlo
+reescribe el índice entero, lo guardan cada LOCALIDADES_POR_ESCRITURA
+localidades y al terminar. El índice se puede reconstruir desde output/.
+
+Uso:
+    python indice_busqueda.py "construcciones garcia"
+    python indice_busqueda.py "perez" --campo nombre_gerente
+    python indice_busqueda.py --reconstruir
+"""
+import argparse
+import bisect
+import json
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from esquema_detalle import normalizar_etiqueta
+from lectura_salida import archivos_salida, iterar_empresas
+from models import EmpresaCompleta
+
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_INDEXADOS = ("nombre", "actividad", "direccion", "localidad", "nombre_gerente")
+PALABRAS_VACIAS = {"a", "al", "de", "del", "e", "el", "en", "la", "las", "los", "o", "y"}
+
+# Similitud mínima de trigramas (coeficiente de Dice) para una coincidencia aproximada
+SIMILITUD_MINIMA = 0.5
+# Peso de una coincidencia por prefijo y de una aproximada frente a una exacta
+PESO_PREFIJO = 0.8
+PESO_DIFUSO = 0.6
+# Localidades guardadas en output/ entre dos escrituras del índice durante el scraping
+LOCALIDADES_POR_ESCRITURA = 10
+
+
+def tokenizar(texto: str) -> List[str]:
+    """Tokens en minúsculas y sin acentos ni puntuación, sin palabras vacías"""
+    return [t for t in normalizar_etiqueta(texto).split() if t not in PALABRAS_VACIAS]
+
+
+def trigramas(token: str) -> Set[str]:
+    """Trigramas del token con dos espacios delante y uno detrás"""
+    relleno = f"  {token} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class IndiceBusqueda:
+    """Índice invertido con búsqueda por prefijo y por trigramas, persistido en JSON"""
+
+    def __init__(self, archivo: str = "indice_empresas.json",
+                 localidades_por_escritura: int = LOCALIDADES_POR_ESCRITURA):
+        """
+        Inicializa el índice y carga el guardado, si existe
+
+        Args:
+            archivo: Ruta del archivo JSON del índice
+            localidades_por_escritura: Localidades entre dos escrituras (ver localidad_guardada)
+        """
+        self.archivo = archivo
+        self.localidades_por_escritura = max(1, localidades_por_escritura)
+        self._localidades = 0
+
+        # id_empresa -> textos indexados
+        self.documentos: Dict[str, Dict[str, str]] = {}
+        # token -> {id_empresa: máscara de bits de los campos donde aparece}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        # trigrama -> tokens del vocabulario que lo contienen
+        self.trigramas: Dict[str, Set[str]] = defaultdict(set)
+
+        self._vocabulario: Optional[List[str]] = None
+        self._modificado = False
+
+        self._cargar()
+
+    def _cargar(self) -> None:
+        """Carga el índice guardado y reconstruye el índice de trigramas"""
+        if not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            self.documentos = datos.get("documentos", {})
+            self.postings = datos.get("postings", {})
+            for token in self.postings:
+                for trigrama in trigramas(token):
+                    self.trigramas[trigrama].add(token)
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el índice {self.archivo}: {e}")
+            self.documentos, self.postings = {}, {}
+            self.trigramas.clear()
+
+    def guardar(self) -> None:
+        """Escribe el índice si ha cambiado desde la última vez (escritura atómica)"""
+        if not self._modificado:
+            return
+        temporal = f"{self.archivo}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({"documentos": self.documentos, "postings": self.postings}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporal, self.archivo)
+        self._modificado = False
+
+    def localidad_guardada(self) -> None:
+        """Anota una localidad escrita en output/ y guarda el índice cada localidades_por_escritura"""
+        self._localidades += 1
+        if self._localidades % self.localidades_por_escritura == 0:
+            self.guardar()
+
+    def _tokens_documento(self, textos: Dict[str, str]) -> Dict[str, int]:
+        """token -> máscara de campos de los textos de una empresa"""
+        tokens: Dict[str, int] = {}
+        for bit, campo in enumerate(CAMPOS_INDEXADOS):
+            for token in tokenizar(textos.get(campo, "")):
+                tokens[token] = tokens.get(token, 0) | (1 << bit)
+        return tokens
+
+    def eliminar(self, id_empresa: str) -> None:
+        """
+        Quita una empresa del índice
+
+        Args:
+            id_empresa: Empresa a quitar (si no está, no hace nada)
+        """
+        textos = self.documentos.pop(id_empresa, None)
+        if textos is None:
+            return
+        for token in self._tokens_documento(textos):
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.pop(id_empresa, None)
+            if not ids:
+                del self.postings[token]
+                for trigrama in trigramas(token):
+                    self.trigramas[trigrama].discard(token)
+                self._vocabulario = None
+        self._modificado = True
+
+    def agregar(self, empresa: EmpresaCompleta) -> None:
+        """
+        Añade o actualiza una empresa en el índice
+
+        Args:
+            empresa: Empresa extraída; si ya estaba indexada se sustituye
+        """
+        textos = {campo: getattr(empresa, campo) for campo in CAMPOS_INDEXADOS}
+        if self.documentos.get(empresa.id_empresa) == textos:
+            return
+        self.eliminar(empresa.id_empresa)
+
+        self.documentos[empresa.id_empresa] = textos
+        for token, mascara in self._tokens_documento(textos).items():
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = {}
+                for trigrama in trigramas(token):
+                    self.trigramas[trigrama].add(token)
+                self._vocabulario = None
+            ids[empresa.id_empresa] = mascara
+        self._modificado = True
+
+    def agregar_varias(self, empresas: Iterable[EmpresaCompleta]) -> None:
+        """Añade o actualiza varias empresas"""
+        for empresa in empresas:
+            self.agregar(empresa)
+
+    def _prefijos(self, termino: str) -> List[str]:
+        """Tokens del vocabulario que empiezan por el término (sin contarlo a él)"""
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self.postings)
+        inicio = bisect.bisect_right(self._vocabulario, termino)
+        fin = bisect.bisect_left(self._vocabulario, termino + "\uffff")
+        return self._vocabulario[inicio:fin]
+
+    def _similares(self, termino: str) -> List[Tuple[str, float]]:
+        """Tokens del vocabulario con similitud de trigramas suficiente con el término"""
+        propios = trigramas(termino)
+        comunes: Dict[str, int] = defaultdict(int)
+        for trigrama in propios:
+            for token in self.trigramas.get(trigrama, ()):
+                comunes[token] += 1
+
+        similares = []
+        for token, n in comunes.items():
+            similitud = 2 * n / (len(propios) + len(token) + 1)
+            if similitud >= SIMILITUD_MINIMA:
+                similares.append((token, similitud))
+        return similares
+
+    def _coincidencias(self, termino: str, mascara: int, difuso: bool) -> Dict[str, float]:
+        """id_empresa -> peso de la mejor coincidencia del término en los campos pedidos"""
+        candidatos = [(termino, 1.0)] if termino in self.postings else []
+        if len(termino) >= 3:
+            candidatos += [(token, PESO_PREFIJO) for token in self._prefijos(termino)]
+        if difuso and termino not in self.postings:
+            candidatos += [(token, PESO_DIFUSO * similitud) for token, similitud in self._similares(termino)]
+
+        total = len(self.documentos) or 1
+        pesos: Dict[str, float] = {}
+        for token, peso in candidatos:
+            ids = self.postings[token]
+            peso *= math.log(1 + total / len(ids))
+            for id_empresa, campos in ids.items():
+                if campos & mascara and peso > pesos.get(id_empresa, 0.0):
+                    pesos[id_empresa] = peso
+        return pesos
+
+    def buscar(self, consulta: str, campos: Optional[List[str]] = None, limite: int = 20,
+               difuso: bool = True) -> List[Tuple[str, float]]:
+        """
+        Busca empresas que contengan todos los términos de la consulta
+
+        Args:
+            consulta: Texto libre (nombre parcial, actividad, gerente...)
+            campos: Campos donde buscar (por defecto, todos los indexados)
+            limite: Número máximo de resultados
+            difuso: Si True, los términos sin coincidencia exacta se buscan por trigramas
+
+        Returns:
+            List[Tuple[str, float]]: (id_empresa, puntuación) de mayor a menor puntuación
+        """
+        mascara = 0
+        for bit, campo in enumerate(CAMPOS_INDEXADOS):
+            if campos is None or campo in campos:
+                mascara |= 1 << bit
+
+        puntuaciones: Optional[Dict[str, float]] = None
+        # Primero los términos más selectivos, para que la intersección se reduzca pronto
+        for termino in sorted(set(tokenizar(consulta)), key=lambda t: len(self.postings.get(t, ()))):
+            pesos = self._coincidencias(termino, mascara, difuso)
+            if puntuaciones is None:
+                puntuaciones = pesos
+            else:
+                puntuaciones = {i: p + pesos[i] for i, p in puntuaciones.items() if i in pesos}
+            if not puntuaciones:
+                return []
+
+        if not puntuaciones:
+            return []
+        return sorted(puntuaciones.items(), key=lambda r: (-r[1], r[0]))[:limite]
+
+    def reconstruir(self, directorio: str = "output") -> int:
+        """
+        Rehace el índice desde los archivos de salida
+
+        Args:
+            directorio: Directorio con los empresas_*.json
+
+        Returns:
+            int: Número de empresas indexadas
+        """
+        self.documentos, self.postings = {}, {}
+        self.trigramas.clear()
+        self._vocabulario = None
+        for _, empresa in iterar_empresas(archivos_salida(directorio)):
+            self.agregar(empresa)
+        self._modificado = True
+        return len(self.documentos)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Búsqueda de empresas en el índice local")
+    parser.add_argument("consulta", nargs="?", help="Términos a buscar")
+    parser.add_argument("--campo", action="append", choices=CAMPOS_INDEXADOS,
+                        help="Buscar solo en este campo (se puede repetir)")
+    parser.add_argument("--limite", type=int, default=20, help="Número máximo de resultados")
+    parser.add_argument("--exacto", action="store_true", help="Sin búsqueda aproximada por trigramas")
+    parser.add_argument("--indice", default="indice_empresas.json", help="Archivo del índice")
+    parser.add_argument("--reconstruir", action="store_true", help="Rehacer el índice desde output/")
+    parser.add_argument("--directorio", default="output", help="Directorio de salida para --reconstruir")
+    args = parser.parse_args()
+
+    indice = IndiceBusqueda(args.indice)
+
+    if args.reconstruir:
+        inicio = time.perf_counter()
+        total = indice.reconstruir(args.directorio)
+        indice.guardar()
+        print(f"✅ Índice reconstruido: {total} empresas, {len(indice.postings)} términos "
+              f"({time.perf_counter() - inicio:.1f}s)")
+
+    if not args.consulta:
+        return 0
+
+    inicio = time.perf_counter()
+    resultados = indice.buscar(args.consulta, campos=args.campo, limite=args.limite, difuso=not args.exacto)
+    duracion = (time.perf_counter() - inicio) * 1000
+
+    for id_empresa, puntuacion in resultados:
+        doc = indice.documentos[id_empresa]
+        print(f"{id_empresa:>8}  {puntuacion:5.2f}  {doc['nombre']} | {doc['localidad']} | {doc['actividad']}"
+              f"{' | ' + doc['nombre_gerente'] if doc['nombre_gerente'] else ''}")
+    print(f"{len(resultados)} resultados de {len(indice.documentos)} empresas en {duracion:.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
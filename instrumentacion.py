@@ -0,0 +1,157 @@
+"""
+Medición de tiempos por etapa del scraping con histogramas de latencia
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from configuracion import obtener_escala_esperas
+
+
+class Histograma:
+    """
+    Histograma de latencias con cubetas logarítmicas.
+
+    Cada cubeta cubre un 5% más que la anterior, así que los percentiles se
+    estiman con un error relativo inferior al 5% y la memoria no crece con
+    el número de muestras.
+    """
+
+    FACTOR = 1.05
+    MINIMO = 1e-6
+
+    def __init__(self):
+        """Inicializa un histograma vacío"""
+        self.cubetas: Dict[int, int] = {}
+        self.n = 0
+        self.total = 0.0
+        self.maximo = 0.0
+
+    def registrar(self, segundos: float) -> None:
+        """
+        Añade una muestra
+
+        Args:
+            segundos: Duración medida
+        """
+        indice = int(math.log(max(segundos, self.MINIMO) / self.MINIMO, self.FACTOR))
+        self.cubetas[indice] = self.cubetas.get(indice, 0) + 1
+        self.n += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+
+    def percentil(self, p: float) -> float:
+        """
+        Estima un percentil
+
+        Args:
+            p: Percentil entre 0 y 100
+
+        Returns:
+            float: Duración estimada en segundos (0 si no hay muestras)
+        """
+        if not self.n:
+            return 0.0
+
+        objetivo = max(1, math.ceil(self.n * p / 100))
+        acumulado = 0
+        for indice in sorted(self.cubetas):
+            acumulado += self.cubetas[indice]
+            if acumulado >= objetivo:
+                # Punto medio geométrico de la cubeta, sin pasar del máximo observado
+                return min(self.MINIMO * self.FACTOR ** (indice + 0.5), self.maximo)
+        return self.maximo
+
+    def resumen(self) -> Dict[str, float]:
+        """
+        Resume el histograma
+
+        Returns:
+            Dict[str, float]: n, total, media, p50, p95, p99 y máximo en segundos
+        """
+        return {
+            "n": self.n,
+            "total": round(self.total, 4),
+            "media": round(self.total / self.n, 4) if self.n else 0.0,
+            "p50": round(self.percentil(50), 4),
+            "p95": round(self.percentil(95), 4),
+            "p99": round(self.percentil(99), 4),
+            "max": round(self.maximo, 4)
+        }
+
+
+class RegistroTiempos:
+    """Acumula la duración de cada etapa (login, listado, detalle, esperas, escrituras...)"""
+
+    def __init__(self, escala_esperas: Optional[float] = None):
+        """
+        Inicializa el registro sin etapas
+
+        Args:
+            escala_esperas: Factor aplicado a las esperas (por defecto, SAO_ESCALA_ESPERAS)
+        """
+        self.histogramas: Dict[str, Histograma] = {}
+        self.escala_esperas = obtener_escala_esperas() if escala_esperas is None else escala_esperas
+        self._lock = threading.Lock()
+
+    def registrar(self, etapa: str, segundos: float) -> None:
+        """
+        Registra una duración para una etapa
+
+        Args:
+            etapa: Nombre de la etapa
+            segundos: Duración medida
+        """
+        with self._lock:
+            if etapa not in self.histogramas:
+                self.histogramas[etapa] = Histograma()
+            self.histogramas[etapa].registrar(segundos)
+
+    @contextmanager
+    def medir(self, etapa: str) -> Iterator[None]:
+        """
+        Mide la duración del bloque 'with' (también si lanza una excepción)
+
+        Args:
+            etapa: Nombre de la etapa
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio)
+
+    def esperar(self, segundos: float) -> None:
+        """
+        Espera fija entre peticiones, contabilizada en la etapa 'espera'
+
+        Args:
+            segundos: Segundos a esperar (se multiplican por escala_esperas)
+        """
+        with self.medir("espera"):
+            time.sleep(segundos * self.escala_esperas)
+
+    def resumen(self) -> Dict[str, Dict[str, float]]:
+        """
+        Resumen de todas las etapas
+
+        Returns:
+            Dict[str, Dict[str, float]]: Resumen del histograma de cada etapa
+        """
+        with self._lock:
+            return {etapa: h.resumen() for etapa, h in sorted(self.histogramas.items())}
+
+    def formatear_resumen(self) -> str:
+        """
+        Resumen en forma de tabla para mostrar al final de la ejecución
+
+        Returns:
+            str: Tabla con una línea por etapa
+        """
+        lineas = [f"{'etapa':<20} {'n':>7} {'total(s)':>10} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"]
+        for etapa, r in self.resumen().items():
+            lineas.append(f"{etapa:<20} {r['n']:>7} {r['total']:>10.1f} {r['p50']:>8.3f} "
+                          f"{r['p95']:>8.3f} {r['p99']:>8.3f} {r['max']:>8.3f}")
+        return "\n".join(lineas)
@@ -0,0 +1,141 @@
+"""
+Lectura en streaming de los archivos JSON de salida de los scrapers
+
+Los archivos de output/ pueden tener miles de empresas; en lugar de cargar
+cada archivo entero con json.load, se lee por bloques y se decodifica la
+lista "empresas" objeto a objeto, de modo que la memoria usada no depende
+del tamaño del archivo.
+"""
+import json
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from models import EmpresaCompleta
+
+
+TAM_BLOQUE = 1 << 16
+RE_INICIO_EMPRESAS = re.compile(r'"empresas"\s*:\s*\[')
+# Sufijo _%Y%m%d_%H%M%S con el que los scrapers nombran sus archivos de salida
+RE_FECHA_ARCHIVO = re.compile(r"_(\d{8}_\d{6})\.json$")
+
+
+def _orden_archivo(ruta: str) -> Tuple[str, float]:
+    """Fecha del nombre del archivo y, para desempatar, fecha de modificación"""
+    fecha = RE_FECHA_ARCHIVO.search(ruta)
+    return fecha.group(1) if fecha else "", os.path.getmtime(ruta)
+
+
+def archivos_salida(directorio: str = "output") -> List[str]:
+    """
+    Archivos de empresas de un directorio de salida, del más antiguo al más reciente
+
+    Args:
+        directorio: Directorio con los empresas_*.json generados
+
+    Returns:
+        List[str]: Rutas ordenadas por la fecha _%Y%m%d_%H%M%S del nombre (la
+            fecha de modificación cambia al copiar o restaurar los archivos y
+            solo desempata), de modo que si una empresa aparece en varios
+            archivos la última versión leída es la vigente; los archivos sin
+            fecha en el nombre van primero
+    """
+    return sorted((str(p) for p in Path(directorio).glob("empresas_*.json")), key=_orden_archivo)
+
+
+def rutas_snapshot(ruta: str) -> List[str]:
+    """
+    Archivos que forman un snapshot: un archivo JSON consolidado o un directorio de salida
+
+    Args:
+        ruta: Archivo JSON o directorio con empresas_*.json
+
+    Returns:
+        List[str]: Archivos a leer, en orden
+    """
+    return archivos_salida(ruta) if os.path.isdir(ruta) else [ruta]
+
+
+def iterar_empresas_archivo(ruta: str, tam_bloque: int = TAM_BLOQUE) -> Iterator[EmpresaCompleta]:
+    """
+    Empresas de un archivo de salida, decodificadas una a una
+
+    Args:
+        ruta: Archivo JSON escrito por ScrapingResult.to_json
+        tam_bloque: Caracteres leídos en cada lectura
+
+    Yields:
+        EmpresaCompleta: Empresas en el orden del archivo
+
+    Raises:
+        ValueError: Si el archivo no tiene la lista "empresas" o está truncado
+    """
+    decodificador = json.JSONDecoder()
+    with open(ruta, 'r', encoding='utf-8') as f:
+        buffer = ""
+        while True:
+            inicio = RE_INICIO_EMPRESAS.search(buffer)
+            if inicio:
+                break
+            bloque = f.read(tam_bloque)
+            if not bloque:
+                raise ValueError(f"{ruta} no tiene la lista de empresas")
+            buffer += bloque
+        buffer = buffer[inicio.end():]
+        posicion = 0
+
+        while True:
+            # Saltar espacios y comas entre objetos
+            while posicion < len(buffer) and buffer[posicion] in " \t\r\n,":
+                posicion += 1
+            if posicion < len(buffer) and buffer[posicion] == "]":
+                return
+            try:
+                if posicion >= len(buffer):
+                    raise json.JSONDecodeError("Fin del bloque", buffer, posicion)
+                datos, posicion = decodificador.raw_decode(buffer, posicion)
+            except json.JSONDecodeError:
+                bloque = f.read(tam_bloque)
+                if not bloque:
+                    raise ValueError(f"{ruta} está truncado")
+                buffer = buffer[posicion:] + bloque
+                posicion = 0
+                continue
+            yield EmpresaCompleta.from_dict(datos)
+
+
+def iterar_empresas(rutas: Iterable[str]) -> Iterator[Tuple[str, EmpresaCompleta]]:
+    """
+    Empresas de varios archivos de salida, en orden
+
+    Args:
+        rutas: Archivos JSON de salida
+
+    Yields:
+        Tuple[str, EmpresaCompleta]: (archivo, empresa)
+    """
+    for ruta in rutas:
+        for empresa in iterar_empresas_archivo(ruta):
+            yield ruta, empresa
+
+
+def iterar_empresas_vigentes(rutas: Iterable[str]) -> Iterator[EmpresaCompleta]:
+    """
+    Versión vigente (la última leída) de cada empresa de varios archivos de salida
+
+    Se leen los archivos dos veces: la primera solo para apuntar en qué
+    posición aparece la última versión de cada id_empresa, así que en memoria
+    solo hay un entero por empresa.
+
+    Args:
+        rutas: Archivos JSON de salida, del más antiguo al más reciente
+
+    Yields:
+        EmpresaCompleta: Una versión por id_empresa
+    """
+    rutas = list(rutas)
+    ultima = {empresa.id_empresa: orden for orden, (_, empresa) in enumerate(iterar_empresas(rutas))}
+    for orden, (_, empresa) in enumerate(iterar_empresas(rutas)):
+        if ultima[empresa.id_empresa] == orden:
+            yield empresa
@@ -0,0 +1,162 @@
+"""
+Logging no bloqueante en JSONL con rotación, compresión y muestreo de los bucles
+
+Los scrapers solo encolan los registros (QueueHandler); un hilo en segundo plano
+(QueueListener) los formatea y los escribe en consola y en un archivo JSONL que
+rota al llegar a MAX_BYTES y comprime con gzip las copias antiguas.
+
+Los mensajes que se emiten por cada fila o empresa se marcan con
+extra=MUESTREO: a nivel INFO se deja pasar como mucho uno por línea de código
+cada SAO_LOG_MUESTREO segundos, indicando cuántos se omitieron.
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional, Tuple
+
+from configuracion import obtener_config_logs
+
+
+# Tamaño máximo de cada archivo de log y número de copias comprimidas que se conservan
+MAX_BYTES = 10 * 1024 * 1024
+COPIAS = 5
+
+# extra= de los mensajes que se repiten por cada fila o empresa
+MUESTREO = {"muestreo": True}
+
+# Atributos propios de LogRecord, que no se copian como campos adicionales
+ATRIBUTOS_ESTANDAR = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "muestreo"}
+
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+class FormateadorJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos pasados en extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        datos = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        for clave, valor in vars(record).items():
+            if clave not in ATRIBUTOS_ESTANDAR:
+                datos[clave] = valor
+        if record.exc_info:
+            datos["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FiltroMuestreo(logging.Filter):
+    """
+    Limita los mensajes marcados con MUESTREO a uno por línea de código y
+    intervalo; los de nivel WARNING o superior pasan siempre
+    """
+
+    def __init__(self, intervalo: float):
+        """
+        Args:
+            intervalo: Segundos mínimos entre dos mensajes de la misma línea (0 desactiva el muestreo)
+        """
+        super().__init__()
+        self.intervalo = intervalo
+        self._estado: Dict[Tuple[str, int], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not self.intervalo or not getattr(record, "muestreo", False) or record.levelno >= logging.WARNING:
+            return True
+
+        clave = (record.pathname, record.lineno)
+        with self._lock:
+            ultimo, omitidos = self._estado.get(clave, (0.0, 0))
+            if record.created - ultimo < self.intervalo:
+                self._estado[clave] = (ultimo, omitidos + 1)
+                return False
+            self._estado[clave] = (record.created, 0)
+
+        if omitidos:
+            record.omitidos = omitidos
+        return True
+
+
+class QueueHandlerLocal(QueueHandler):
+    """
+    QueueHandler para una cola del mismo proceso: no formatea el registro al
+    encolarlo, así el coste de formatear recae en el hilo del listener
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def _nombre_rotado(nombre: str) -> str:
+    """Nombre de las copias rotadas (comprimidas)"""
+    return f"{nombre}.gz"
+
+
+def _rotar_comprimiendo(origen: str, destino: str) -> None:
+    """Comprime con gzip el archivo que se rota"""
+    with open(origen, 'rb') as f_origen, gzip.open(destino, 'wb') as f_destino:
+        shutil.copyfileobj(f_origen, f_destino)
+    os.remove(origen)
+
+
+def configurar_logging(archivo: str) -> None:
+    """
+    Configura el logging del proceso (solo la primera vez que se llama)
+
+    Args:
+        archivo: Archivo JSONL de log
+    """
+    global _listener
+
+    with _lock:
+        if _listener is not None:
+            return
+
+        nivel, intervalo_muestreo = obtener_config_logs()
+
+        manejador_archivo = RotatingFileHandler(archivo, maxBytes=MAX_BYTES, backupCount=COPIAS, encoding='utf-8')
+        manejador_archivo.namer = _nombre_rotado
+        manejador_archivo.rotator = _rotar_comprimiendo
+        manejador_archivo.setFormatter(FormateadorJSON())
+
+        manejador_consola = logging.StreamHandler()
+        manejador_consola.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+        cola = queue.SimpleQueue()
+        manejador_cola = QueueHandlerLocal(cola)
+        manejador_cola.addFilter(FiltroMuestreo(intervalo_muestreo))
+
+        raiz = logging.getLogger()
+        for manejador in list(raiz.handlers):
+            raiz.removeHandler(manejador)
+        raiz.addHandler(manejador_cola)
+        raiz.setLevel(nivel)
+
+        _listener = QueueListener(cola, manejador_archivo, manejador_consola, respect_handler_level=True)
+        _listener.start()
+        atexit.register(detener_logging)
+
+
+def detener_logging() -> None:
+    """Vacía la cola de logs y detiene el hilo de escritura"""
+    global _listener
+
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for manejador in _listener.handlers:
+            manejador.close()
+        _listener = None
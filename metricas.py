@@ -0,0 +1,309 @@
+"""
+Exportación de métricas del scraping en formato de texto de Prometheus
+
+Las métricas se publican en un archivo (para el textfile collector de
+node_exporter) y/o en un endpoint HTTP local /metrics, según SAO_METRICAS_ARCHIVO
+y SAO_METRICAS_PUERTO. Los contadores de páginas y logins se derivan del
+RegistroTiempos del scraper, así que solo hace falta notificar las empresas
+completadas, los errores y la cola pendiente.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from configuracion import obtener_config_metricas
+from instrumentacion import RegistroTiempos
+
+
+# Etapas de RegistroTiempos que corresponden a una carga de página
+ETAPAS_PAGINA = {"pagina_listado": "listado", "navegacion_detalle": "detalle"}
+
+# Ventana sobre la que se calcula la tasa de peticiones actual
+VENTANA_TASA = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+class MetricasCrawl:
+    """Contadores y medidores de un scraping en curso"""
+
+    def __init__(self, motor: str, tiempos: RegistroTiempos, archivo: Optional[str] = None,
+                 puerto: Optional[int] = None, intervalo: float = 15.0):
+        """
+        Inicializa las métricas
+
+        Args:
+            motor: Nombre del scraper (etiqueta 'motor' de todas las series)
+            tiempos: RegistroTiempos del scraper, del que se derivan páginas y logins
+            archivo: Archivo .prom a reescribir periódicamente (None para no escribirlo)
+            puerto: Puerto del endpoint HTTP /metrics (None para no publicarlo)
+            intervalo: Segundos entre actualizaciones del archivo
+        """
+        self.motor = motor
+        self.tiempos = tiempos
+        self.archivo = archivo
+        self.puerto = puerto
+        self.intervalo = intervalo
+
+        self.empresas_completadas = 0
+        self.errores: Counter = Counter()
+        self.cola_pendiente = 0
+        self.inicio = time.time()
+        self.ultima_empresa: Optional[float] = None
+        self.progreso = None
+        self.recursos = None
+
+        self._muestras_paginas = deque()
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @classmethod
+    def desde_entorno(cls, motor: str, tiempos: RegistroTiempos) -> 'MetricasCrawl':
+        """
+        Crea las métricas con el archivo y el puerto configurados en el entorno y las arranca
+
+        Args:
+            motor: Nombre del scraper
+            tiempos: RegistroTiempos del scraper
+        """
+        archivo, puerto = obtener_config_metricas()
+        return cls(motor, tiempos, archivo=archivo, puerto=puerto).iniciar()
+
+    # Notificaciones desde el scraper
+
+    def empresa_completada(self) -> None:
+        """Registra una empresa con el detalle extraído"""
+        with self._lock:
+            self.empresas_completadas += 1
+            self.ultima_empresa = time.time()
+
+    def registrar_error(self, error: Exception) -> None:
+        """
+        Registra un error, agrupado por tipo de excepción
+
+        Args:
+            error: Excepción capturada
+        """
+        with self._lock:
+            self.errores[type(error).__name__] += 1
+
+    def establecer_cola(self, pendientes: int) -> None:
+        """
+        Actualiza el número de empresas pendientes del lote en curso
+
+        Args:
+            pendientes: Empresas que quedan por procesar
+        """
+        self.cola_pendiente = max(0, pendientes)
+
+    # Exportación
+
+    def _paginas(self, resumen: Dict) -> Dict[str, int]:
+        """Páginas cargadas por tipo, según los histogramas de tiempos"""
+        return {tipo: resumen.get(etapa, {}).get("n", 0) for etapa, tipo in ETAPAS_PAGINA.items()}
+
+    def _tasa_peticiones(self, total_paginas: int) -> float:
+        """Páginas por segundo en la última ventana, a partir de muestras periódicas"""
+        ahora = time.time()
+        with self._lock:
+            self._muestras_paginas.append((ahora, total_paginas))
+            while len(self._muestras_paginas) > 2 and ahora - self._muestras_paginas[0][0] > VENTANA_TASA:
+                self._muestras_paginas.popleft()
+            t0, p0 = self._muestras_paginas[0]
+        return (total_paginas - p0) / (ahora - t0) if ahora > t0 else 0.0
+
+    def _rss_navegador(self) -> Optional[int]:
+        """Memoria residente del driver y el navegador según la última muestra del monitor de recursos"""
+        if self.recursos is not None and self.recursos.ultima_muestra:
+            return self.recursos.ultima_muestra["rss_bytes"]
+        return None
+
+    def exportar_texto(self) -> str:
+        """
+        Genera las métricas en formato de texto de Prometheus
+
+        Returns:
+            str: Exposición completa, una serie por línea
+        """
+        resumen = self.tiempos.resumen()
+        paginas = self._paginas(resumen)
+        logins = resumen.get("login", {}).get("n", 0)
+        reciclajes = resumen.get("reciclaje", {}).get("n", 0)
+        # Los logins tras reciclar el navegador no son pérdidas de sesión
+        relogins = max(0, logins - 1 - reciclajes) + resumen.get("reintento", {}).get("n", 0)
+        etiqueta = f'motor="{self.motor}"'
+
+        with self._lock:
+            errores = dict(self.errores)
+            completadas = self.empresas_completadas
+            ultima = self.ultima_empresa
+
+        lineas = [
+            "# HELP sao_paginas_obtenidas_total Páginas cargadas en el navegador",
+            "# TYPE sao_paginas_obtenidas_total counter",
+        ]
+        lineas += [f'sao_paginas_obtenidas_total{{{etiqueta},tipo="{tipo}"}} {n}' for tipo, n in paginas.items()]
+
+        lineas += [
+            "# HELP sao_empresas_completadas_total Empresas con el detalle extraído",
+            "# TYPE sao_empresas_completadas_total counter",
+            f"sao_empresas_completadas_total{{{etiqueta}}} {completadas}",
+            "# HELP sao_errores_total Errores por tipo de excepción",
+            "# TYPE sao_errores_total counter",
+        ]
+        lineas += [f'sao_errores_total{{{etiqueta},tipo="{tipo}"}} {n}' for tipo, n in sorted(errores.items())]
+
+        lineas += [
+            "# HELP sao_logins_total Inicios de sesión (incluida la restauración de cookies)",
+            "# TYPE sao_logins_total counter",
+            f"sao_logins_total{{{etiqueta}}} {logins}",
+            "# HELP sao_relogins_total Inicios de sesión repetidos tras perder la sesión",
+            "# TYPE sao_relogins_total counter",
+            f"sao_relogins_total{{{etiqueta}}} {relogins}",
+            "# HELP sao_reciclajes_navegador_total Reinicios del navegador por páginas cargadas o memoria",
+            "# TYPE sao_reciclajes_navegador_total counter",
+            f"sao_reciclajes_navegador_total{{{etiqueta}}} {reciclajes}",
+            "# HELP sao_vigilante_disparos_total Navegadores colgados terminados por el vigilante",
+            "# TYPE sao_vigilante_disparos_total counter",
+            f"sao_vigilante_disparos_total{{{etiqueta}}} {resumen.get('vigilante', {}).get('n', 0)}",
+            "# HELP sao_cola_pendiente Empresas pendientes del lote en curso",
+            "# TYPE sao_cola_pendiente gauge",
+            f"sao_cola_pendiente{{{etiqueta}}} {self.cola_pendiente}",
+            "# HELP sao_tasa_peticiones Páginas por segundo en el último minuto",
+            "# TYPE sao_tasa_peticiones gauge",
+            f"sao_tasa_peticiones{{{etiqueta}}} {self._tasa_peticiones(sum(paginas.values())):.4f}",
+            "# HELP sao_inicio_timestamp_segundos Inicio del scraping (epoch)",
+            "# TYPE sao_inicio_timestamp_segundos gauge",
+            f"sao_inicio_timestamp_segundos{{{etiqueta}}} {self.inicio:.0f}",
+        ]
+
+        if ultima is not None:
+            lineas += [
+                "# HELP sao_ultima_empresa_timestamp_segundos Última empresa completada (epoch)",
+                "# TYPE sao_ultima_empresa_timestamp_segundos gauge",
+                f"sao_ultima_empresa_timestamp_segundos{{{etiqueta}}} {ultima:.0f}",
+            ]
+
+        if self.progreso is not None:
+            progreso = self.progreso.resumen()
+            if progreso["total"] is not None:
+                lineas += [
+                    "# HELP sao_empresas_total Empresas a procesar en total (estimado si no hay recuento)",
+                    "# TYPE sao_empresas_total gauge",
+                    f"sao_empresas_total{{{etiqueta}}} {progreso['total']}",
+                ]
+            if progreso["eta_segundos"] is not None:
+                lineas += [
+                    "# HELP sao_eta_segundos Tiempo estimado hasta completar el total",
+                    "# TYPE sao_eta_segundos gauge",
+                    f"sao_eta_segundos{{{etiqueta}}} {progreso['eta_segundos']}",
+                ]
+
+        rss = self._rss_navegador()
+        if rss is not None:
+            lineas += [
+                "# HELP sao_rss_navegador_bytes Memoria residente del driver y el navegador",
+                "# TYPE sao_rss_navegador_bytes gauge",
+                f"sao_rss_navegador_bytes{{{etiqueta}}} {rss}",
+            ]
+
+        muestra = self.recursos.ultima_muestra if self.recursos is not None else None
+        if muestra:
+            lineas += [
+                "# HELP sao_cpu_navegador_porcentaje CPU del driver y el navegador (suma de procesos)",
+                "# TYPE sao_cpu_navegador_porcentaje gauge",
+                f"sao_cpu_navegador_porcentaje{{{etiqueta}}} {muestra['cpu_percent']}",
+                "# HELP sao_descriptores_navegador Descriptores abiertos por el driver y el navegador",
+                "# TYPE sao_descriptores_navegador gauge",
+                f"sao_descriptores_navegador{{{etiqueta}}} {muestra['fds']}",
+                "# HELP sao_procesos_navegador Procesos del árbol del driver",
+                "# TYPE sao_procesos_navegador gauge",
+                f"sao_procesos_navegador{{{etiqueta}}} {muestra['procesos']}",
+            ]
+
+        lineas += [
+            "# HELP sao_duracion_etapa_segundos Duración de cada etapa del scraping",
+            "# TYPE sao_duracion_etapa_segundos summary",
+        ]
+        for etapa, r in resumen.items():
+            serie = f'{etiqueta},etapa="{etapa}"'
+            for cuantil, clave in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+                lineas.append(f'sao_duracion_etapa_segundos{{{serie},quantile="{cuantil}"}} {r[clave]}')
+            lineas.append(f"sao_duracion_etapa_segundos_sum{{{serie}}} {r['total']}")
+            lineas.append(f"sao_duracion_etapa_segundos_count{{{serie}}} {r['n']}")
+
+        return "\n".join(lineas) + "\n"
+
+    def escribir_archivo(self) -> None:
+        """Reescribe el archivo de métricas de forma atómica"""
+        if not self.archivo:
+            return
+        try:
+            temporal = f"{self.archivo}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                f.write(self.exportar_texto())
+            os.replace(temporal, self.archivo)
+        except Exception as e:
+            logger.warning(f"Error escribiendo métricas en {self.archivo}: {e}")
+
+    def _bucle(self) -> None:
+        """Actualiza el archivo (y las muestras de la tasa) cada intervalo"""
+        while not self._parar.wait(self.intervalo):
+            if self.archivo:
+                self.escribir_archivo()
+            else:
+                self.exportar_texto()
+
+    def _crear_handler(self):
+        """Handler HTTP que sirve /metrics"""
+        metricas = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, formato, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.exportar_texto().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        return Handler
+
+    def iniciar(self) -> 'MetricasCrawl':
+        """Arranca el endpoint HTTP y la actualización periódica, si están configurados"""
+        if self.puerto is not None:
+            try:
+                self._httpd = ThreadingHTTPServer(("127.0.0.1", self.puerto), self._crear_handler())
+                self._httpd.daemon_threads = True
+                threading.Thread(target=self._httpd.serve_forever, name="metricas-http", daemon=True).start()
+                logger.info(f"Métricas en http://127.0.0.1:{self.puerto}/metrics")
+            except OSError as e:
+                logger.warning(f"No se pudo abrir el puerto de métricas {self.puerto}: {e}")
+                self._httpd = None
+
+        if self.archivo or self._httpd:
+            self._hilo = threading.Thread(target=self._bucle, name="metricas", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Escribe las métricas finales y detiene el endpoint"""
+        self._parar.set()
+        if self.archivo:
+            self.escribir_archivo()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
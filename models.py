@@ -1,16 +1,23 @@
 """
 Modelos de datos para el scraper de empresas SAÓ FCT
 """
-from dataclasses import dataclass, asdict
-from typing import Optional
+from dataclasses import dataclass, asdict, fields
+from typing import Iterable, Optional
+import hashlib
 import json
 from datetime import datetime
 
 
+# Campos que cambian en cada visita de la empresa a la plataforma y no son datos de la empresa
+CAMPOS_VOLATILES = ("ultimo_acceso",)
+
+
 @dataclass
 class EmpresaCompleta:
     """Modelo de datos para una empresa completa con todos los campos"""
     id_empresa: str
+    registrado: str = ""
+    ultimo_acceso: str = ""
     cif: str = ""
     nombre: str = ""
     direccion: str = ""
@@ -34,6 +41,20 @@ class EmpresaCompleta:
         """Crea un objeto desde un diccionario"""
         return cls(**data)
 
+    def hash_contenido(self, excluir: Iterable[str] = ()) -> str:
+        """
+        Huella estable del contenido de la empresa
+
+        Args:
+            excluir: Campos que no cuentan (id_empresa nunca cuenta)
+
+        Returns:
+            str: blake2b de 128 bits en hexadecimal de los valores en orden de campos
+        """
+        excluir = set(excluir)
+        valores = [getattr(self, c.name) for c in fields(self) if c.name != "id_empresa" and c.name not in excluir]
+        return hashlib.blake2b("\x1f".join(valores).encode("utf-8"), digest_size=16).hexdigest()
+
 
 @dataclass
 class ScrapingResult:
@@ -43,6 +64,10 @@ class ScrapingResult:
     total_empresas: int
     errores: int = 0
     tiempo_total: Optional[str] = None
+    metricas: Optional[dict] = None
+    validacion: Optional[dict] = None
+    # Empresas procesadas que no se escriben porque no han cambiado desde la última escritura
+    sin_cambios: int = 0
 
     def to_json(self, filepath: str) -> None:
         """Exporta el resultado a un archivo JSON"""
@@ -51,7 +76,10 @@ class ScrapingResult:
                 "timestamp": self.timestamp,
                 "total_empresas": self.total_empresas,
                 "errores": self.errores,
-                "tiempo_total": self.tiempo_total
+                "tiempo_total": self.tiempo_total,
+                "metricas": self.metricas,
+                "validacion": self.validacion,
+                "sin_cambios": self.sin_cambios
             },
             "empresas": [empresa.to_dict() for empresa in self.empresas]
         }
@@ -73,6 +101,9 @@ class ScrapingResult:
             timestamp=metadata['timestamp'],
             total_empresas=metadata['total_empresas'],
             errores=metadata.get('errores', 0),
-            tiempo_total=metadata.get('tiempo_total')
+            tiempo_total=metadata.get('tiempo_total'),
+            metricas=metadata.get('metricas'),
+            validacion=metadata.get('validacion'),
+            sin_cambios=metadata.get('sin_cambios', 0)
         )
 
@@ -3,7 +3,6 @@ Script de monitoreo para detectar cierres inesperados del navegador
 """
 import os
 import time
-import psutil
 from dotenv import load_dotenv
 from selenium import webdriver
 from selenium.webdriver.firefox.service import Service as FirefoxService
@@ -12,11 +11,15 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from configuracion import obtener_base_url
+from monitor_recursos import MonitorRecursos
+
 def monitorear_navegador():
     """Monitorea el estado del navegador durante el scraping"""
     try:
         # Cargar credenciales
         load_dotenv()
+        base_url = obtener_base_url()
         usuario = os.getenv('SAO_USUARIO')
         password = os.getenv('SAO_PASSWORD')
         
@@ -38,7 +41,7 @@ def monitorear_navegador():
         print("Realizando login...")
         
         # Login
-        login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+        login_url = f"{base_url}/index.php?op=4&subop=0"
         driver.get(login_url)
         time.sleep(3)
         
@@ -57,27 +60,31 @@ def monitorear_navegador():
         
         print("Login exitoso")
         
-        # Monitorear durante 5 minutos
+        # Monitorear durante 5 minutos el árbol de procesos del propio driver
         print("Monitoreando navegador durante 5 minutos...")
         print("Presiona Ctrl+C para detener")
         
-        for i in range(300):  # 5 minutos
+        monitor = MonitorRecursos(lambda: driver, archivo="recursos_monitor.jsonl", intervalo=0)
+        
+        for i in range(0, 300, 10):  # 5 minutos, una muestra cada 10 segundos
             try:
                 # Verificar si el driver sigue activo
                 current_url = driver.current_url
+                muestra = monitor.muestrear()
+                if muestra is None:
+                    print(f"Minuto {i//60}:{i%60:02d} - El proceso del driver ya no existe")
+                    break
                 print(f"Minuto {i//60}:{i%60:02d} - URL: {current_url}")
-                
-                # Verificar procesos de Firefox
-                firefox_processes = [p for p in psutil.process_iter(['pid', 'name']) if 'firefox' in p.info['name'].lower()]
-                print(f"  Procesos Firefox activos: {len(firefox_processes)}")
+                print(f"  Procesos: {muestra['procesos']}, RSS: {muestra['rss_bytes'] / (1024 * 1024):.1f} MB, "
+                      f"CPU: {muestra['cpu_percent']}%, descriptores: {muestra['fds']}")
                 
                 # Navegar a una página cada 30 segundos para mantener la sesión
                 if i % 30 == 0 and i > 0:
                     print("  Navegando para mantener sesión...")
-                    driver.get("https://foremp.edu.gva.es/index.php?op=4&subop=0")
+                    driver.get(f"{base_url}/index.php?op=4&subop=0")
                     time.sleep(2)
                 
-                time.sleep(1)
+                time.sleep(10)
                 
             except Exception as e:
                 print(f"Error en monitoreo: {e}")
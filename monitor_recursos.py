@@ -0,0 +1,175 @@
+"""
+Monitor en segundo plano de los recursos del navegador durante el scraping
+
+Muestrea solo el árbol de procesos del propio driver (geckodriver y los
+procesos de Firefox que cuelgan de él): memoria residente, CPU y descriptores
+abiertos. Cada muestra se añade como una línea a un archivo JSONL, de modo que
+queda una serie temporal de toda la ejecución.
+"""
+import json
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from configuracion import obtener_intervalo_monitor
+
+
+logger = logging.getLogger(__name__)
+
+
+class MonitorRecursos:
+    """Serie temporal de RSS, CPU y descriptores del árbol de procesos del driver"""
+
+    def __init__(self, obtener_driver: Callable, archivo: Optional[str] = None, intervalo: float = 10.0):
+        """
+        Inicializa el monitor
+
+        Args:
+            obtener_driver: Devuelve el WebDriver actual (puede cambiar si se recicla el navegador)
+            archivo: Archivo JSONL donde se añaden las muestras (None para no escribirlas)
+            intervalo: Segundos entre muestras (0 desactiva el muestreo periódico)
+        """
+        self.obtener_driver = obtener_driver
+        self.archivo = archivo
+        self.intervalo = intervalo
+
+        self.ultima_muestra: Optional[Dict] = None
+        self.muestras = 0
+        self.rss_pico = 0
+
+        # Procesos ya vistos: cpu_percent() mide desde la llamada anterior sobre el mismo objeto
+        self._procesos: Dict[int, psutil.Process] = {}
+        self._pid_raiz: Optional[int] = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    @classmethod
+    def desde_entorno(cls, motor: str, obtener_driver: Callable) -> 'MonitorRecursos':
+        """
+        Crea el monitor con el intervalo configurado en el entorno y lo arranca
+
+        Args:
+            motor: Nombre del scraper (el archivo será recursos_<motor>.jsonl)
+            obtener_driver: Devuelve el WebDriver actual
+        """
+        return cls(obtener_driver, archivo=f"recursos_{motor}.jsonl", intervalo=obtener_intervalo_monitor()).iniciar()
+
+    def _pid_driver(self) -> Optional[int]:
+        """PID del proceso geckodriver/chromedriver del driver actual"""
+        try:
+            driver = self.obtener_driver()
+            proceso = driver.service.process if driver else None
+            return proceso.pid if proceso and proceso.poll() is None else None
+        except Exception:
+            return None
+
+    def _arbol(self, pid: int) -> List[psutil.Process]:
+        """Proceso raíz y descendientes, reutilizando los objetos ya conocidos"""
+        if pid != self._pid_raiz:
+            self._procesos = {}
+            self._pid_raiz = pid
+
+        raiz = self._procesos.get(pid) or psutil.Process(pid)
+        arbol = [raiz] + raiz.children(recursive=True)
+        self._procesos = {p.pid: self._procesos.get(p.pid, p) for p in arbol}
+        return list(self._procesos.values())
+
+    def muestrear(self) -> Optional[Dict]:
+        """
+        Toma una muestra del árbol de procesos del driver
+
+        Returns:
+            Optional[Dict]: Muestra (ts, pid, procesos, rss_bytes, cpu_percent, fds),
+                o None si no hay navegador en marcha
+        """
+        pid = self._pid_driver()
+        if pid is None:
+            return None
+
+        with self._lock:
+            try:
+                procesos = self._arbol(pid)
+            except psutil.Error:
+                return None
+
+            rss = cpu = fds = 0
+            vivos = 0
+            for proceso in procesos:
+                try:
+                    with proceso.oneshot():
+                        rss += proceso.memory_info().rss
+                        # Suma de todos los procesos: puede superar 100 con varios núcleos
+                        cpu += proceso.cpu_percent(interval=None)
+                        fds += proceso.num_fds() if hasattr(proceso, "num_fds") else proceso.num_handles()
+                    vivos += 1
+                except psutil.Error:
+                    continue
+
+            muestra = {
+                "ts": datetime.now().isoformat(timespec="seconds"),
+                "pid": pid,
+                "procesos": vivos,
+                "rss_bytes": rss,
+                "cpu_percent": round(cpu, 1),
+                "fds": fds,
+            }
+            self.ultima_muestra = muestra
+            self.muestras += 1
+            self.rss_pico = max(self.rss_pico, rss)
+
+        self._escribir(muestra)
+        return muestra
+
+    def _escribir(self, muestra: Dict) -> None:
+        """Añade una muestra al archivo JSONL"""
+        if not self.archivo:
+            return
+        try:
+            with open(self.archivo, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(muestra) + "\n")
+        except Exception as e:
+            logger.warning(f"Error escribiendo muestra de recursos en {self.archivo}: {e}")
+
+    def resumen(self) -> Dict:
+        """
+        Resumen de la ejecución
+
+        Returns:
+            Dict: Número de muestras, pico de RSS y última muestra
+        """
+        return {
+            "muestras": self.muestras,
+            "rss_pico_bytes": self.rss_pico,
+            "ultima": self.ultima_muestra
+        }
+
+    def _bucle(self) -> None:
+        """Toma una muestra cada intervalo hasta que se detiene el monitor"""
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.muestrear()
+            except Exception as e:
+                logger.warning(f"Error muestreando recursos del navegador: {e}")
+
+    def iniciar(self) -> 'MonitorRecursos':
+        """Arranca el muestreo periódico, si el intervalo no es 0"""
+        if self.intervalo > 0:
+            self._hilo = threading.Thread(target=self._bucle, name="monitor-recursos", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Toma una última muestra y detiene el muestreo"""
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None
+        if self.intervalo > 0:
+            self.muestrear()
+        if self.muestras:
+            logger.info(f"Recursos del navegador: {self.muestras} muestras, "
+                        f"pico de RSS {self.rss_pico / (1024 * 1024):.1f} MB")
@@ -0,0 +1,231 @@
+"""
+Normalización y validación por lotes de las empresas extraídas
+
+Trabaja por columnas: cada campo de todas las empresas se une en una sola
+cadena y se normaliza de una vez con tablas de traducción y expresiones
+regulares precompiladas, en lugar de recorrer registro a registro todos los
+campos; después se valida cada valor distinto. Se comprueban:
+
+- CIF (dígito o letra de control), NIF y NIE (letra de control)
+- código postal (se completan con ceros los que perdieron el 0 inicial; prefijo 01-52)
+- teléfono y fax (sin espacios ni prefijo +34; 9 dígitos empezando por 6-9)
+- email (en minúsculas y con formato válido)
+
+Los valores no válidos se conservan normalizados y se señalan en el informe.
+
+Uso:
+    python normalizacion.py output/empresas_20240115_103000.json
+    python normalizacion.py output/*.json --escribir
+"""
+import argparse
+import operator
+import re
+from typing import Callable, Dict, List, Tuple
+
+from models import EmpresaCompleta, ScrapingResult
+
+
+LETRAS_NIF = "TRWAGMYFPDXBNJZSQVHLCKE"
+LETRAS_CONTROL_CIF = "JABCDEFGHI"
+# Cada dígito de las posiciones impares del CIF por la suma de las cifras de su doble
+DOBLE_CIF = str.maketrans("0123456789", "0246813579")
+PREFIJO_NIE = {"X": "0", "Y": "1", "Z": "2"}
+
+# Tipos de CIF cuyo control es siempre un dígito o siempre una letra
+CIF_CONTROL_DIGITO = set("ABEH")
+CIF_CONTROL_LETRA = set("KPQRSNW")
+
+SEPARADORES = str.maketrans("", "", " .-/_()\t")
+RE_CIF = re.compile(r"[ABCDEFGHJKLMNPQRSUVW]\d{7}[0-9A-J]")
+RE_NIF = re.compile(r"\d{8}[A-Z]")
+RE_NIE = re.compile(r"[XYZ]\d{7}[A-Z]")
+RE_TELEFONO = re.compile(r"[6-9]\d{8}")
+RE_PREFIJO_TELEFONO = re.compile(r"^(?:\+|00)34", re.MULTILINE)
+RE_DNI_CORTO = re.compile(r"^(?=\d{7}[A-Z]$)", re.MULTILINE)
+RE_CP_CORTO = re.compile(r"^\d{1,4}$", re.MULTILINE)
+# Espacios al principio y al final (sin cruzar saltos de línea) y prefijo mailto:
+RE_RELLENO_EMAIL = re.compile(r"^[^\S\n]*(?:mailto:)?|[^\S\n]+$", re.MULTILINE)
+RE_EMAIL = re.compile(r"[a-z0-9._%+\-]+@[a-z0-9.\-]+\.[a-z]{2,}")
+
+
+# Normalización. Las funciones trabajan línea a línea, así que igual que un
+# valor suelto normalizan una columna entera unida con saltos de línea
+
+def normalizar_documento(valor: str) -> str:
+    """Mayúsculas sin separadores; los DNI de 7 cifras se completan hasta 8"""
+    return RE_DNI_CORTO.sub("0", valor.upper().translate(SEPARADORES))
+
+
+def normalizar_cp(valor: str) -> str:
+    """Solo dígitos, con ceros a la izquierda hasta 5 (03001 guardado como 3001)"""
+    return RE_CP_CORTO.sub(lambda m: m.group().zfill(5), valor.translate(SEPARADORES))
+
+
+def normalizar_telefono(valor: str) -> str:
+    """Sin espacios, puntos, guiones ni prefijo internacional de España"""
+    return RE_PREFIJO_TELEFONO.sub("", valor.translate(SEPARADORES))
+
+
+def normalizar_email(valor: str) -> str:
+    """Minúsculas y sin espacios ni prefijo mailto:"""
+    return RE_RELLENO_EMAIL.sub("", valor.lower())
+
+
+# Validación de valores ya normalizados
+
+def validar_nif(valor: str) -> bool:
+    """NIF (DNI) o NIE con letra de control correcta"""
+    if RE_NIE.fullmatch(valor):
+        valor = PREFIJO_NIE[valor[0]] + valor[1:]
+    elif not RE_NIF.fullmatch(valor):
+        return False
+    return LETRAS_NIF[int(valor[:8]) % 23] == valor[8]
+
+
+def validar_cif(valor: str) -> bool:
+    """CIF de persona jurídica con dígito o letra de control correcta"""
+    if not RE_CIF.fullmatch(valor):
+        return False
+    suma = sum(map(int, valor[1:8:2].translate(DOBLE_CIF) + valor[2:8:2]))
+    control = (10 - suma % 10) % 10
+    tipo, final = valor[0], valor[8]
+    if tipo in CIF_CONTROL_DIGITO:
+        return final == str(control)
+    if tipo in CIF_CONTROL_LETRA:
+        return final == LETRAS_CONTROL_CIF[control]
+    return final in (str(control), LETRAS_CONTROL_CIF[control])
+
+
+def validar_documento(valor: str) -> bool:
+    """CIF, o NIF/NIE para empresas de autónomos"""
+    return validar_cif(valor) or validar_nif(valor)
+
+
+def validar_cp(valor: str) -> bool:
+    """Cinco dígitos con un prefijo de provincia existente (01-52)"""
+    return len(valor) == 5 and valor.isdigit() and 1 <= int(valor[:2]) <= 52
+
+
+def validar_telefono(valor: str) -> bool:
+    """Nueve dígitos de un número fijo o móvil español"""
+    return RE_TELEFONO.fullmatch(valor) is not None
+
+
+def validar_email(valor: str) -> bool:
+    """Formato usuario@dominio.tld"""
+    return RE_EMAIL.fullmatch(valor) is not None
+
+
+# campo -> (normalizar, validar)
+REGLAS: Dict[str, Tuple[Callable[[str], str], Callable[[str], bool]]] = {
+    "cif": (normalizar_documento, validar_documento),
+    "nif_gerente": (normalizar_documento, validar_nif),
+    "cp": (normalizar_cp, validar_cp),
+    "telefono": (normalizar_telefono, validar_telefono),
+    "fax": (normalizar_telefono, validar_telefono),
+    "email": (normalizar_email, validar_email),
+}
+
+
+def normalizar_columna(valores: List[str], normalizar: Callable[[str], str],
+                       validar: Callable[[str], bool]) -> Tuple[List[str], List[bool]]:
+    """
+    Normaliza y valida una columna completa; los valores vacíos se dan por válidos
+
+    Args:
+        valores: Valores del campo en todas las empresas
+        normalizar: Función de normalización de un valor
+        validar: Función de validación de un valor normalizado
+
+    Returns:
+        Tuple[List[str], List[bool]]: Valores normalizados y si cada uno es válido
+    """
+    # Toda la columna en una sola cadena: una llamada a translate/sub por columna
+    normalizados = normalizar("\n".join(valores)).split("\n") if valores else []
+    if len(normalizados) != len(valores):
+        # Algún valor tenía saltos de línea propios
+        normalizados = [normalizar(v) for v in valores]
+
+    # Cada valor distinto se valida una sola vez (CP y prefijos se repiten mucho)
+    validez = {v: not v or validar(v) for v in dict.fromkeys(normalizados)}
+    validos = list(map(validez.__getitem__, normalizados))
+    return normalizados, validos
+
+
+def normalizar_columnas(columnas: Dict[str, List[str]]) -> Tuple[Dict[str, List[str]], Dict[str, List[bool]]]:
+    """
+    Normaliza y valida las columnas que tienen regla
+
+    Args:
+        columnas: campo -> valores de todas las empresas
+
+    Returns:
+        Tuple: (campo -> valores normalizados, campo -> válidos)
+    """
+    normalizadas, validas = {}, {}
+    for campo, (normalizar, validar) in REGLAS.items():
+        if campo in columnas:
+            normalizadas[campo], validas[campo] = normalizar_columna(columnas[campo], normalizar, validar)
+    return normalizadas, validas
+
+
+def normalizar_empresas(empresas: List[EmpresaCompleta]) -> Dict:
+    """
+    Normaliza en el sitio los campos con regla de una lista de empresas
+
+    Args:
+        empresas: Empresas a normalizar
+
+    Returns:
+        Dict: Informe con, por campo, los valores cambiados, vacíos y no
+            válidos, y los id_empresa con valores no válidos
+    """
+    columnas = {campo: [getattr(e, campo) for e in empresas] for campo in REGLAS}
+    normalizadas, validas = normalizar_columnas(columnas)
+
+    informe = {"total": len(empresas), "campos": {}, "invalidos": {}}
+    for campo, valores in normalizadas.items():
+        originales = columnas[campo]
+        for empresa, valor in zip(empresas, valores):
+            setattr(empresa, campo, valor)
+
+        invalidos = [e.id_empresa for e, valido in zip(empresas, validas[campo]) if not valido]
+        informe["campos"][campo] = {
+            "cambiados": sum(map(operator.ne, originales, valores)),
+            "vacios": valores.count(""),
+            "invalidos": len(invalidos)
+        }
+        if invalidos:
+            informe["invalidos"][campo] = invalidos
+
+    return informe
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Normaliza y valida las empresas de archivos JSON de salida")
+    parser.add_argument("archivos", nargs="+", help="Archivos JSON generados por los scrapers")
+    parser.add_argument("--escribir", action="store_true",
+                        help="Reescribir los archivos con los valores normalizados y el informe en metadata")
+    args = parser.parse_args()
+
+    for archivo in args.archivos:
+        try:
+            resultado = ScrapingResult.from_json(archivo)
+        except Exception as e:
+            print(f"❌ Error leyendo {archivo}: {e}")
+            continue
+
+        informe = normalizar_empresas(resultado.empresas)
+        resumen = ", ".join(f"{campo}: {datos['invalidos']} no válidos" for campo, datos in informe["campos"].items())
+        print(f"{archivo}: {informe['total']} empresas; {resumen}")
+
+        if args.escribir:
+            resultado.validacion = informe
+            resultado.to_json(archivo)
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,175 @@
+"""
+Modo de perfilado de los scrapers (opción --profile de cada script)
+
+Envuelve la ejecución en cProfile y cuenta los comandos WebDriver (cada uno es
+un viaje de ida y vuelta al navegador) por método del scraper que los origina
+y por empresa. Al terminar se guardan en perfiles/ el perfil (.prof, legible
+con pstats o snakeviz) y un informe con los puntos calientes.
+"""
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from statistics import mean, median
+from typing import Dict, List, Optional
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+
+DIRECTORIO_REPO = os.path.dirname(os.path.abspath(__file__))
+
+# Número de funciones y métodos que se muestran en cada tabla del informe
+TOP = 20
+
+
+# Nombre 'modulo.Clase.metodo' de cada objeto de código, o None si no es del repositorio
+_nombres_codigo: Dict[object, Optional[str]] = {}
+
+
+def _nombre_codigo(codigo) -> Optional[str]:
+    """Nombre del método si el código pertenece a un módulo del repositorio (salvo este)"""
+    if codigo not in _nombres_codigo:
+        directorio, archivo = os.path.split(os.path.abspath(codigo.co_filename))
+        nombre = None
+        if directorio == DIRECTORIO_REPO and archivo != "perfilado.py":
+            nombre = f"{os.path.splitext(archivo)[0]}.{getattr(codigo, 'co_qualname', codigo.co_name)}"
+        _nombres_codigo[codigo] = nombre
+    return _nombres_codigo[codigo]
+
+
+def _metodo_origen() -> str:
+    """
+    Primer método del código del repositorio en la pila de llamadas (saltando
+    selenium y este módulo), como 'modulo.Clase.metodo'
+    """
+    frame = sys._getframe(2)
+    while frame is not None:
+        nombre = _nombre_codigo(frame.f_code)
+        if nombre:
+            return nombre
+        frame = frame.f_back
+    return "(fuera del repositorio)"
+
+
+class Perfilador:
+    """Perfil de CPU y recuento de comandos WebDriver de una ejecución"""
+
+    def __init__(self, motor: str, directorio: str = "perfiles"):
+        """
+        Inicializa el perfilador
+
+        Args:
+            motor: Nombre del scraper (prefijo de los archivos generados)
+            directorio: Directorio donde se guardan el perfil y el informe
+        """
+        self.motor = motor
+        self.directorio = Path(directorio)
+
+        self.comandos_por_metodo: Counter = Counter()
+        self.comandos_por_tipo: Counter = Counter()
+        self.comandos_por_empresa: List[int] = []
+        self.total_comandos = 0
+
+        self._comandos_empresa = 0
+        self._perfil = cProfile.Profile()
+        self._execute_original = None
+        self._lock = threading.Lock()
+
+    def iniciar(self) -> 'Perfilador':
+        """Empieza a perfilar y a contar los comandos WebDriver"""
+        perfilador = self
+        execute_original = WebDriver.execute
+        self._execute_original = execute_original
+
+        def execute_contado(driver, driver_command, params=None):
+            metodo = _metodo_origen()
+            with perfilador._lock:
+                perfilador.total_comandos += 1
+                perfilador.comandos_por_tipo[driver_command] += 1
+                perfilador.comandos_por_metodo[metodo] += 1
+                perfilador._comandos_empresa += 1
+            return execute_original(driver, driver_command, params)
+
+        WebDriver.execute = execute_contado
+        self._perfil.enable()
+        return self
+
+    def observar(self, scraper) -> None:
+        """
+        Delimita las empresas del scraper para contar los comandos de cada una
+
+        Args:
+            scraper: Scraper con 'metricas' (se intercepta empresa_completada)
+        """
+        empresa_completada = scraper.metricas.empresa_completada
+
+        def empresa_completada_contada():
+            with self._lock:
+                self.comandos_por_empresa.append(self._comandos_empresa)
+                self._comandos_empresa = 0
+            empresa_completada()
+
+        scraper.metricas.empresa_completada = empresa_completada_contada
+
+    def informe(self) -> str:
+        """
+        Informe de puntos calientes
+
+        Returns:
+            str: Funciones con más tiempo propio y acumulado, comandos WebDriver
+                por método y por tipo y comandos por empresa
+        """
+        lineas = [f"Perfil de {self.motor}", ""]
+
+        for orden, titulo in (("tottime", "tiempo propio"), ("cumulative", "tiempo acumulado")):
+            salida = io.StringIO()
+            pstats.Stats(self._perfil, stream=salida).strip_dirs().sort_stats(orden).print_stats(TOP)
+            tabla = salida.getvalue()
+            lineas += [f"== Funciones por {titulo} (top {TOP})", tabla[tabla.find("   ncalls"):].rstrip(), ""]
+
+        lineas.append(f"== Comandos WebDriver por método ({self.total_comandos} en total)")
+        for metodo, n in self.comandos_por_metodo.most_common(TOP):
+            lineas.append(f"{n:>8}  {metodo}")
+        lineas += ["", "== Comandos WebDriver por tipo"]
+        for tipo, n in self.comandos_por_tipo.most_common(TOP):
+            lineas.append(f"{n:>8}  {tipo}")
+
+        if self.comandos_por_empresa:
+            por_empresa = self.comandos_por_empresa
+            lineas += ["", f"== Comandos WebDriver por empresa ({len(por_empresa)} empresas)",
+                       f"media {mean(por_empresa):.1f}, mediana {median(por_empresa):.0f}, "
+                       f"mín {min(por_empresa)}, máx {max(por_empresa)}"]
+
+        return "\n".join(lineas) + "\n"
+
+    def finalizar(self) -> Optional[Path]:
+        """
+        Deja de perfilar, restaura WebDriver.execute y guarda el perfil y el informe
+
+        Returns:
+            Optional[Path]: Ruta del informe, o None si no se pudo escribir
+        """
+        self._perfil.disable()
+        if self._execute_original is not None:
+            WebDriver.execute = self._execute_original
+            self._execute_original = None
+
+        informe = self.informe()
+        print(f"\n{informe}")
+
+        try:
+            self.directorio.mkdir(exist_ok=True)
+            base = self.directorio / f"perfil_{self.motor}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            self._perfil.dump_stats(f"{base}.prof")
+            ruta_informe = Path(f"{base}.txt")
+            ruta_informe.write_text(informe, encoding='utf-8')
+            print(f"💾 Perfil guardado en {base}.prof y {ruta_informe}")
+            return ruta_informe
+        except Exception as e:
+            print(f"❌ Error guardando el perfil: {e}")
+            return None
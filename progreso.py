@@ -0,0 +1,191 @@
+"""
+Progreso global del scraping con ritmo suavizado y tiempo estimado de finalización
+"""
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+def formatear_duracion(segundos: float) -> str:
+    """
+    Formatea una duración como '2h 05m' o '4m 10s'
+
+    Args:
+        segundos: Duración en segundos
+    """
+    segundos = int(round(segundos))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    if horas:
+        return f"{horas}h {minutos:02d}m"
+    return f"{minutos}m {segundos:02d}s"
+
+
+class ProgresoGlobal:
+    """
+    Lleva la cuenta de empresas completadas sobre el total del listado y
+    estima el ritmo con una media móvil exponencial de los segundos por
+    empresa. El estado se guarda en disco para que una ejecución reanudada
+    continúe la estimación en lugar de empezar de cero.
+    """
+
+    # Peso de la última empresa en la media móvil exponencial
+    ALFA = 0.1
+
+    def __init__(self, archivo: str, intervalo_informe: float = 60.0, intervalo_guardado: float = 10.0):
+        """
+        Inicializa el progreso, cargando el estado guardado si existe
+
+        Args:
+            archivo: Archivo JSON donde se guarda el progreso
+            intervalo_informe: Segundos mínimos entre dos informes en el log
+            intervalo_guardado: Segundos mínimos entre dos guardados en disco
+        """
+        self.archivo = archivo
+        self.intervalo_informe = intervalo_informe
+        self.intervalo_guardado = intervalo_guardado
+
+        self.total: Optional[int] = None
+        self.total_estimado = False
+        self.completadas = 0
+        self.segundos_por_empresa: Optional[float] = None
+
+        self._ultima_empresa = time.monotonic()
+        self._ultimo_informe = 0.0
+        self._ultimo_guardado = 0.0
+
+        self._cargar()
+
+    def _cargar(self) -> None:
+        """Recupera el estado de una ejecución anterior"""
+        if not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            self.total = datos.get('total')
+            self.total_estimado = datos.get('total_estimado', False)
+            self.completadas = datos.get('completadas', 0)
+            self.segundos_por_empresa = datos.get('segundos_por_empresa')
+        except Exception as e:
+            logger.warning(f"Error cargando progreso global de {self.archivo}: {e}")
+
+    def guardar(self) -> None:
+        """Guarda el estado de forma atómica"""
+        try:
+            temporal = f"{self.archivo}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({**self.resumen(), "actualizado": datetime.now().isoformat()}, f, ensure_ascii=False, indent=2)
+            os.replace(temporal, self.archivo)
+            self._ultimo_guardado = time.monotonic()
+        except Exception as e:
+            logger.warning(f"Error guardando progreso global: {e}")
+
+    def iniciar(self, total: Optional[int], completadas: Optional[int] = None) -> None:
+        """
+        Fija el total del listado y las empresas ya completadas al empezar
+
+        Args:
+            total: Empresas a procesar en total (None si aún no se conoce)
+            completadas: Empresas ya completadas según los archivos de progreso
+                del scraper (None para conservar la cuenta guardada)
+        """
+        if total is not None:
+            self.total = total
+            self.total_estimado = False
+        if completadas is not None:
+            self.completadas = completadas
+        self._ultima_empresa = time.monotonic()
+        self.informar(forzar=True)
+
+    def estimar_total(self, grupos_hechos: int, grupos_pendientes: int) -> None:
+        """
+        Estima el total cuando el listado solo da grupos (localidades) y no
+        empresas, suponiendo que los pendientes tienen la media de los hechos
+
+        Args:
+            grupos_hechos: Localidades completadas (incluidas las de ejecuciones anteriores)
+            grupos_pendientes: Localidades que faltan
+        """
+        if (self.total is None or self.total_estimado) and grupos_hechos:
+            media = self.completadas / grupos_hechos
+            self.total = self.completadas + round(grupos_pendientes * media)
+            self.total_estimado = True
+
+    def avanzar(self, n: int = 1) -> None:
+        """
+        Registra empresas completadas y actualiza el ritmo suavizado
+
+        Args:
+            n: Número de empresas completadas desde la última llamada
+        """
+        ahora = time.monotonic()
+        segundos = (ahora - self._ultima_empresa) / n
+        self._ultima_empresa = ahora
+        self.completadas += n
+
+        if self.segundos_por_empresa is None:
+            self.segundos_por_empresa = segundos
+        else:
+            self.segundos_por_empresa = self.ALFA * segundos + (1 - self.ALFA) * self.segundos_por_empresa
+
+        if ahora - self._ultimo_guardado >= self.intervalo_guardado:
+            self.guardar()
+        self.informar()
+
+    def resumen(self) -> Dict:
+        """
+        Estado actual del progreso
+
+        Returns:
+            Dict: total, completadas, porcentaje, empresas_por_minuto, eta_segundos y eta
+        """
+        pendientes = max(0, self.total - self.completadas) if self.total is not None else None
+        eta = pendientes * self.segundos_por_empresa if pendientes is not None and self.segundos_por_empresa else None
+        return {
+            "total": self.total,
+            "total_estimado": self.total_estimado,
+            "completadas": self.completadas,
+            "porcentaje": round(100 * self.completadas / self.total, 2) if self.total else None,
+            "segundos_por_empresa": round(self.segundos_por_empresa, 3) if self.segundos_por_empresa else None,
+            "empresas_por_minuto": round(60 / self.segundos_por_empresa, 2) if self.segundos_por_empresa else None,
+            "eta_segundos": round(eta) if eta is not None else None,
+            "eta": (datetime.now() + timedelta(seconds=eta)).isoformat(timespec="seconds") if eta is not None else None
+        }
+
+    def formatear(self) -> str:
+        """Línea de progreso legible para el log"""
+        r = self.resumen()
+        if r["total"] is None:
+            texto = f"Progreso global: {r['completadas']} empresas"
+        else:
+            aproximado = "~" if r["total_estimado"] else ""
+            texto = f"Progreso global: {r['completadas']}/{aproximado}{r['total']} ({r['porcentaje']}%)"
+        if r["empresas_por_minuto"] is not None:
+            texto += f", {r['empresas_por_minuto']} empresas/min"
+        if r["eta_segundos"] is not None:
+            texto += f", ETA {formatear_duracion(r['eta_segundos'])} ({r['eta'][11:16]})"
+        return texto
+
+    def informar(self, forzar: bool = False) -> None:
+        """
+        Escribe el progreso en el log, como mucho una vez por intervalo
+
+        Args:
+            forzar: Si True, informa aunque no haya pasado el intervalo
+        """
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultimo_informe >= self.intervalo_informe:
+            self._ultimo_informe = ahora
+            logger.info(self.formatear())
+
+    def finalizar(self) -> None:
+        """Guarda el estado final y lo escribe en el log"""
+        self.guardar()
+        self.informar(forzar=True)
@@ -0,0 +1,83 @@
+"""
+Política de reciclaje del navegador en ejecuciones largas
+
+Un mismo Firefox va acumulando memoria con cada página cargada hasta que el
+sistema lo cierra. Los scrapers consultan esta política entre empresa y
+empresa y, si se ha superado el número de páginas o la memoria configurados,
+reinician el WebDriver y restauran la sesión antes de seguir.
+"""
+from typing import Optional
+
+from configuracion import obtener_config_reciclaje
+from instrumentacion import RegistroTiempos
+from metricas import ETAPAS_PAGINA
+
+
+class PoliticaReciclaje:
+    """Decide cuándo hay que reiniciar el navegador"""
+
+    def __init__(self, tiempos: RegistroTiempos, recursos=None, max_paginas: int = 1000, max_rss_mb: int = 2048):
+        """
+        Inicializa la política
+
+        Args:
+            tiempos: RegistroTiempos del scraper, del que se cuentan las páginas cargadas
+            recursos: MonitorRecursos del scraper, del que se toma la memoria del navegador
+            max_paginas: Páginas cargadas por el mismo navegador antes de reiniciarlo (0 sin límite)
+            max_rss_mb: Memoria del driver y el navegador en MB a partir de la que se reinicia (0 sin límite)
+        """
+        self.tiempos = tiempos
+        self.recursos = recursos
+        self.max_paginas = max_paginas
+        self.max_rss_mb = max_rss_mb
+
+        self.reciclajes = 0
+        self._paginas_base = 0
+        self._pid_descartado: Optional[int] = None
+
+    @classmethod
+    def desde_entorno(cls, tiempos: RegistroTiempos, recursos=None) -> 'PoliticaReciclaje':
+        """
+        Crea la política con los umbrales configurados en el entorno
+
+        Args:
+            tiempos: RegistroTiempos del scraper
+            recursos: MonitorRecursos del scraper
+        """
+        max_paginas, max_rss_mb = obtener_config_reciclaje()
+        return cls(tiempos, recursos, max_paginas=max_paginas, max_rss_mb=max_rss_mb)
+
+    def _paginas_totales(self) -> int:
+        """Páginas de listado y detalle cargadas desde el inicio del scraping"""
+        return sum(h.n for etapa, h in list(self.tiempos.histogramas.items()) if etapa in ETAPAS_PAGINA)
+
+    def paginas_navegador(self) -> int:
+        """Páginas cargadas por el navegador actual"""
+        return self._paginas_totales() - self._paginas_base
+
+    def motivo(self) -> Optional[str]:
+        """
+        Comprueba los umbrales
+
+        Returns:
+            Optional[str]: Motivo del reciclaje, o None si el navegador puede seguir
+        """
+        paginas = self.paginas_navegador()
+        if self.max_paginas and paginas >= self.max_paginas:
+            return f"{paginas} páginas cargadas"
+
+        muestra = self.recursos.ultima_muestra if self.recursos is not None else None
+        if self.max_rss_mb and muestra and muestra["pid"] != self._pid_descartado:
+            rss_mb = muestra["rss_bytes"] / (1024 * 1024)
+            if rss_mb >= self.max_rss_mb:
+                return f"RSS de {rss_mb:.0f} MB"
+
+        return None
+
+    def reiniciado(self) -> None:
+        """Registra que el navegador se ha reiniciado y vuelve a contar desde cero"""
+        self.reciclajes += 1
+        self._paginas_base = self._paginas_totales()
+        # La última muestra de memoria es del navegador anterior hasta el siguiente muestreo
+        muestra = self.recursos.ultima_muestra if self.recursos is not None else None
+        self._pid_descartado = muestra["pid"] if muestra else None
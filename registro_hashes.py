@@ -0,0 +1,104 @@
+"""
+Huellas del contenido ya escrito, para no volver a escribir lo que no ha cambiado
+
+Cada empresa tiene una huella estable de su contenido
+(EmpresaCompleta.hash_contenido, sin los CAMPOS_VOLATILES como ultimo_acceso,
+que cambia cada vez que la empresa entra en la plataforma). El registro guarda en hashes_empresas.json
+la huella de la última versión escrita en output/ de cada id_empresa; al
+guardar una localidad solo se escriben las empresas nuevas o cambiadas y, si
+no ha cambiado ninguna, no se genera archivo (las métricas y la validación de
+la ejecución quedan en su resumen, ver resumen_ejecucion.py). Como los lectores de output/
+se quedan con la última versión de cada empresa, el resultado es el mismo
+que reescribirlas todas.
+
+Para volver a escribir todas las empresas basta con borrar hashes_empresas.json.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterable, List
+
+from models import CAMPOS_VOLATILES, EmpresaCompleta
+
+
+logger = logging.getLogger(__name__)
+
+
+def hash_fila(fila: Dict) -> str:
+    """
+    Huella estable de una fila del listado (diccionario con datos básicos)
+
+    Args:
+        fila: Fila del listado de empresas
+
+    Returns:
+        str: blake2b de 128 bits en hexadecimal del JSON con claves ordenadas
+    """
+    texto = json.dumps(fila, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(texto.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def hashes_filas(filas: Iterable[Dict]) -> Dict[str, str]:
+    """id_empresa -> huella de cada fila del listado"""
+    return {fila['id_empresa']: hash_fila(fila) for fila in filas}
+
+
+class RegistroHashes:
+    """Huella de la última versión escrita de cada empresa"""
+
+    def __init__(self, archivo: str = "hashes_empresas.json"):
+        """
+        Inicializa el registro y carga el guardado, si existe
+
+        Args:
+            archivo: Ruta del archivo JSON del registro
+        """
+        self.archivo = archivo
+        # id_empresa -> huella de la última versión escrita
+        self.hashes: Dict[str, str] = {}
+        self._modificado = False
+        self._cargar()
+
+    def _cargar(self) -> None:
+        """Carga el registro guardado"""
+        if not os.path.exists(self.archivo):
+            return
+        try:
+            with open(self.archivo, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f).get("hashes", {})
+        except Exception as e:
+            logger.warning(f"No se pudo cargar el registro de huellas {self.archivo}: {e}")
+            self.hashes = {}
+
+    def cambiadas(self, empresas: Iterable[EmpresaCompleta]) -> List[EmpresaCompleta]:
+        """
+        Empresas nuevas o con contenido distinto del último escrito
+
+        Args:
+            empresas: Empresas a guardar
+
+        Returns:
+            List[EmpresaCompleta]: Las que hay que escribir, en el mismo orden
+        """
+        return [e for e in empresas if self.hashes.get(e.id_empresa) != e.hash_contenido(CAMPOS_VOLATILES)]
+
+    def registrar(self, empresas: Iterable[EmpresaCompleta]) -> None:
+        """Apunta la huella de las empresas que se acaban de escribir"""
+        for empresa in empresas:
+            huella = empresa.hash_contenido(CAMPOS_VOLATILES)
+            if self.hashes.get(empresa.id_empresa) != huella:
+                self.hashes[empresa.id_empresa] = huella
+                self._modificado = True
+
+    def guardar(self) -> None:
+        """Escribe el registro si ha cambiado (escritura atómica)"""
+        if not self._modificado:
+            return
+        temporal = f"{self.archivo}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({"ultima_actualizacion": datetime.now().isoformat(), "hashes": self.hashes}, f,
+                      ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporal, self.archivo)
+        self._modificado = False
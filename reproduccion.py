@@ -0,0 +1,272 @@
+"""
+Reproducción sin conexión: vuelve a extraer las empresas del archivo HTML
+
+Cuando cambia el parser de la página de detalle no hace falta repetir el
+scraping: las fichas archivadas (SAO_ARCHIVO_HTML, ver archivo_html.py) se
+reparten por lotes entre varios procesos, cada uno lee la tabla de detalle
+con html.parser y aplica el ExtractorDetalle actual, y el resultado se
+guarda como una salida más de los scrapers.
+
+Los campos que no están en la ficha (registrado, ultimo_acceso) se toman de
+la última versión conocida de cada empresa en el catálogo o en output/.
+Si la salida va a output/, se actualizan también el índice de búsqueda, el
+catálogo y el registro de huellas, y solo se escriben las empresas cuyo
+contenido ha cambiado, igual que al guardar una localidad.
+
+Uso:
+    python reproduccion.py archivo_html/
+    python reproduccion.py archivo_html/ --procesos 8 --base catalogo/
+    python reproduccion.py corpus/detalle/ -o /tmp/reproduccion.json --sin-base
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from archivo_html import leer_pagina, paginas_archivo
+from catalogo import Catalogo
+from esquema_detalle import ExtractorDetalle, secciones_desde_filas
+from exportar import iterar_origen
+from indice_busqueda import IndiceBusqueda
+from models import EmpresaCompleta, ScrapingResult
+from normalizacion import normalizar_empresas
+from registro_hashes import RegistroHashes
+from resumen_ejecucion import ResumenEjecucion
+
+
+TAM_LOTE = 200
+CLASES_TABLA_DETALLE = {"infoUsuario", "infoEmpresa"}
+
+# Extractor de cada proceso: la caché de disposiciones se reutiliza entre lotes
+_extractor = ExtractorDetalle()
+
+
+class LectorTablaDetalle(HTMLParser):
+    """
+    Filas de table.infoUsuario.infoEmpresa como las devuelve SCRIPT_TABLA_DETALLE
+
+    Cada fila es (es_encabezado, textos de las celdas), con el texto de cada
+    celda incluyendo el de sus elementos anidados, como textContent.
+    """
+
+    def __init__(self):
+        """Inicializa el lector sin tabla encontrada"""
+        super().__init__(convert_charrefs=True)
+        self.filas: List[Tuple[bool, List[str]]] = []
+        self.encontrada = False
+        # Tablas abiertas desde la de detalle (1 = la propia tabla de detalle)
+        self._profundidad = 0
+        self._celdas: Optional[List[str]] = None
+        self._etiquetas: List[str] = []
+        self._texto: Optional[List[str]] = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            if self._profundidad:
+                self._profundidad += 1
+            elif not self.encontrada and CLASES_TABLA_DETALLE <= set((dict(attrs).get("class") or "").split()):
+                self.encontrada = True
+                self._profundidad = 1
+            return
+        if self._profundidad != 1:
+            return
+        if tag == "tr":
+            self._cerrar_fila()
+            self._celdas, self._etiquetas = [], []
+        elif tag in ("th", "td") and self._celdas is not None:
+            self._cerrar_celda()
+            self._etiquetas.append(tag)
+            self._texto = []
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self._profundidad:
+            self._profundidad -= 1
+            if not self._profundidad:
+                self._cerrar_fila()
+            return
+        if self._profundidad != 1:
+            return
+        if tag in ("th", "td"):
+            self._cerrar_celda()
+        elif tag == "tr":
+            self._cerrar_fila()
+
+    def handle_data(self, data):
+        if self._texto is not None:
+            self._texto.append(data)
+
+    def _cerrar_celda(self) -> None:
+        """Añade la celda abierta (las etiquetas de cierre son opcionales en HTML)"""
+        if self._texto is not None:
+            self._celdas.append("".join(self._texto))
+            self._texto = None
+
+    def _cerrar_fila(self) -> None:
+        """Añade la fila abierta"""
+        if self._celdas is None:
+            return
+        self._cerrar_celda()
+        es_encabezado = bool(self._etiquetas) and all(e == "th" for e in self._etiquetas)
+        self.filas.append((es_encabezado, self._celdas))
+        self._celdas = None
+
+
+def extraer_de_html(html: str, extractor: ExtractorDetalle) -> Dict[str, str]:
+    """
+    Valores de los campos de una página de detalle guardada
+
+    Args:
+        html: Código fuente de la página
+        extractor: Extractor con el esquema actual
+
+    Returns:
+        Dict[str, str]: atributo -> valor
+
+    Raises:
+        ValueError: Si la página no tiene la tabla de detalle
+    """
+    lector = LectorTablaDetalle()
+    lector.feed(html)
+    lector.close()
+    if not lector.encontrada:
+        raise ValueError("No se encontró la tabla de detalle (table.infoUsuario.infoEmpresa)")
+    return extractor.extraer(secciones_desde_filas(lector.filas))
+
+
+def procesar_lote(paginas: List[Tuple[str, str]]) -> List[Tuple[str, Optional[Dict[str, str]], str]]:
+    """
+    Extrae un lote de páginas (se ejecuta en un proceso del pool)
+
+    Args:
+        paginas: (id_empresa, ruta) de cada página
+
+    Returns:
+        List[Tuple]: (id_empresa, campos o None si falló, mensaje de error)
+    """
+    resultados = []
+    for id_empresa, ruta in paginas:
+        try:
+            resultados.append((id_empresa, extraer_de_html(leer_pagina(ruta), _extractor), ""))
+        except Exception as e:
+            resultados.append((id_empresa, None, f"{type(e).__name__}: {e}"))
+    return resultados
+
+
+def reproducir(directorio: str, base: Optional[str] = None, procesos: Optional[int] = None,
+               tam_lote: int = TAM_LOTE) -> Tuple[List[EmpresaCompleta], Dict[str, str]]:
+    """
+    Vuelve a extraer todas las páginas del archivo en paralelo
+
+    Args:
+        directorio: Directorio del archivo HTML
+        base: Catálogo, directorio de salida o archivo JSON con la última versión
+            conocida de cada empresa (para los campos que no están en la ficha)
+        procesos: Procesos del pool (por defecto, uno por núcleo)
+        tam_lote: Páginas por tarea enviada a cada proceso
+
+    Returns:
+        Tuple[List[EmpresaCompleta], Dict[str, str]]: Empresas extraídas, en orden
+            de id_empresa, y id_empresa -> error de las páginas que fallaron
+    """
+    paginas = paginas_archivo(directorio)
+    lotes = [paginas[i:i + tam_lote] for i in range(0, len(paginas), tam_lote)]
+
+    anteriores: Dict[str, EmpresaCompleta] = {}
+    if base:
+        ids = {id_empresa for id_empresa, _ in paginas}
+        anteriores = {e.id_empresa: e for e in iterar_origen(base) if e.id_empresa in ids}
+
+    empresas, errores = [], {}
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        for resultados in pool.map(procesar_lote, lotes):
+            for id_empresa, campos, error in resultados:
+                if campos is None:
+                    errores[id_empresa] = error
+                    continue
+                empresa = anteriores.get(id_empresa) or EmpresaCompleta(id_empresa=id_empresa)
+                for campo, valor in campos.items():
+                    setattr(empresa, campo, valor)
+                empresas.append(empresa)
+    return empresas, errores
+
+
+def base_por_defecto() -> Optional[str]:
+    """Catálogo si existe, si no output/ si existe"""
+    if os.path.exists(os.path.join("catalogo", "indices.json")):
+        return "catalogo"
+    return "output" if os.path.isdir("output") else None
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Vuelve a extraer las empresas del archivo HTML sin navegador")
+    parser.add_argument("archivo", help="Directorio con las páginas de detalle (<id_empresa>.html[.gz])")
+    parser.add_argument("-o", "--salida",
+                        help="Archivo JSON de salida (por defecto, output/empresas_reproduccion_<fecha>.json)")
+    parser.add_argument("--base", help="Catálogo o salida con los datos del listado (por defecto, catalogo/ u output/)")
+    parser.add_argument("--sin-base", action="store_true", help="No completar con versiones anteriores")
+    parser.add_argument("--procesos", type=int, help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--lote", type=int, default=TAM_LOTE, help="Páginas por tarea")
+    args = parser.parse_args()
+
+    base = None if args.sin_base else (args.base or base_por_defecto())
+    ejecucion = ResumenEjecucion("reproduccion")
+    inicio = time.perf_counter()
+    try:
+        empresas, errores = reproducir(args.archivo, base, args.procesos, max(1, args.lote))
+    except (OSError, ValueError) as e:
+        print(f"❌ Error reproduciendo {args.archivo}: {e}", file=sys.stderr)
+        return 1
+    duracion = time.perf_counter() - inicio
+
+    validacion = normalizar_empresas(empresas)
+    salida = args.salida or f"output/empresas_reproduccion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    Path(salida).parent.mkdir(parents=True, exist_ok=True)
+    en_output = Path(salida).resolve().parent == Path("output").resolve()
+
+    # En output/ se guarda como lo haría un scraper: solo lo que ha cambiado, con los
+    # metadatos de la reproducción en el resumen de la ejecución
+    hashes = RegistroHashes() if en_output else None
+    escribir = hashes.cambiadas(empresas) if hashes else empresas
+    if escribir:
+        ScrapingResult(
+            empresas=escribir,
+            timestamp=datetime.now().isoformat(),
+            total_empresas=len(escribir),
+            errores=len(errores),
+            tiempo_total=str(timedelta(seconds=round(duracion))),
+            validacion=validacion,
+            sin_cambios=len(empresas) - len(escribir)
+        ).to_json(salida)
+    if hashes:
+        hashes.registrar(escribir)
+        hashes.guardar()
+        indice = IndiceBusqueda()
+        indice.agregar_varias(empresas)
+        indice.guardar()
+        catalogo = Catalogo()
+        catalogo.agregar_varias(empresas)
+        catalogo.guardar()
+        ejecucion.anotar(args.archivo, len(empresas), len(escribir), salida if escribir else None, validacion)
+        ejecucion.guardar({"duracion_s": round(duracion, 3), "procesos": args.procesos}, len(errores))
+
+    paginas = len(empresas) + len(errores)
+    print(f"✅ {paginas} páginas en {duracion:.1f}s ({paginas / duracion if duracion else 0:.0f} páginas/s), "
+          f"{len(errores)} con error")
+    if escribir:
+        print(f"💾 {len(escribir)} empresas -> {salida}" +
+              (f" ({len(empresas) - len(escribir)} sin cambios)" if len(escribir) < len(empresas) else ""))
+    else:
+        print("💾 Ninguna empresa ha cambiado, no se genera archivo")
+    for id_empresa, error in list(errores.items())[:10]:
+        print(f"   {id_empresa}: {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
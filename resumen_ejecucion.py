@@ -0,0 +1,92 @@
+"""
+Resumen de cada ejecución de un scraper
+
+Como solo se escriben en output/ las empresas nuevas o cambiadas, una
+ejecución en la que no cambia nada no genera archivos de salida y sus
+métricas y su validación no quedarían en ningún sitio. Cada ejecución deja
+por eso un único archivo ejecuciones/<motor>_<fecha>.json con los tiempos por
+etapa (escritura incluida), los errores y, por cada localidad guardada,
+cuántas empresas se procesaron, cuántas se escribieron, en qué archivo y el
+resumen de la validación.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_EJECUCIONES = "ejecuciones"
+
+
+class ResumenEjecucion:
+    """Metadatos de una ejecución, escritos en un solo archivo por ejecución"""
+
+    def __init__(self, motor: str, directorio: str = DIRECTORIO_EJECUCIONES):
+        """
+        Inicializa el resumen de la ejecución que empieza ahora
+
+        Args:
+            motor: Nombre del scraper
+            directorio: Directorio de los resúmenes
+        """
+        self.motor = motor
+        self.inicio = datetime.now()
+        self.archivo = os.path.join(directorio, f"{motor}_{self.inicio.strftime('%Y%m%d_%H%M%S')}.json")
+        # Un registro por localidad (o lote) guardado
+        self.lotes: List[Dict] = []
+
+    def anotar(self, lote: str, procesadas: int, escritas: int, archivo: Optional[str],
+               validacion: Optional[Dict] = None) -> None:
+        """
+        Anota un lote de empresas guardado
+
+        Args:
+            lote: Localidad (o nombre del lote)
+            procesadas: Empresas procesadas
+            escritas: Empresas nuevas o cambiadas escritas en output/
+            archivo: Archivo de salida, o None si no había nada que escribir
+            validacion: Resumen de normalizar_empresas
+        """
+        self.lotes.append({
+            "lote": lote,
+            "timestamp": datetime.now().isoformat(),
+            "procesadas": procesadas,
+            "escritas": escritas,
+            "archivo": archivo,
+            "validacion": validacion
+        })
+
+    def guardar(self, metricas: Optional[Dict], errores: int) -> None:
+        """
+        Escribe el resumen (escritura atómica; se puede llamar varias veces)
+
+        Args:
+            metricas: RegistroTiempos.resumen() tomado después de la escritura
+            errores: Errores de la ejecución
+        """
+        procesadas = sum(l["procesadas"] for l in self.lotes)
+        escritas = sum(l["escritas"] for l in self.lotes)
+        fin = datetime.now()
+        datos = {
+            "motor": self.motor,
+            "inicio": self.inicio.isoformat(),
+            "fin": fin.isoformat(),
+            "tiempo_total": str(fin - self.inicio),
+            "errores": errores,
+            "procesadas": procesadas,
+            "escritas": escritas,
+            "sin_cambios": procesadas - escritas,
+            "metricas": metricas,
+            "lotes": self.lotes
+        }
+        try:
+            os.makedirs(os.path.dirname(self.archivo) or ".", exist_ok=True)
+            temporal = f"{self.archivo}.tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False, indent=2)
+            os.replace(temporal, self.archivo)
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el resumen de la ejecución {self.archivo}: {e}")
@@ -2,10 +2,11 @@
 Script principal para extraer datos de empresas del sistema SAÓ FCT
 """
 import os
-import time
+import argparse
 import json
 import logging
 import re
+from dataclasses import replace
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -21,9 +22,17 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.chrome import ChromeDriverManager
 
 from models import EmpresaCompleta, ScrapingResult
+from sesion_cookies import AlmacenCookies
+from componentes_scraper import ComponentesScraper
+from configuracion import obtener_base_url
+from vigilancia import aplicar_timeouts
+from normalizacion import normalizar_empresas
+from logs_estructurados import configurar_logging, MUESTREO
+from perfilado import Perfilador
 
 
-class SAOScraper:
+
+class SAOScraper(ComponentesScraper):
     """Clase principal para el scraping del sistema SAÓ FCT"""
     
     def __init__(self, headless: bool = False):
@@ -51,17 +60,19 @@ class SAOScraper:
         
         if not self.usuario or not self.password:
             raise ValueError("Credenciales no encontradas en .env. Verifica SAO_USUARIO y SAO_PASSWORD")
+        
+        # Cookies de sesión cifradas, compartidas entre ejecuciones y workers
+        self.almacen_cookies = AlmacenCookies(self.usuario, self.password)
+        
+        # URL base del sistema (SAO_BASE_URL permite usar el servidor simulado)
+        self.base_url = obtener_base_url()
+        
+        # Componentes comunes: se crean tras comprobar las credenciales porque arrancan hilos
+        self._iniciar_componentes("scraper")
 
     def _setup_logging(self):
-        """Configura el sistema de logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('scraper.log'),
-                logging.StreamHandler()
-            ]
-        )
+        """Configura el sistema de logging (JSONL rotado, escrito en segundo plano)"""
+        configurar_logging('scraper.jsonl')
         self.logger = logging.getLogger(__name__)
 
     def _setup_driver(self):
@@ -82,6 +93,7 @@ class SAOScraper:
             
             service = FirefoxService(GeckoDriverManager().install())
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
+            aplicar_timeouts(self.driver)
             self.wait = WebDriverWait(self.driver, 10)
             
             self.logger.info("WebDriver Firefox configurado correctamente")
@@ -117,6 +129,7 @@ class SAOScraper:
                 service = Service(ChromeDriverManager().install())
             
             self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            aplicar_timeouts(self.driver)
             self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
             self.wait = WebDriverWait(self.driver, 10)
             
@@ -126,6 +139,21 @@ class SAOScraper:
             self.logger.error(f"Error configurando Chrome: {e}")
             raise Exception(f"No se pudo configurar ningún navegador. Firefox y Chrome fallaron.")
 
+    def iniciar_sesion(self) -> bool:
+        """
+        Inicia sesión reutilizando las cookies guardadas y solo rellena el
+        formulario de login si el servidor las rechaza
+
+        Returns:
+            bool: True si la sesión quedó iniciada
+        """
+        with self.tiempos.medir("login"):
+            if self.almacen_cookies.restaurar_en_driver(self.driver, self.base_url):
+                self.logger.info("Sesión restaurada desde cookies guardadas")
+                return True
+
+            return self.login()
+
     def login(self) -> bool:
         """
         Realiza el login en el sistema SAÓ FCT
@@ -137,7 +165,7 @@ class SAOScraper:
             self.logger.info("Iniciando proceso de login...")
             
             # Navegar a la página de login
-            login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+            login_url = f"{self.base_url}/index.php?op=4&subop=0"
             self.driver.get(login_url)
             
             # Esperar a que cargue la página
@@ -160,13 +188,14 @@ class SAOScraper:
             submit_button.click()
             
             # Esperar a que cargue la página principal
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Verificar si el login fue exitoso (ajustar según la respuesta del sistema)
             if "error" in self.driver.current_url.lower() or "login" in self.driver.current_url.lower():
                 self.logger.error("Error en el login - credenciales incorrectas o página de error")
                 return False
             
+            self.almacen_cookies.guardar(self.driver.get_cookies())
             self.logger.info("Login exitoso")
             return True
             
@@ -191,12 +220,13 @@ class SAOScraper:
             self.logger.info("Extrayendo listado de empresas...")
             
             # Navegar a la página del listado de empresas
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
-            self.driver.get(listado_url)
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0"
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(listado_url)
             self.logger.info(f"Navegando a: {listado_url}")
             
             # Esperar a que cargue la página
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Buscar tabla de empresas con diferentes selectores
             tabla_empresas = None
@@ -254,11 +284,12 @@ class SAOScraper:
                         )
                         
                         empresas.append(empresa)
-                        self.logger.info(f"Empresa {i}: {id_empresa} - {registrado}")
+                        self.logger.info("Empresa %d: %s - %s", i, id_empresa, registrado, extra=MUESTREO)
                         
                 except Exception as e:
                     self.logger.warning(f"Error procesando fila {i}: {e}")
                     self.errores += 1
+                    self.metricas.registrar_error(e)
                     continue
             
             self.logger.info(f"Listado extraído: {len(empresas)} empresas")
@@ -307,11 +338,12 @@ class SAOScraper:
                     )
                     
                     empresas.append(empresa)
-                    self.logger.info(f"Empresa {i}: {id_empresa} - {texto_enlace}")
+                    self.logger.info("Empresa %d: %s - %s", i, id_empresa, texto_enlace, extra=MUESTREO)
                     
             except Exception as e:
                 self.logger.warning(f"Error procesando enlace {i}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
                 continue
         
         return empresas
@@ -328,104 +360,39 @@ class SAOScraper:
         """
         try:
             # Navegar a la página de detalle
-            detalle_url = f"https://foremp.edu.gva.es/index.php?accion=19&idEmpresa={empresa.id_empresa}"
-            self.driver.get(detalle_url)
+            detalle_url = f"{self.base_url}/index.php?accion=19&idEmpresa={empresa.id_empresa}"
+            with self.tiempos.medir("navegacion_detalle"):
+                self.driver.get(detalle_url)
             
             # Esperar a que cargue la página
-            time.sleep(2)
+            self.tiempos.esperar(2)
             
             # Extraer datos detallados
             # Nota: Los selectores se ajustarán tras la primera ejecución
             try:
-                empresa.cif = self._extraer_campo("CIF")
-                empresa.nombre = self._extraer_campo("Nombre")
-                empresa.direccion = self._extraer_campo("Dirección")
-                empresa.provincia = self._extraer_campo("Provincia")
-                empresa.localidad = self._extraer_campo("Localidad")
-                empresa.cp = self._extraer_campo("CP")
-                empresa.telefono = self._extraer_campo("Teléfono")
-                empresa.fax = self._extraer_campo("Fax")
-                empresa.actividad = self._extraer_campo("Actividad")
-                empresa.nombre_gerente = self._extraer_campo("Nombre de gerente")
-                empresa.nif_gerente = self._extraer_campo("NIF gerente")
-                empresa.email = self._extraer_campo("E-mail")
-                empresa.tipo = self._extraer_campo("Tipo")
+                if self.archivo_html:
+                    with self.tiempos.medir("archivo_html"):
+                        self.archivo_html.guardar(empresa.id_empresa, self.driver.page_source)
+                with self.tiempos.medir("extraccion_campos"):
+                    for campo, valor in self.extractor_detalle.extraer_de_driver(self.driver).items():
+                        setattr(empresa, campo, valor)
                 
             except Exception as e:
                 self.logger.warning(f"Error extrayendo detalles de empresa {empresa.id_empresa}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
             
             # Delay entre peticiones
-            time.sleep(0.5)
+            self.tiempos.esperar(0.5)
             
             return empresa
             
         except Exception as e:
             self.logger.error(f"Error navegando a detalle de empresa {empresa.id_empresa}: {e}")
             self.errores += 1
+            self.metricas.registrar_error(e)
             return empresa
 
-    def _extraer_campo(self, nombre_campo: str) -> str:
-        """
-        Extrae un campo específico de la página de detalle
-        
-        Args:
-            nombre_campo: Nombre del campo a extraer
-            
-        Returns:
-            str: Valor del campo o cadena vacía si no se encuentra
-        """
-        try:
-            # Buscar en la tabla con clase "infoUsuario infoEmpresa"
-            tabla = self.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
-            filas = tabla.find_elements(By.TAG_NAME, "tr")
-            
-            # Mapeo de campos a posiciones basado en la estructura HTML real
-            mapeo_campos = {
-                "cif": 0,
-                "nombre": 1, 
-                "direccion": 3,
-                "provincia": 4,
-                "localidad": 5,
-                "cp": 6
-            }
-            
-            # Buscar en la primera sección (filas 0-1)
-            if len(filas) >= 2:
-                encabezados = filas[0].find_elements(By.TAG_NAME, "th")
-                valores = filas[1].find_elements(By.TAG_NAME, "td")
-                
-                # Buscar por nombre del campo en encabezados
-                for i, encabezado in enumerate(encabezados):
-                    if nombre_campo.lower() in encabezado.text.lower():
-                        if i < len(valores):
-                            return valores[i].text.strip()
-                        break
-                
-                # Buscar por posición si no se encuentra por nombre
-                campo_lower = nombre_campo.lower()
-                if campo_lower in mapeo_campos:
-                    pos = mapeo_campos[campo_lower]
-                    if pos < len(valores):
-                        return valores[pos].text.strip()
-            
-            # Buscar en la segunda sección (filas 2-3) para campos como teléfono, fax, etc.
-            if len(filas) >= 4:
-                encabezados_segunda = filas[2].find_elements(By.TAG_NAME, "th")
-                valores_segunda = filas[3].find_elements(By.TAG_NAME, "td")
-                
-                for i, encabezado in enumerate(encabezados_segunda):
-                    if nombre_campo.lower() in encabezado.text.lower():
-                        if i < len(valores_segunda):
-                            return valores_segunda[i].text.strip()
-                        break
-            
-            return ""
-            
-        except Exception as e:
-            self.logger.warning(f"Error extrayendo campo '{nombre_campo}': {e}")
-            return ""
-
     def extraer_todas_empresas(self) -> ScrapingResult:
         """
         Proceso completo de extracción de todas las empresas
@@ -440,7 +407,7 @@ class SAOScraper:
             self._setup_driver()
             
             # Login
-            if not self.login():
+            if not self.iniciar_sesion():
                 raise Exception("Error en el login")
             
             # Extraer listado
@@ -451,22 +418,34 @@ class SAOScraper:
             
             # Extraer detalles de cada empresa
             self.logger.info(f"Procesando {len(empresas)} empresas...")
+            self.progreso.iniciar(len(empresas), completadas=0)
             
             for i, empresa in enumerate(empresas, 1):
-                self.logger.info(f"Procesando empresa {i}/{len(empresas)}: {empresa.id_empresa}")
-                empresa_completa = self.extraer_detalle_empresa(empresa)
+                self.logger.info("Procesando empresa %d/%d: %s", i, len(empresas), empresa.id_empresa, extra=MUESTREO)
+                self.metricas.establecer_cola(len(empresas) - i)
+                empresa_completa = self._extraer_detalle_vigilado(empresa)
+                self.indice.agregar(empresa_completa)
+                self.metricas.empresa_completada()
+                self.progreso.avanzar()
                 self.empresas.append(empresa_completa)
             
+            self.progreso.finalizar()
+            
             # Calcular tiempo total
             fin = datetime.now()
             tiempo_total = str(fin - inicio)
             
+            with self.tiempos.medir("normalizacion"):
+                validacion = normalizar_empresas(self.empresas)
+            
             resultado = ScrapingResult(
                 empresas=self.empresas,
                 timestamp=inicio.isoformat(),
                 total_empresas=len(self.empresas),
                 errores=self.errores,
-                tiempo_total=tiempo_total
+                tiempo_total=tiempo_total,
+                metricas=self.tiempos.resumen(),
+                validacion=validacion
             )
             
             self.logger.info(f"Scraping completado: {len(self.empresas)} empresas en {tiempo_total}")
@@ -480,6 +459,7 @@ class SAOScraper:
 
     def cerrar_navegador(self):
         """Cierra el navegador y libera recursos"""
+        self._detener_componentes()
         if self.driver:
             try:
                 self.driver.quit()
@@ -490,30 +470,60 @@ class SAOScraper:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae el listado de empresas de SAÓ FCT y sus detalles")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar la ejecución (cProfile y comandos WebDriver por método y empresa)")
+    args = parser.parse_args()
+    
+    perfil = Perfilador("scraper").iniciar() if args.profile else None
     try:
         # Crear directorio de salida
         Path("output").mkdir(exist_ok=True)
         
         # Inicializar scraper
         scraper = SAOScraper(headless=False)  # Cambiar a True para ejecución sin interfaz
+        if perfil:
+            perfil.observar(scraper)
         
         # Ejecutar scraping
         resultado = scraper.extraer_todas_empresas()
         
-        # Exportar resultados
+        # Exportar resultados: solo las empresas nuevas o cambiadas desde la última escritura; las
+        # métricas y la validación quedan en el resumen de la ejecución aunque no haya cambiado ninguna
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         archivo_salida = f"output/empresas_{timestamp}.json"
-        resultado.to_json(archivo_salida)
+        cambiadas = scraper.hashes.cambiadas(resultado.empresas)
+        with scraper.tiempos.medir("escritura"):
+            scraper.catalogo.agregar_varias(resultado.empresas)
+            scraper.catalogo.guardar()
+        procesadas = len(resultado.empresas)
+        resultado = replace(resultado, empresas=cambiadas, total_empresas=len(cambiadas),
+                            metricas=scraper.tiempos.resumen(), sin_cambios=procesadas - len(cambiadas))
+        if cambiadas:
+            with scraper.tiempos.medir("escritura"):
+                resultado.to_json(archivo_salida)
+                scraper.hashes.registrar(cambiadas)
+                scraper.hashes.guardar()
+        scraper.ejecucion.anotar("todas", procesadas, len(cambiadas), archivo_salida if cambiadas else None,
+                                 resultado.validacion)
+        scraper.ejecucion.guardar(scraper.tiempos.resumen(), resultado.errores)
+        if not cambiadas:
+            archivo_salida = f"ninguno (ninguna empresa ha cambiado; resumen en {scraper.ejecucion.archivo})"
         
         print(f"\n✅ Scraping completado exitosamente!")
-        print(f"📊 Total empresas: {resultado.total_empresas}")
+        print(f"📊 Total empresas: {resultado.total_empresas + resultado.sin_cambios} "
+              f"({resultado.sin_cambios} sin cambios desde la última ejecución)")
         print(f"❌ Errores: {resultado.errores}")
         print(f"⏱️  Tiempo total: {resultado.tiempo_total}")
         print(f"💾 Archivo generado: {archivo_salida}")
+        print(f"\n⏱️  Tiempos por etapa:\n{scraper.tiempos.formatear_resumen()}")
         
     except Exception as e:
         print(f"❌ Error en el scraping: {e}")
         return 1
+    finally:
+        if perfil:
+            perfil.finalizar()
     
     return 0
 
@@ -2,12 +2,12 @@
 Script para continuar el scraping desde donde se quedó, usando GeckoDriver específico
 """
 import os
-import time
+import argparse
 import json
 import logging
-import re
 from datetime import datetime
 from pathlib import Path
+from collections import Counter
 from typing import List, Optional, Dict, Set
 
 from dotenv import load_dotenv
@@ -20,9 +20,17 @@ from selenium.webdriver.firefox.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
 from models import EmpresaCompleta, ScrapingResult
+from sesion_cookies import AlmacenCookies
+from componentes_scraper import ComponentesScraper
+from configuracion import obtener_base_url
+from vigilancia import aplicar_timeouts
+from normalizacion import normalizar_empresas
+from logs_estructurados import configurar_logging, MUESTREO
+from perfilado import Perfilador
+from filtro_localidad import BuscadorLocalidad
 
 
-class SAOScraperContinuar:
+class SAOScraperContinuar(ComponentesScraper):
     """Clase para continuar el scraping desde donde se quedó"""
     
     def __init__(self, headless: bool = False):
@@ -37,6 +45,7 @@ class SAOScraperContinuar:
         self.wait = None
         self.errores = 0
         self.localidades_procesadas = set()
+        self.empresas_por_localidad: Dict[str, int] = {}
         self.archivo_progreso = "progreso_localidades.json"
         
         # Configurar logging
@@ -52,6 +61,16 @@ class SAOScraperContinuar:
         if not self.usuario or not self.password:
             raise ValueError("Credenciales no encontradas en .env")
         
+        # Cookies de sesión cifradas, compartidas entre ejecuciones y workers
+        self.almacen_cookies = AlmacenCookies(self.usuario, self.password)
+        
+        # URL base del sistema (SAO_BASE_URL permite usar el servidor simulado)
+        self.base_url = obtener_base_url()
+        
+        # Componentes comunes: se crean tras comprobar las credenciales porque arrancan hilos
+        self._iniciar_componentes("continuar")
+        self.buscador_localidad = BuscadorLocalidad(base_url=self.base_url, tiempos=self.tiempos)
+        
         # Cargar progreso previo
         self.cargar_progreso()
         
@@ -59,19 +78,12 @@ class SAOScraperContinuar:
         self._setup_driver()
         
         # Realizar login
-        if not self.login():
+        if not self.iniciar_sesion():
             raise Exception("No se pudo realizar el login")
 
     def _setup_logging(self):
-        """Configura el sistema de logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('scraper_continuar.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """Configura el sistema de logging (JSONL rotado, escrito en segundo plano)"""
+        configurar_logging('scraper_continuar.jsonl')
         self.logger = logging.getLogger(__name__)
 
     def _setup_driver(self):
@@ -126,7 +138,7 @@ class SAOScraperContinuar:
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
             
             # Configurar timeouts más largos
-            self.driver.set_page_load_timeout(30)
+            aplicar_timeouts(self.driver)
             self.driver.implicitly_wait(10)
             self.wait = WebDriverWait(self.driver, 20)
             
@@ -139,6 +151,21 @@ class SAOScraperContinuar:
             self.logger.error(f"Error configurando WebDriver: {e}")
             raise
 
+    def iniciar_sesion(self) -> bool:
+        """
+        Inicia sesión reutilizando las cookies guardadas y solo rellena el
+        formulario de login si el servidor las rechaza
+
+        Returns:
+            bool: True si la sesión quedó iniciada
+        """
+        with self.tiempos.medir("login"):
+            if self.almacen_cookies.restaurar_en_driver(self.driver, self.base_url):
+                self.logger.info("Sesión restaurada desde cookies guardadas")
+                return True
+
+            return self.login()
+
     def login(self) -> bool:
         """
         Realiza el login en el sistema SAÓ FCT
@@ -150,9 +177,9 @@ class SAOScraperContinuar:
             self.logger.info("Iniciando proceso de login...")
             
             # Navegar a la página de login
-            login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+            login_url = f"{self.base_url}/index.php?op=4&subop=0"
             self.driver.get(login_url)
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Buscar campos de login
             usuario_field = self.driver.find_element(By.NAME, "usuario")
@@ -168,10 +195,11 @@ class SAOScraperContinuar:
             # Enviar formulario
             submit_button = self.driver.find_element(By.XPATH, "//input[@type='submit']")
             submit_button.click()
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Verificar si el login fue exitoso
             if "login" not in self.driver.current_url.lower():
+                self.almacen_cookies.guardar(self.driver.get_cookies())
                 self.logger.info("Login exitoso")
                 return True
             else:
@@ -197,6 +225,7 @@ class SAOScraperContinuar:
                     with open(cache_file, 'r', encoding='utf-8') as f:
                         cache_data = json.load(f)
                         localidades = cache_data.get('localidades', [])
+                        self.empresas_por_localidad = cache_data.get('empresas_por_localidad', {})
                         timestamp = cache_data.get('timestamp', '')
                         self.logger.info(f"Usando lista de localidades en caché ({len(localidades)} localidades, {timestamp})")
                         return localidades
@@ -207,12 +236,14 @@ class SAOScraperContinuar:
             self.logger.info("Obteniendo lista de localidades de todas las páginas...")
             
             # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(listado_url)
             self.logger.info(f"Navegando a: {listado_url}")
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             localidades = set()
+            conteo_localidades = Counter()
             pagina_actual = 1
             total_empresas = 0
             
@@ -235,6 +266,7 @@ class SAOScraperContinuar:
                             
                             if localidad:
                                 localidades.add(localidad)
+                                conteo_localidades[localidad] += 1
                                 empresas_en_pagina += 1
                                 
                     except Exception as e:
@@ -257,8 +289,9 @@ class SAOScraperContinuar:
                             break
                     
                     if siguiente_enlace:
-                        siguiente_enlace.click()
-                        time.sleep(3)
+                        with self.tiempos.medir("pagina_listado"):
+                            siguiente_enlace.click()
+                        self.tiempos.esperar(3)
                         pagina_actual += 1
                     else:
                         self.logger.info("No hay más páginas disponibles")
@@ -269,6 +302,7 @@ class SAOScraperContinuar:
                     break
             
             localidades_lista = sorted(list(localidades))
+            self.empresas_por_localidad = dict(conteo_localidades)
             self.logger.info(f"Total localidades encontradas en {pagina_actual} páginas: {len(localidades_lista)}")
             self.logger.info(f"Total empresas encontradas: {total_empresas}")
             
@@ -278,9 +312,10 @@ class SAOScraperContinuar:
                     'localidades': localidades_lista,
                     'timestamp': datetime.now().isoformat(),
                     'total_paginas': pagina_actual,
-                    'total_empresas': total_empresas
+                    'total_empresas': total_empresas,
+                    'empresas_por_localidad': self.empresas_por_localidad
                 }
-                with open(cache_file, 'w', encoding='utf-8') as f:
+                with self.tiempos.medir("escritura"), open(cache_file, 'w', encoding='utf-8') as f:
                     json.dump(cache_data, f, ensure_ascii=False, indent=2)
                 self.logger.info(f"Lista de localidades guardada en caché: {cache_file}")
             except Exception as e:
@@ -296,6 +331,9 @@ class SAOScraperContinuar:
         """
         Extrae todas las empresas de una localidad específica
         
+        Usa el filtro del listado si el servidor lo admite y, si no, una
+        búsqueda binaria sobre el listado ordenado por localidad.
+        
         Args:
             localidad: Nombre de la localidad
             
@@ -305,50 +343,19 @@ class SAOScraperContinuar:
         try:
             self.logger.info(f"Extrayendo empresas de {localidad}...")
             
-            # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
-            time.sleep(3)
-            
-            # Buscar tabla de empresas
-            tabla_empresas = self.driver.find_element(By.CSS_SELECTOR, "table")
-            filas = tabla_empresas.find_elements(By.TAG_NAME, "tr")
+            filas = self.buscador_localidad.extraer(self.driver, localidad)
             
             empresas = []
-            
-            for i, fila in enumerate(filas[1:], 1):  # Saltar encabezado
-                try:
-                    celdas = fila.find_elements(By.TAG_NAME, "td")
-                    
-                    if len(celdas) >= 7:  # Mínimo 7 columnas esperadas
-                        # Extraer localidad de la columna 6 (índice 6)
-                        localidad_empresa = celdas[6].text.strip() if len(celdas) > 6 else ""
-                        
-                        # Solo procesar empresas de la localidad específica
-                        if localidad_empresa == localidad:
-                            # Extraer id_empresa del enlace
-                            enlace = fila.find_element(By.TAG_NAME, "a")
-                            href = enlace.get_attribute("href")
-                            id_empresa = re.search(r'idEmpresa=(\d+)', href)
-                            id_empresa = id_empresa.group(1) if id_empresa else ""
-                            
-                            # Extraer nombre de la empresa
-                            nombre = celdas[1].text.strip() if len(celdas) > 1 else ""
-                            
-                            # Crear empresa básica
-                            empresa = EmpresaCompleta(
-                                id_empresa=id_empresa,
-                                nombre=nombre,
-                                localidad=localidad
-                            )
-                            
-                            empresas.append(empresa)
-                            self.logger.info(f"Empresa {len(empresas)}: {id_empresa} - {nombre}")
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error procesando fila {i}: {e}")
-                    self.errores += 1
-                    continue
+            for fila in filas:
+                # Crear empresa básica
+                empresa = EmpresaCompleta(
+                    id_empresa=fila['id_empresa'],
+                    nombre=fila['nombre'],
+                    localidad=localidad
+                )
+                
+                empresas.append(empresa)
+                self.logger.info("Empresa %d: %s - %s", len(empresas), empresa.id_empresa, empresa.nombre, extra=MUESTREO)
             
             self.logger.info(f"Empresas encontradas en {localidad}: {len(empresas)}")
             return empresas
@@ -369,32 +376,27 @@ class SAOScraperContinuar:
         """
         try:
             # Navegar a la página de detalle
-            detalle_url = f"https://foremp.edu.gva.es/index.php?accion=19&idEmpresa={empresa.id_empresa}"
-            self.driver.get(detalle_url)
-            time.sleep(2)
+            detalle_url = f"{self.base_url}/index.php?accion=19&idEmpresa={empresa.id_empresa}"
+            with self.tiempos.medir("navegacion_detalle"):
+                self.driver.get(detalle_url)
+            self.tiempos.esperar(2)
             
             # Extraer datos detallados
             try:
-                empresa.cif = self._extraer_campo("CIF")
-                empresa.nombre = self._extraer_campo("Nombre")
-                empresa.direccion = self._extraer_campo("Dirección")
-                empresa.provincia = self._extraer_campo("Provincia")
-                empresa.localidad = self._extraer_campo("Localidad")
-                empresa.cp = self._extraer_campo("CP")
-                empresa.telefono = self._extraer_campo("Teléfono")
-                empresa.fax = self._extraer_campo("Fax")
-                empresa.actividad = self._extraer_campo("Actividad")
-                empresa.nombre_gerente = self._extraer_campo("Nombre de gerente")
-                empresa.nif_gerente = self._extraer_campo("NIF gerente")
-                empresa.email = self._extraer_campo("E-mail")
-                empresa.tipo = self._extraer_campo("Tipo")
+                if self.archivo_html:
+                    with self.tiempos.medir("archivo_html"):
+                        self.archivo_html.guardar(empresa.id_empresa, self.driver.page_source)
+                with self.tiempos.medir("extraccion_campos"):
+                    for campo, valor in self.extractor_detalle.extraer_de_driver(self.driver).items():
+                        setattr(empresa, campo, valor)
                 
             except Exception as e:
                 self.logger.warning(f"Error extrayendo detalles de empresa {empresa.id_empresa}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
             
             # Delay entre peticiones (más largo para evitar saturar el servidor)
-            time.sleep(2.0)
+            self.tiempos.esperar(2.0)
             
             return empresa
             
@@ -402,35 +404,6 @@ class SAOScraperContinuar:
             self.logger.error(f"Error navegando a detalle de empresa {empresa.id_empresa}: {e}")
             return empresa
 
-    def _extraer_campo(self, nombre_campo: str) -> str:
-        """
-        Extrae un campo específico de la página de detalle
-        
-        Args:
-            nombre_campo: Nombre del campo a extraer
-            
-        Returns:
-            str: Valor del campo
-        """
-        try:
-            # Buscar tabla de información
-            tabla_info = self.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
-            filas = tabla_info.find_elements(By.TAG_NAME, "tr")
-            
-            if len(filas) >= 2:
-                headers = filas[0].find_elements(By.TAG_NAME, "th")
-                valores = filas[1].find_elements(By.TAG_NAME, "td")
-                
-                for i, header in enumerate(headers):
-                    if header.text.strip() == nombre_campo and i < len(valores):
-                        return valores[i].text.strip()
-            
-            return ""
-            
-        except Exception as e:
-            self.logger.warning(f"Error extrayendo campo {nombre_campo}: {e}")
-            return ""
-
     def procesar_localidad(self, localidad: str) -> bool:
         """
         Procesa una localidad específica
@@ -457,32 +430,58 @@ class SAOScraperContinuar:
             empresas_completas = []
             for i, empresa in enumerate(empresas, 1):
                 try:
-                    self.logger.info(f"Procesando empresa {i}/{len(empresas)}: {empresa.id_empresa}")
+                    self.logger.info("Procesando empresa %d/%d: %s", i, len(empresas), empresa.id_empresa, extra=MUESTREO)
+                    self.metricas.establecer_cola(len(empresas) - i)
                     
                     # Extraer detalles de la empresa
-                    empresa_completa = self.extraer_detalle_empresa(empresa)
+                    empresa_completa = self._extraer_detalle_vigilado(empresa)
+                    self.indice.agregar(empresa_completa)
+                    self.metricas.empresa_completada()
+                    self.progreso.avanzar()
                     empresas_completas.append(empresa_completa)
                     
                 except Exception as e:
                     self.logger.error(f"Error procesando empresa {empresa.id_empresa}: {e}")
                     self.errores += 1
+                    self.metricas.registrar_error(e)
                     continue
             
             # Guardar archivo por localidad
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             archivo_salida = f"output/empresas_{localidad}_{timestamp}.json"
             
-            resultado = ScrapingResult(
-                empresas=empresas_completas,
-                timestamp=datetime.now().isoformat(),
-                total_empresas=len(empresas_completas),
-                errores=self.errores,
-                tiempo_total=None
-            )
-            
-            resultado.to_json(archivo_salida)
-            
-            self.logger.info(f"Localidad {localidad} completada: {len(empresas_completas)} empresas guardadas en {archivo_salida}")
+            with self.tiempos.medir("normalizacion"):
+                validacion = normalizar_empresas(empresas_completas)
+            
+            # Solo se escriben las empresas nuevas o cambiadas desde la última escritura; las métricas
+            # y la validación quedan en el resumen de la ejecución aunque no haya cambiado ninguna
+            cambiadas = self.hashes.cambiadas(empresas_completas)
+            with self.tiempos.medir("escritura"):
+                self.indice.localidad_guardada()
+                self.catalogo.agregar_varias(empresas_completas)
+                self.catalogo.guardar()
+            
+            if cambiadas:
+                resultado = ScrapingResult(
+                    empresas=cambiadas,
+                    timestamp=datetime.now().isoformat(),
+                    total_empresas=len(cambiadas),
+                    errores=self.errores,
+                    tiempo_total=None,
+                    metricas=self.tiempos.resumen(),
+                    validacion=validacion,
+                    sin_cambios=len(empresas_completas) - len(cambiadas)
+                )
+                with self.tiempos.medir("escritura"):
+                    resultado.to_json(archivo_salida)
+                    self.hashes.registrar(cambiadas)
+                    self.hashes.guardar()
+                self.logger.info(f"Localidad {localidad} completada: {len(cambiadas)} de {len(empresas_completas)} empresas "
+                                 f"nuevas o cambiadas guardadas en {archivo_salida}")
+            else:
+                self.logger.info(f"Ninguna empresa de {localidad} ha cambiado desde la última escritura, no se genera archivo")
+            self.ejecucion.anotar(localidad, len(empresas_completas), len(cambiadas),
+                                  archivo_salida if cambiadas else None, validacion)
             
             # Guardar progreso
             self.guardar_progreso(localidad)
@@ -517,7 +516,7 @@ class SAOScraperContinuar:
                 "ultima_actualizacion": datetime.now().isoformat()
             }
             
-            with open(self.archivo_progreso, 'w', encoding='utf-8') as f:
+            with self.tiempos.medir("escritura"), open(self.archivo_progreso, 'w', encoding='utf-8') as f:
                 json.dump(progreso, f, ensure_ascii=False, indent=2)
             
             self.logger.info(f"Progreso guardado: {localidad} añadida")
@@ -557,6 +556,14 @@ class SAOScraperContinuar:
             
             self.logger.info(f"Procesando {len(localidades_a_procesar)} localidades: {localidades_a_procesar}")
             
+            # Progreso global: total exacto si la caché tiene el recuento por localidad
+            if self.empresas_por_localidad:
+                hechas = sum(self.empresas_por_localidad.get(loc, 0) for loc in self.localidades_procesadas)
+                self.progreso.iniciar(hechas + sum(self.empresas_por_localidad.get(loc, 0) for loc in localidades_a_procesar),
+                                      completadas=hechas)
+            else:
+                self.progreso.iniciar(None, completadas=None if self.localidades_procesadas else 0)
+            
             # Procesar cada localidad
             for i, localidad in enumerate(localidades_a_procesar, 1):
                 self.logger.info(f"\n--- Procesando localidad {i}/{len(localidades_a_procesar)}: {localidad} ---")
@@ -570,16 +577,21 @@ class SAOScraperContinuar:
                 except Exception as e:
                     self.logger.error(f"Error procesando localidad {localidad}: {e}")
                     continue
+                
+                self.progreso.estimar_total(len(self.localidades_procesadas), len(localidades_a_procesar) - i)
             
+            self.progreso.finalizar()
             self.logger.info("Procesamiento completado!")
             self.logger.info(f"Localidades procesadas: {len(self.localidades_procesadas)}")
             self.logger.info(f"Errores totales: {self.errores}")
+            self.logger.info(f"Tiempos por etapa:\n{self.tiempos.formatear_resumen()}")
             
         except Exception as e:
             self.logger.error(f"Error en el procesamiento: {e}")
 
     def cerrar(self):
         """Cierra el navegador"""
+        self._detener_componentes()
         if self.driver:
             self.driver.quit()
             self.logger.info("Navegador cerrado")
@@ -587,6 +599,12 @@ class SAOScraperContinuar:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Continúa la extracción de empresas por localidad de SAÓ FCT")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar la ejecución (cProfile y comandos WebDriver por método y empresa)")
+    args = parser.parse_args()
+    
+    perfil = Perfilador("continuar").iniciar() if args.profile else None
     scraper = None
     try:
         # Crear directorio de salida
@@ -594,6 +612,8 @@ def main():
         
         # Inicializar scraper
         scraper = SAOScraperContinuar(headless=False)  # Cambiar a True para ejecución sin interfaz
+        if perfil:
+            perfil.observar(scraper)
         
         # Procesar localidades pendientes (máximo 5 para prueba)
         scraper.procesar_localidades(max_localidades=5)
@@ -604,6 +624,8 @@ def main():
     finally:
         if scraper:
             scraper.cerrar()
+        if perfil:
+            perfil.finalizar()
     
     return 0
 
@@ -2,13 +2,13 @@
 Script optimizado para extraer todas las empresas y luego procesar sus detalles
 """
 import os
-import time
+import argparse
 import json
 import logging
 import re
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Dict, Set
+from typing import List, Optional, Dict, Set, Tuple
 
 from dotenv import load_dotenv
 from selenium import webdriver
@@ -20,9 +20,21 @@ from selenium.webdriver.firefox.options import Options
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
 from models import EmpresaCompleta, ScrapingResult
+from sesion_cookies import AlmacenCookies
+from componentes_scraper import ComponentesScraper
+from configuracion import obtener_base_url
+from vigilancia import aplicar_timeouts
+from normalizacion import normalizar_empresas
+from registro_hashes import hashes_filas
+from logs_estructurados import configurar_logging, MUESTREO
+from perfilado import Perfilador
+from checkpoint_listado import CheckpointListado
 
+# Columna del listado por la que se ordena según la fecha de registro
+ORDEN_FECHA_REGISTRO = "registrado"
 
-class SAOScraperEmpresasCompleto:
+
+class SAOScraperEmpresasCompleto(ComponentesScraper):
     """Clase para extraer todas las empresas y procesar sus detalles"""
     
     def __init__(self, headless: bool = False):
@@ -38,7 +50,10 @@ class SAOScraperEmpresasCompleto:
         self.errores = 0
         self.empresas_procesadas = set()
         self.archivo_empresas = "empresas_listado.json"
+        # id_empresa -> huella de cada fila del listado tal como está en archivo_empresas
+        self.hashes_listado: Dict[str, str] = {}
         self.archivo_progreso = "progreso_empresas.json"
+        self.archivo_checkpoint_listado = "empresas_listado.checkpoint.jsonl"
         
         # Configurar logging
         self._setup_logging()
@@ -53,6 +68,15 @@ class SAOScraperEmpresasCompleto:
         if not self.usuario or not self.password:
             raise ValueError("Credenciales no encontradas en .env")
         
+        # Cookies de sesión cifradas, compartidas entre ejecuciones y workers
+        self.almacen_cookies = AlmacenCookies(self.usuario, self.password)
+        
+        # URL base del sistema (SAO_BASE_URL permite usar el servidor simulado)
+        self.base_url = obtener_base_url()
+        
+        # Componentes comunes: se crean tras comprobar las credenciales porque arrancan hilos
+        self._iniciar_componentes("empresas_completo")
+        
         # Cargar progreso previo
         self.cargar_progreso()
         
@@ -60,19 +84,12 @@ class SAOScraperEmpresasCompleto:
         self._setup_driver()
         
         # Realizar login
-        if not self.login():
+        if not self.iniciar_sesion():
             raise Exception("No se pudo realizar el login")
 
     def _setup_logging(self):
-        """Configura el sistema de logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('scraper_empresas.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """Configura el sistema de logging (JSONL rotado, escrito en segundo plano)"""
+        configurar_logging('scraper_empresas.jsonl')
         self.logger = logging.getLogger(__name__)
 
     def _setup_driver(self):
@@ -127,7 +144,7 @@ class SAOScraperEmpresasCompleto:
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
             
             # Configurar timeouts más largos
-            self.driver.set_page_load_timeout(30)
+            aplicar_timeouts(self.driver)
             self.driver.implicitly_wait(10)
             self.wait = WebDriverWait(self.driver, 20)
             
@@ -140,6 +157,21 @@ class SAOScraperEmpresasCompleto:
             self.logger.error(f"Error configurando WebDriver: {e}")
             raise
 
+    def iniciar_sesion(self) -> bool:
+        """
+        Inicia sesión reutilizando las cookies guardadas y solo rellena el
+        formulario de login si el servidor las rechaza
+
+        Returns:
+            bool: True si la sesión quedó iniciada
+        """
+        with self.tiempos.medir("login"):
+            if self.almacen_cookies.restaurar_en_driver(self.driver, self.base_url):
+                self.logger.info("Sesión restaurada desde cookies guardadas")
+                return True
+
+            return self.login()
+
     def login(self) -> bool:
         """
         Realiza el login en el sistema SAÓ FCT
@@ -151,9 +183,9 @@ class SAOScraperEmpresasCompleto:
             self.logger.info("Iniciando proceso de login...")
             
             # Navegar a la página de login
-            login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+            login_url = f"{self.base_url}/index.php?op=4&subop=0"
             self.driver.get(login_url)
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Buscar campos de login
             usuario_field = self.driver.find_element(By.NAME, "usuario")
@@ -169,10 +201,11 @@ class SAOScraperEmpresasCompleto:
             # Enviar formulario
             submit_button = self.driver.find_element(By.XPATH, "//input[@type='submit']")
             submit_button.click()
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Verificar si el login fue exitoso
             if "login" not in self.driver.current_url.lower():
+                self.almacen_cookies.guardar(self.driver.get_cookies())
                 self.logger.info("Login exitoso")
                 return True
             else:
@@ -187,6 +220,9 @@ class SAOScraperEmpresasCompleto:
         """
         Extrae todas las empresas de todas las páginas y las guarda en un JSON
         
+        Si un recorrido anterior se interrumpió, continúa desde la última
+        página completada según el checkpoint del listado.
+        
         Returns:
             List[Dict]: Lista de empresas con datos básicos
         """
@@ -198,6 +234,7 @@ class SAOScraperEmpresasCompleto:
                         empresas_data = json.load(f)
                         empresas = empresas_data.get('empresas', [])
                         timestamp = empresas_data.get('timestamp', '')
+                        self.hashes_listado = hashes_filas(empresas)
                         self.logger.info(f"Usando listado de empresas en caché ({len(empresas)} empresas, {timestamp})")
                         return empresas
                 except Exception as e:
@@ -206,108 +243,274 @@ class SAOScraperEmpresasCompleto:
             self.logger.info("Extrayendo todas las empresas de todas las páginas...")
             
             # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
-            self.logger.info(f"Navegando a: {listado_url}")
-            time.sleep(3)
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
             
             todas_las_empresas = []
+            ids_vistos = set()
             pagina_actual = 1
-            total_empresas = 0
+            
+            # Reanudar desde el checkpoint si el recorrido anterior se interrumpió
+            checkpoint = CheckpointListado(self.archivo_checkpoint_listado)
+            estado = checkpoint.cargar()
+            
+            if estado:
+                todas_las_empresas = estado['empresas']
+                ids_vistos = {emp['id_empresa'] for emp in todas_las_empresas}
+                pagina_actual = estado['pagina'] + 1
+                self.logger.info(f"Reanudando listado en la página {pagina_actual} "
+                                 f"({len(todas_las_empresas)} empresas ya extraídas)")
+                
+                if not self._ir_a_pagina_listado(listado_url, estado['url_siguiente'], pagina_actual):
+                    self.logger.info("No hay más páginas pendientes en el checkpoint")
+                    pagina_actual -= 1
+                    return self._guardar_listado_completo(todas_las_empresas, pagina_actual, checkpoint)
+            else:
+                with self.tiempos.medir("pagina_listado"):
+                    self.driver.get(listado_url)
+                self.logger.info(f"Navegando a: {listado_url}")
+                self.tiempos.esperar(3)
             
             while True:
                 self.logger.info(f"Procesando página {pagina_actual}...")
                 
-                # Buscar tabla de empresas en la página actual
-                tabla_empresas = self.driver.find_element(By.CSS_SELECTOR, "table")
-                filas = tabla_empresas.find_elements(By.TAG_NAME, "tr")
-                
-                empresas_en_pagina = 0
-                
-                for i, fila in enumerate(filas[1:], 1):  # Saltar encabezado
-                    try:
-                        celdas = fila.find_elements(By.TAG_NAME, "td")
-                        
-                        if len(celdas) >= 7:  # Mínimo 7 columnas esperadas
-                            # Extraer datos básicos
-                            enlace = fila.find_element(By.TAG_NAME, "a")
-                            href = enlace.get_attribute("href")
-                            id_empresa = re.search(r'idEmpresa=(\d+)', href)
-                            id_empresa = id_empresa.group(1) if id_empresa else ""
-                            
-                            nombre = celdas[1].text.strip() if len(celdas) > 1 else ""
-                            localidad = celdas[6].text.strip() if len(celdas) > 6 else ""
-                            
-                            if id_empresa and nombre:
-                                empresa_data = {
-                                    "id_empresa": id_empresa,
-                                    "nombre": nombre,
-                                    "localidad": localidad,
-                                    "url_detalle": href,
-                                    "procesada": False
-                                }
-                                todas_las_empresas.append(empresa_data)
-                                empresas_en_pagina += 1
-                                self.logger.info(f"Empresa {total_empresas + empresas_en_pagina}: {id_empresa} - {nombre} ({localidad})")
-                                
-                    except Exception as e:
-                        self.logger.warning(f"Error procesando fila {i}: {e}")
-                        continue
+                empresas_pagina = []
+                for empresa_data in self._extraer_filas_pagina():
+                    if empresa_data['id_empresa'] not in ids_vistos:
+                        empresas_pagina.append(empresa_data)
+                        ids_vistos.add(empresa_data['id_empresa'])
+                        self.logger.info("Empresa %d: %s - %s (%s)", len(todas_las_empresas) + len(empresas_pagina),
+                                         empresa_data['id_empresa'], empresa_data['nombre'], empresa_data['localidad'],
+                                         extra=MUESTREO)
                 
-                total_empresas += empresas_en_pagina
-                self.logger.info(f"Página {pagina_actual}: {empresas_en_pagina} empresas (Total: {total_empresas})")
+                todas_las_empresas.extend(empresas_pagina)
+                self.logger.info(f"Página {pagina_actual}: {len(empresas_pagina)} empresas (Total: {len(todas_las_empresas)})")
                 
                 # Buscar enlace a siguiente página
+                url_pagina = self.driver.current_url
                 try:
-                    # Buscar diferentes tipos de enlaces de paginación
-                    siguiente_enlaces = self.driver.find_elements(By.XPATH, 
-                        "//a[contains(text(), 'Siguiente') or contains(text(), '>') or contains(text(), '>>') or contains(@class, 'next')]")
-                    
-                    siguiente_enlace = None
-                    for enlace in siguiente_enlaces:
-                        if enlace.is_enabled() and enlace.is_displayed():
-                            siguiente_enlace = enlace
-                            break
+                    siguiente_enlace = self._buscar_enlace_siguiente()
                     
                     if siguiente_enlace:
-                        siguiente_enlace.click()
-                        time.sleep(3)
-                        pagina_actual += 1
+                        with self.tiempos.medir("pagina_listado"):
+                            siguiente_enlace.click()
+                        self.tiempos.esperar(3)
                     else:
                         self.logger.info("No hay más páginas disponibles")
-                        break
                         
                 except Exception as e:
                     self.logger.info(f"No se encontró enlace a siguiente página: {e}")
+                    siguiente_enlace = None
+                
+                if not siguiente_enlace:
                     break
+                
+                # Checkpoint de la página completada; si la paginación no cambia la URL
+                # se guarda None y al reanudar se avanza pulsando "Siguiente"
+                url_siguiente = self.driver.current_url if self.driver.current_url != url_pagina else None
+                checkpoint.guardar_pagina(pagina_actual, empresas_pagina, url_siguiente)
+                pagina_actual += 1
             
-            # Guardar listado completo en JSON
-            empresas_data = {
-                "timestamp": datetime.now().isoformat(),
-                "total_empresas": total_empresas,
-                "total_paginas": pagina_actual,
-                "empresas": todas_las_empresas
-            }
+            return self._guardar_listado_completo(todas_las_empresas, pagina_actual, checkpoint)
             
-            with open(self.archivo_empresas, 'w', encoding='utf-8') as f:
-                json.dump(empresas_data, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self.logger.error(f"Error extrayendo empresas: {e}")
+            return []
+
+    def _extraer_filas_pagina(self) -> List[Dict]:
+        """
+        Extrae las filas de empresas de la página del listado cargada
+        
+        Returns:
+            List[Dict]: Empresas de la página con datos básicos
+        """
+        # Buscar tabla de empresas en la página actual
+        tabla_empresas = self.driver.find_element(By.CSS_SELECTOR, "table")
+        filas = tabla_empresas.find_elements(By.TAG_NAME, "tr")
+        
+        empresas_pagina = []
+        
+        for i, fila in enumerate(filas[1:], 1):  # Saltar encabezado
+            try:
+                celdas = fila.find_elements(By.TAG_NAME, "td")
+                
+                if len(celdas) >= 7:  # Mínimo 7 columnas esperadas
+                    # Extraer datos básicos
+                    enlace = fila.find_element(By.TAG_NAME, "a")
+                    href = enlace.get_attribute("href")
+                    id_empresa = re.search(r'idEmpresa=(\d+)', href)
+                    id_empresa = id_empresa.group(1) if id_empresa else ""
+                    
+                    nombre = celdas[1].text.strip() if len(celdas) > 1 else ""
+                    localidad = celdas[6].text.strip() if len(celdas) > 6 else ""
+                    
+                    if id_empresa and nombre:
+                        empresas_pagina.append({
+                            "id_empresa": id_empresa,
+                            "nombre": nombre,
+                            "localidad": localidad,
+                            "url_detalle": href,
+                            "procesada": False
+                        })
+                        
+            except Exception as e:
+                self.logger.warning(f"Error procesando fila {i}: {e}")
+                continue
+        
+        return empresas_pagina
+
+    def extraer_empresas_nuevas(self) -> Tuple[List[Dict], Set[str]]:
+        """
+        Añade al listado guardado las empresas registradas desde la última ejecución
+        
+        Recorre el listado de más reciente a más antigua y se detiene en la
+        primera página en la que todas las empresas ya son conocidas.
+        
+        Returns:
+            Tuple[List[Dict], Set[str]]: Listado completo actualizado e IDs nuevos
+        """
+        if not os.path.exists(self.archivo_empresas):
+            self.logger.info("No hay listado previo, se extrae el listado completo")
+            empresas = self.extraer_todas_las_empresas()
+            return empresas, {emp['id_empresa'] for emp in empresas}
+        
+        try:
+            with open(self.archivo_empresas, 'r', encoding='utf-8') as f:
+                empresas = json.load(f).get('empresas', [])
+            self.hashes_listado = hashes_filas(empresas)
             
-            self.logger.info(f"Listado de empresas guardado: {self.archivo_empresas}")
-            self.logger.info(f"Total empresas encontradas en {pagina_actual} páginas: {total_empresas}")
+            conocidas = {emp['id_empresa'] for emp in empresas} | self.empresas_procesadas
+            ids_nuevos = set()
             
-            return todas_las_empresas
+            # Listado ordenado por fecha de registro, las más recientes primero
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0&orden={ORDEN_FECHA_REGISTRO}&sentido=desc"
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(listado_url)
+            self.logger.info(f"Buscando empresas nuevas en: {listado_url}")
+            self.tiempos.esperar(3)
+            
+            pagina_actual = 1
+            while True:
+                empresas_pagina = self._extraer_filas_pagina()
+                nuevas = [emp for emp in empresas_pagina
+                          if emp['id_empresa'] not in conocidas and emp['id_empresa'] not in ids_nuevos]
+                
+                self.logger.info(f"Página {pagina_actual}: {len(nuevas)} empresas nuevas de {len(empresas_pagina)}")
+                
+                # Una página sin ninguna empresa nueva marca el límite de lo ya conocido
+                if not nuevas:
+                    break
+                
+                for empresa_data in nuevas:
+                    empresas.append(empresa_data)
+                    ids_nuevos.add(empresa_data['id_empresa'])
+                    self.logger.info(f"Empresa nueva: {empresa_data['id_empresa']} - {empresa_data['nombre']} ({empresa_data['localidad']})")
+                
+                siguiente_enlace = self._buscar_enlace_siguiente()
+                if not siguiente_enlace:
+                    break
+                with self.tiempos.medir("pagina_listado"):
+                    siguiente_enlace.click()
+                self.tiempos.esperar(3)
+                pagina_actual += 1
+            
+            if ids_nuevos:
+                self.actualizar_archivo_empresas(empresas)
+            
+            self.logger.info(f"Empresas nuevas encontradas en {pagina_actual} páginas: {len(ids_nuevos)}")
+            return empresas, ids_nuevos
             
         except Exception as e:
-            self.logger.error(f"Error extrayendo empresas: {e}")
-            return []
+            self.logger.error(f"Error buscando empresas nuevas: {e}")
+            return [], set()
+
+    def _buscar_enlace_siguiente(self):
+        """
+        Busca el enlace visible a la siguiente página del listado
+        
+        Returns:
+            WebElement del enlace o None si es la última página
+        """
+        # Buscar diferentes tipos de enlaces de paginación
+        siguiente_enlaces = self.driver.find_elements(By.XPATH, 
+            "//a[contains(text(), 'Siguiente') or contains(text(), '>') or contains(text(), '>>') or contains(@class, 'next')]")
+        
+        for enlace in siguiente_enlaces:
+            if enlace.is_enabled() and enlace.is_displayed():
+                return enlace
+        return None
+
+    def _ir_a_pagina_listado(self, listado_url: str, url_pagina: Optional[str], pagina: int) -> bool:
+        """
+        Posiciona el navegador en una página concreta del listado
+        
+        Args:
+            listado_url: URL de la primera página del listado
+            url_pagina: URL directa de la página, si se conoce
+            pagina: Número de página (empezando en 1)
+            
+        Returns:
+            bool: True si el navegador quedó en la página pedida
+        """
+        if url_pagina:
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(url_pagina)
+            self.tiempos.esperar(3)
+            return True
+        
+        # Sin URL directa hay que avanzar pulsando "Siguiente", sin leer las filas
+        with self.tiempos.medir("pagina_listado"):
+            self.driver.get(listado_url)
+        self.tiempos.esperar(3)
+        for _ in range(pagina - 1):
+            siguiente_enlace = self._buscar_enlace_siguiente()
+            if not siguiente_enlace:
+                return False
+            with self.tiempos.medir("pagina_listado"):
+                siguiente_enlace.click()
+            self.tiempos.esperar(3)
+        return True
+
+    def _guardar_listado_completo(self, todas_las_empresas: List[Dict], total_paginas: int,
+                                  checkpoint: CheckpointListado) -> List[Dict]:
+        """
+        Guarda el listado completo y elimina el checkpoint del recorrido
+        
+        Args:
+            todas_las_empresas: Empresas extraídas de todas las páginas
+            total_paginas: Número de páginas recorridas
+            checkpoint: Checkpoint del recorrido a eliminar
+            
+        Returns:
+            List[Dict]: La misma lista de empresas
+        """
+        # Guardar listado completo en JSON
+        empresas_data = {
+            "timestamp": datetime.now().isoformat(),
+            "total_empresas": len(todas_las_empresas),
+            "total_paginas": total_paginas,
+            "empresas": todas_las_empresas
+        }
+        
+        with self.tiempos.medir("escritura"), open(self.archivo_empresas, 'w', encoding='utf-8') as f:
+            json.dump(empresas_data, f, ensure_ascii=False, indent=2)
+        self.hashes_listado = hashes_filas(todas_las_empresas)
+        
+        checkpoint.borrar()
+        
+        self.logger.info(f"Listado de empresas guardado: {self.archivo_empresas}")
+        self.logger.info(f"Total empresas encontradas en {total_paginas} páginas: {len(todas_las_empresas)}")
+        
+        return todas_las_empresas
 
-    def procesar_empresas_por_localidad(self, empresas: List[Dict], max_empresas: Optional[int] = None):
+    def procesar_empresas_por_localidad(self, empresas: List[Dict], max_empresas: Optional[int] = None,
+                                        solo_ids: Optional[Set[str]] = None):
         """
         Procesa las empresas agrupadas por localidad
         
         Args:
             empresas: Lista de empresas con datos básicos
             max_empresas: Número máximo de empresas a procesar (None para todas)
+            solo_ids: Si se indica, solo se procesan las empresas con estos IDs
         """
         try:
             # Agrupar empresas por localidad
@@ -320,13 +523,21 @@ class SAOScraperEmpresasCompleto:
             
             self.logger.info(f"Empresas agrupadas en {len(empresas_por_localidad)} localidades")
             
+            # Progreso global sobre las empresas seleccionadas del listado
+            seleccionadas = [emp for emp in empresas if solo_ids is None or emp['id_empresa'] in solo_ids]
+            ya_procesadas = sum(1 for emp in seleccionadas if emp.get('procesada', False))
+            pendientes = len(seleccionadas) - ya_procesadas
+            self.progreso.iniciar(ya_procesadas + (min(pendientes, max_empresas) if max_empresas else pendientes),
+                                  completadas=ya_procesadas)
+            
             # Procesar cada localidad
             empresas_procesadas_total = 0
             for localidad, empresas_localidad in empresas_por_localidad.items():
                 self.logger.info(f"Procesando localidad: {localidad} ({len(empresas_localidad)} empresas)")
                 
                 # Filtrar empresas no procesadas
-                empresas_pendientes = [emp for emp in empresas_localidad if not emp.get('procesada', False)]
+                empresas_pendientes = [emp for emp in empresas_localidad if not emp.get('procesada', False)
+                                       and (solo_ids is None or emp['id_empresa'] in solo_ids)]
                 
                 if not empresas_pendientes:
                     self.logger.info(f"Todas las empresas de {localidad} ya procesadas")
@@ -340,7 +551,9 @@ class SAOScraperEmpresasCompleto:
                         break
                     
                     try:
-                        self.logger.info(f"Procesando empresa {i}/{len(empresas_pendientes)}: {empresa_data['id_empresa']}")
+                        self.logger.info("Procesando empresa %d/%d: %s", i, len(empresas_pendientes), empresa_data['id_empresa'],
+                                         extra=MUESTREO)
+                        self.metricas.establecer_cola(len(empresas_pendientes) - i)
                         
                         # Crear objeto EmpresaCompleta
                         empresa = EmpresaCompleta(
@@ -350,7 +563,10 @@ class SAOScraperEmpresasCompleto:
                         )
                         
                         # Extraer detalles de la empresa
-                        empresa_completa = self.extraer_detalle_empresa(empresa)
+                        empresa_completa = self._extraer_detalle_vigilado(empresa)
+                        self.indice.agregar(empresa_completa)
+                        self.metricas.empresa_completada()
+                        self.progreso.avanzar()
                         empresas_completas.append(empresa_completa)
                         
                         # Marcar como procesada
@@ -361,11 +577,12 @@ class SAOScraperEmpresasCompleto:
                         self.guardar_progreso_empresa(empresa_data['id_empresa'])
                         
                         # Delay entre peticiones
-                        time.sleep(2.0)
+                        self.tiempos.esperar(2.0)
                         
                     except Exception as e:
                         self.logger.error(f"Error procesando empresa {empresa_data['id_empresa']}: {e}")
                         self.errores += 1
+                        self.metricas.registrar_error(e)
                         continue
                 
                 # Guardar archivo para esta localidad si hay empresas procesadas
@@ -379,6 +596,7 @@ class SAOScraperEmpresasCompleto:
                 if max_empresas and empresas_procesadas_total >= max_empresas:
                     break
             
+            self.progreso.finalizar()
             self.logger.info(f"Procesamiento completado: {empresas_procesadas_total} empresas procesadas")
             
         except Exception as e:
@@ -396,29 +614,24 @@ class SAOScraperEmpresasCompleto:
         """
         try:
             # Navegar a la página de detalle
-            detalle_url = f"https://foremp.edu.gva.es/index.php?accion=19&idEmpresa={empresa.id_empresa}"
-            self.driver.get(detalle_url)
-            time.sleep(2)
+            detalle_url = f"{self.base_url}/index.php?accion=19&idEmpresa={empresa.id_empresa}"
+            with self.tiempos.medir("navegacion_detalle"):
+                self.driver.get(detalle_url)
+            self.tiempos.esperar(2)
             
             # Extraer datos detallados
             try:
-                empresa.cif = self._extraer_campo("CIF")
-                empresa.nombre = self._extraer_campo("Nombre")
-                empresa.direccion = self._extraer_campo("Dirección")
-                empresa.provincia = self._extraer_campo("Provincia")
-                empresa.localidad = self._extraer_campo("Localidad")
-                empresa.cp = self._extraer_campo("CP")
-                empresa.telefono = self._extraer_campo("Teléfono")
-                empresa.fax = self._extraer_campo("Fax")
-                empresa.actividad = self._extraer_campo("Actividad")
-                empresa.nombre_gerente = self._extraer_campo("Nombre de gerente")
-                empresa.nif_gerente = self._extraer_campo("NIF gerente")
-                empresa.email = self._extraer_campo("E-mail")
-                empresa.tipo = self._extraer_campo("Tipo")
+                if self.archivo_html:
+                    with self.tiempos.medir("archivo_html"):
+                        self.archivo_html.guardar(empresa.id_empresa, self.driver.page_source)
+                with self.tiempos.medir("extraccion_campos"):
+                    for campo, valor in self.extractor_detalle.extraer_de_driver(self.driver).items():
+                        setattr(empresa, campo, valor)
                 
             except Exception as e:
                 self.logger.warning(f"Error extrayendo detalles de empresa {empresa.id_empresa}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
             
             return empresa
             
@@ -426,35 +639,6 @@ class SAOScraperEmpresasCompleto:
             self.logger.error(f"Error navegando a detalle de empresa {empresa.id_empresa}: {e}")
             return empresa
 
-    def _extraer_campo(self, nombre_campo: str) -> str:
-        """
-        Extrae un campo específico de la página de detalle
-        
-        Args:
-            nombre_campo: Nombre del campo a extraer
-            
-        Returns:
-            str: Valor del campo
-        """
-        try:
-            # Buscar tabla de información
-            tabla_info = self.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
-            filas = tabla_info.find_elements(By.TAG_NAME, "tr")
-            
-            if len(filas) >= 2:
-                headers = filas[0].find_elements(By.TAG_NAME, "th")
-                valores = filas[1].find_elements(By.TAG_NAME, "td")
-                
-                for i, header in enumerate(headers):
-                    if header.text.strip() == nombre_campo and i < len(valores):
-                        return valores[i].text.strip()
-            
-            return ""
-            
-        except Exception as e:
-            self.logger.warning(f"Error extrayendo campo {nombre_campo}: {e}")
-            return ""
-
     def guardar_empresas_localidad(self, localidad: str, empresas: List[EmpresaCompleta]):
         """
         Guarda las empresas de una localidad en un archivo JSON
@@ -471,18 +655,37 @@ class SAOScraperEmpresasCompleto:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"output/empresas_{localidad}_{timestamp}.json"
             
-            # Crear resultado
-            resultado = ScrapingResult(
-                empresas=empresas,
-                timestamp=datetime.now().isoformat(),
-                total_empresas=len(empresas),
-                errores=self.errores,
-                tiempo_total=None
-            )
-            
-            # Guardar archivo
-            resultado.to_json(filename)
-            self.logger.info(f"Archivo guardado: {filename}")
+            with self.tiempos.medir("normalizacion"):
+                validacion = normalizar_empresas(empresas)
+            
+            # Solo se escriben las empresas nuevas o cambiadas desde la última escritura; las métricas
+            # y la validación quedan en el resumen de la ejecución aunque no haya cambiado ninguna
+            cambiadas = self.hashes.cambiadas(empresas)
+            with self.tiempos.medir("escritura"):
+                self.indice.localidad_guardada()
+                self.catalogo.agregar_varias(empresas)
+                self.catalogo.guardar()
+            
+            if cambiadas:
+                resultado = ScrapingResult(
+                    empresas=cambiadas,
+                    timestamp=datetime.now().isoformat(),
+                    total_empresas=len(cambiadas),
+                    errores=self.errores,
+                    tiempo_total=None,
+                    metricas=self.tiempos.resumen(),
+                    validacion=validacion,
+                    sin_cambios=len(empresas) - len(cambiadas)
+                )
+                with self.tiempos.medir("escritura"):
+                    resultado.to_json(filename)
+                    self.hashes.registrar(cambiadas)
+                    self.hashes.guardar()
+                self.logger.info(f"Archivo guardado: {filename} ({len(cambiadas)} de {len(empresas)} empresas nuevas o cambiadas)")
+            else:
+                self.logger.info(f"Ninguna empresa de {localidad} ha cambiado desde la última escritura, no se genera archivo")
+            self.ejecucion.anotar(localidad, len(empresas), len(cambiadas),
+                                  filename if cambiadas else None, validacion)
             
         except Exception as e:
             self.logger.error(f"Error guardando archivo para {localidad}: {e}")
@@ -510,51 +713,77 @@ class SAOScraperEmpresasCompleto:
                 "ultima_actualizacion": datetime.now().isoformat()
             }
             
-            with open(self.archivo_progreso, 'w', encoding='utf-8') as f:
+            with self.tiempos.medir("escritura"), open(self.archivo_progreso, 'w', encoding='utf-8') as f:
                 json.dump(progreso, f, ensure_ascii=False, indent=2)
             
         except Exception as e:
             self.logger.error(f"Error guardando progreso: {e}")
 
     def actualizar_archivo_empresas(self, empresas: List[Dict]):
-        """Actualiza el archivo de empresas con el estado de procesamiento"""
+        """
+        Actualiza el archivo de empresas con el estado de procesamiento
+        
+        Si ninguna fila ha cambiado desde la última escritura no se reescribe.
+        """
         try:
+            hashes = hashes_filas(empresas)
+            if hashes == self.hashes_listado:
+                self.logger.debug("Listado de empresas sin cambios, no se reescribe")
+                return
+            
             empresas_data = {
                 "timestamp": datetime.now().isoformat(),
                 "total_empresas": len(empresas),
                 "empresas": empresas
             }
             
-            with open(self.archivo_empresas, 'w', encoding='utf-8') as f:
+            with self.tiempos.medir("escritura"), open(self.archivo_empresas, 'w', encoding='utf-8') as f:
                 json.dump(empresas_data, f, ensure_ascii=False, indent=2)
+            self.hashes_listado = hashes
             
         except Exception as e:
             self.logger.error(f"Error actualizando archivo de empresas: {e}")
 
-    def procesar_todas_las_empresas(self, max_empresas: Optional[int] = None):
-        """Procesa todas las empresas"""
+    def procesar_todas_las_empresas(self, max_empresas: Optional[int] = None, solo_nuevas: bool = False):
+        """
+        Procesa todas las empresas
+        
+        Args:
+            max_empresas: Número máximo de empresas a procesar (None para todas)
+            solo_nuevas: Si True, solo busca y procesa las empresas registradas
+                desde la última ejecución
+        """
         try:
             self.logger.info("Iniciando procesamiento de todas las empresas...")
             
-            # Obtener todas las empresas
-            todas_las_empresas = self.extraer_todas_las_empresas()
+            # Obtener todas las empresas (o solo las nuevas)
+            solo_ids = None
+            if solo_nuevas:
+                todas_las_empresas, solo_ids = self.extraer_empresas_nuevas()
+                if not solo_ids:
+                    self.logger.info("No hay empresas nuevas")
+                    return
+            else:
+                todas_las_empresas = self.extraer_todas_las_empresas()
             
             if not todas_las_empresas:
                 self.logger.error("No se encontraron empresas")
                 return
             
             # Procesar empresas por localidad
-            self.procesar_empresas_por_localidad(todas_las_empresas, max_empresas)
+            self.procesar_empresas_por_localidad(todas_las_empresas, max_empresas, solo_ids)
             
             self.logger.info("Procesamiento completado!")
             self.logger.info(f"Empresas procesadas: {len(self.empresas_procesadas)}")
             self.logger.info(f"Errores totales: {self.errores}")
+            self.logger.info(f"Tiempos por etapa:\n{self.tiempos.formatear_resumen()}")
             
         except Exception as e:
             self.logger.error(f"Error en el procesamiento: {e}")
 
     def cerrar(self):
         """Cierra el navegador"""
+        self._detener_componentes()
         if self.driver:
             self.driver.quit()
             self.logger.info("Navegador cerrado")
@@ -562,6 +791,15 @@ class SAOScraperEmpresasCompleto:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae todas las empresas de SAÓ FCT y sus detalles")
+    parser.add_argument("--solo-nuevas", action="store_true",
+                        help="Procesar solo las empresas registradas desde la última ejecución")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar la ejecución (cProfile y comandos WebDriver por método y empresa)")
+    args = parser.parse_args()
+    
+    perfil = Perfilador("empresas_completo").iniciar() if args.profile else None
+    
     scraper = None
     try:
         # Crear directorio de salida
@@ -569,9 +807,11 @@ def main():
         
         # Inicializar scraper
         scraper = SAOScraperEmpresasCompleto(headless=False)  # Cambiar a True para ejecución sin interfaz
+        if perfil:
+            perfil.observar(scraper)
         
         # Procesar empresas (máximo 10 para prueba)
-        scraper.procesar_todas_las_empresas(max_empresas=10)
+        scraper.procesar_todas_las_empresas(max_empresas=10, solo_nuevas=args.solo_nuevas)
         
     except Exception as e:
         print(f"❌ Error en el scraping: {e}")
@@ -579,6 +819,8 @@ def main():
     finally:
         if scraper:
             scraper.cerrar()
+        if perfil:
+            perfil.finalizar()
     
     return 0
 
@@ -2,10 +2,9 @@
 Script principal para extraer datos de empresas del sistema SAÓ FCT por localidades
 """
 import os
-import time
+import argparse
 import json
 import logging
-import re
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Set
@@ -21,9 +20,17 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.firefox import GeckoDriverManager
 
 from models import EmpresaCompleta, ScrapingResult
+from sesion_cookies import AlmacenCookies
+from componentes_scraper import ComponentesScraper
+from configuracion import obtener_base_url
+from vigilancia import aplicar_timeouts
+from normalizacion import normalizar_empresas
+from logs_estructurados import configurar_logging, MUESTREO
+from perfilado import Perfilador
+from filtro_localidad import BuscadorLocalidad
 
 
-class SAOScraperLocalidades:
+class SAOScraperLocalidades(ComponentesScraper):
     """Clase principal para el scraping del sistema SAÓ FCT por localidades"""
     
     def __init__(self, headless: bool = False):
@@ -52,27 +59,21 @@ class SAOScraperLocalidades:
         
         if not self.usuario or not self.password:
             raise ValueError("Credenciales no encontradas en .env. Verifica SAO_USUARIO y SAO_PASSWORD")
-
-    def _setup_logging(self):
-        """Configura el sistema de logging"""
-        # Configurar handler para archivo con UTF-8
-        file_handler = logging.FileHandler('scraper_localidades.log', encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
         
-        # Configurar handler para consola sin emojis
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
+        # Cookies de sesión cifradas, compartidas entre ejecuciones y workers
+        self.almacen_cookies = AlmacenCookies(self.usuario, self.password)
         
-        # Formato sin emojis para evitar problemas de codificación
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
+        # URL base del sistema (SAO_BASE_URL permite usar el servidor simulado)
+        self.base_url = obtener_base_url()
         
-        # Configurar logger
+        # Componentes comunes: se crean tras comprobar las credenciales porque arrancan hilos
+        self._iniciar_componentes("localidades")
+        self.buscador_localidad = BuscadorLocalidad(base_url=self.base_url, tiempos=self.tiempos)
+
+    def _setup_logging(self):
+        """Configura el sistema de logging (JSONL rotado, escrito en segundo plano)"""
+        configurar_logging('scraper_localidades.jsonl')
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
 
     def _setup_driver(self):
         """Configura el WebDriver (Firefox por defecto)"""
@@ -104,7 +105,7 @@ class SAOScraperLocalidades:
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
             
             # Configurar timeouts más largos
-            self.driver.set_page_load_timeout(30)
+            aplicar_timeouts(self.driver)
             self.driver.implicitly_wait(10)
             self.wait = WebDriverWait(self.driver, 20)
             
@@ -117,6 +118,21 @@ class SAOScraperLocalidades:
             self.logger.error(f"Error configurando WebDriver: {e}")
             raise
 
+    def iniciar_sesion(self) -> bool:
+        """
+        Inicia sesión reutilizando las cookies guardadas y solo rellena el
+        formulario de login si el servidor las rechaza
+
+        Returns:
+            bool: True si la sesión quedó iniciada
+        """
+        with self.tiempos.medir("login"):
+            if self.almacen_cookies.restaurar_en_driver(self.driver, self.base_url):
+                self.logger.info("Sesión restaurada desde cookies guardadas")
+                return True
+
+            return self.login()
+
     def login(self) -> bool:
         """
         Realiza el login en el sistema SAÓ FCT
@@ -128,7 +144,7 @@ class SAOScraperLocalidades:
             self.logger.info("Iniciando proceso de login...")
             
             # Navegar a la página de login
-            login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+            login_url = f"{self.base_url}/index.php?op=4&subop=0"
             self.driver.get(login_url)
             
             # Esperar a que cargue la página
@@ -150,13 +166,14 @@ class SAOScraperLocalidades:
             submit_button.click()
             
             # Esperar a que cargue la página principal
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Verificar si el login fue exitoso
             if "error" in self.driver.current_url.lower() or "login" in self.driver.current_url.lower():
                 self.logger.error("Error en el login - credenciales incorrectas o página de error")
                 return False
             
+            self.almacen_cookies.guardar(self.driver.get_cookies())
             self.logger.info("Login exitoso")
             return True
             
@@ -181,12 +198,13 @@ class SAOScraperLocalidades:
             self.logger.info("Obteniendo lista de localidades...")
             
             # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(listado_url)
             self.logger.info(f"Navegando a: {listado_url}")
             
             # Esperar a que cargue la página
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Buscar tabla de empresas
             tabla_empresas = self.driver.find_element(By.CSS_SELECTOR, "table")
@@ -254,7 +272,7 @@ class SAOScraperLocalidades:
                 'ultima_actualizacion': datetime.now().isoformat()
             }
             
-            with open(self.archivo_progreso, 'w', encoding='utf-8') as f:
+            with self.tiempos.medir("escritura"), open(self.archivo_progreso, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
                 
             self.logger.info(f"Progreso guardado: {localidad} añadida")
@@ -266,6 +284,9 @@ class SAOScraperLocalidades:
         """
         Extrae todas las empresas de una localidad específica
         
+        Usa el filtro del listado si el servidor lo admite y, si no, una
+        búsqueda binaria sobre el listado ordenado por localidad.
+        
         Args:
             localidad: Nombre de la localidad
             
@@ -275,50 +296,19 @@ class SAOScraperLocalidades:
         try:
             self.logger.info(f"Extrayendo empresas de {localidad}...")
             
-            # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
-            time.sleep(3)
-            
-            # Buscar tabla de empresas
-            tabla_empresas = self.driver.find_element(By.CSS_SELECTOR, "table")
-            filas = tabla_empresas.find_elements(By.TAG_NAME, "tr")
+            filas = self.buscador_localidad.extraer(self.driver, localidad)
             
             empresas = []
-            
-            for i, fila in enumerate(filas[1:], 1):  # Saltar encabezado
-                try:
-                    celdas = fila.find_elements(By.TAG_NAME, "td")
-                    
-                    if len(celdas) >= 7:  # Mínimo 7 columnas esperadas
-                        # Extraer localidad de la columna 6 (índice 6)
-                        localidad_empresa = celdas[6].text.strip() if len(celdas) > 6 else ""
-                        
-                        # Solo procesar empresas de la localidad específica
-                        if localidad_empresa == localidad:
-                            # Extraer id_empresa del enlace
-                            enlace = fila.find_element(By.TAG_NAME, "a")
-                            href = enlace.get_attribute("href")
-                            id_empresa = re.search(r'idEmpresa=(\d+)', href)
-                            id_empresa = id_empresa.group(1) if id_empresa else ""
-                            
-                            # Extraer nombre de la empresa
-                            nombre = celdas[1].text.strip() if len(celdas) > 1 else ""
-                            
-                            # Crear empresa básica
-                            empresa = EmpresaCompleta(
-                                id_empresa=id_empresa,
-                                nombre=nombre,
-                                localidad=localidad
-                            )
-                            
-                            empresas.append(empresa)
-                            self.logger.info(f"Empresa {len(empresas)}: {id_empresa} - {nombre}")
-                        
-                except Exception as e:
-                    self.logger.warning(f"Error procesando fila {i}: {e}")
-                    self.errores += 1
-                    continue
+            for fila in filas:
+                # Crear empresa básica
+                empresa = EmpresaCompleta(
+                    id_empresa=fila['id_empresa'],
+                    nombre=fila['nombre'],
+                    localidad=localidad
+                )
+                
+                empresas.append(empresa)
+                self.logger.info("Empresa %d: %s - %s", len(empresas), empresa.id_empresa, empresa.nombre, extra=MUESTREO)
             
             self.logger.info(f"Empresas encontradas en {localidad}: {len(empresas)}")
             return empresas
@@ -337,16 +327,13 @@ class SAOScraperLocalidades:
         try:
             # Verificar si estamos en la página de login
             current_url = self.driver.current_url
-            if "login" in current_url.lower() or "op=4&subop=0" in current_url:
+            if "login" in current_url.lower():
                 return False
             
-            # Verificar si hay elementos de la página principal
-            try:
-                # Buscar algún elemento que indique que estamos logueados
-                self.driver.find_element(By.CSS_SELECTOR, "table")
-                return True
-            except:
-                return False
+            # El listado comparte URL con el login (op=4&subop=0), así que se
+            # comprueba si la página muestra el formulario de contraseña
+            campos_password = self.driver.execute_script("return document.getElementsByName('password').length")
+            return campos_password == 0
                 
         except Exception as e:
             self.logger.warning(f"Error verificando sesión: {e}")
@@ -361,7 +348,8 @@ class SAOScraperLocalidades:
         """
         if not self.verificar_sesion_activa():
             self.logger.warning("Sesión perdida, intentando reconectar...")
-            return self.login()
+            with self.tiempos.medir("reintento"):
+                return self.login()
         return True
 
     def extraer_detalle_empresa(self, empresa: EmpresaCompleta) -> EmpresaCompleta:
@@ -381,107 +369,43 @@ class SAOScraperLocalidades:
                 return empresa
             
             # Navegar a la página de detalle
-            detalle_url = f"https://foremp.edu.gva.es/index.php?accion=19&idEmpresa={empresa.id_empresa}"
-            self.driver.get(detalle_url)
-            time.sleep(2)
+            detalle_url = f"{self.base_url}/index.php?accion=19&idEmpresa={empresa.id_empresa}"
+            with self.tiempos.medir("navegacion_detalle"):
+                self.driver.get(detalle_url)
+            self.tiempos.esperar(2)
             
             # Extraer datos detallados
             try:
-                empresa.cif = self._extraer_campo("CIF")
-                empresa.nombre = self._extraer_campo("Nombre")
-                empresa.direccion = self._extraer_campo("Dirección")
-                empresa.provincia = self._extraer_campo("Provincia")
-                empresa.localidad = self._extraer_campo("Localidad")
-                empresa.cp = self._extraer_campo("CP")
-                empresa.telefono = self._extraer_campo("Teléfono")
-                empresa.fax = self._extraer_campo("Fax")
-                empresa.actividad = self._extraer_campo("Actividad")
-                empresa.nombre_gerente = self._extraer_campo("Nombre de gerente")
-                empresa.nif_gerente = self._extraer_campo("NIF gerente")
-                empresa.email = self._extraer_campo("E-mail")
-                empresa.tipo = self._extraer_campo("Tipo")
+                if self.archivo_html:
+                    with self.tiempos.medir("archivo_html"):
+                        self.archivo_html.guardar(empresa.id_empresa, self.driver.page_source)
+                with self.tiempos.medir("extraccion_campos"):
+                    for campo, valor in self.extractor_detalle.extraer_de_driver(self.driver).items():
+                        setattr(empresa, campo, valor)
                 
             except Exception as e:
                 self.logger.warning(f"Error extrayendo detalles de empresa {empresa.id_empresa}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
             
             # Delay entre peticiones (más largo para evitar saturar el servidor)
-            time.sleep(2.0)
+            self.tiempos.esperar(2.0)
             
             return empresa
             
         except Exception as e:
             self.logger.error(f"Error navegando a detalle de empresa {empresa.id_empresa}: {e}")
             self.errores += 1
+            self.metricas.registrar_error(e)
             return empresa
 
-    def _extraer_campo(self, nombre_campo: str) -> str:
-        """
-        Extrae un campo específico de la página de detalle
-        
-        Args:
-            nombre_campo: Nombre del campo a extraer
-            
-        Returns:
-            str: Valor del campo o cadena vacía si no se encuentra
-        """
-        try:
-            # Buscar en la tabla con clase "infoUsuario infoEmpresa"
-            tabla = self.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
-            filas = tabla.find_elements(By.TAG_NAME, "tr")
-            
-            # Mapeo de campos a posiciones basado en la estructura HTML real
-            mapeo_campos = {
-                "cif": 0,
-                "nombre": 1, 
-                "direccion": 3,
-                "provincia": 4,
-                "localidad": 5,
-                "cp": 6
-            }
-            
-            # Buscar en la primera sección (filas 0-1)
-            if len(filas) >= 2:
-                encabezados = filas[0].find_elements(By.TAG_NAME, "th")
-                valores = filas[1].find_elements(By.TAG_NAME, "td")
-                
-                # Buscar por nombre del campo en encabezados
-                for i, encabezado in enumerate(encabezados):
-                    if nombre_campo.lower() in encabezado.text.lower():
-                        if i < len(valores):
-                            return valores[i].text.strip()
-                        break
-                
-                # Buscar por posición si no se encuentra por nombre
-                campo_lower = nombre_campo.lower()
-                if campo_lower in mapeo_campos:
-                    pos = mapeo_campos[campo_lower]
-                    if pos < len(valores):
-                        return valores[pos].text.strip()
-            
-            # Buscar en la segunda sección (filas 2-3) para campos como teléfono, fax, etc.
-            if len(filas) >= 4:
-                encabezados_segunda = filas[2].find_elements(By.TAG_NAME, "th")
-                valores_segunda = filas[3].find_elements(By.TAG_NAME, "td")
-                
-                for i, encabezado in enumerate(encabezados_segunda):
-                    if nombre_campo.lower() in encabezado.text.lower():
-                        if i < len(valores_segunda):
-                            return valores_segunda[i].text.strip()
-                        break
-            
-            return ""
-            
-        except Exception as e:
-            self.logger.warning(f"Error extrayendo campo '{nombre_campo}': {e}")
-            return ""
-
-    def procesar_localidad(self, localidad: str) -> bool:
+    def procesar_localidad(self, localidad: str, empresas: Optional[List[EmpresaCompleta]] = None) -> bool:
         """
         Procesa una localidad completa: extrae empresas y sus detalles
         
         Args:
             localidad: Nombre de la localidad a procesar
+            empresas: Empresas del listado de la localidad, si ya se han leído
             
         Returns:
             bool: True si el procesamiento fue exitoso
@@ -490,7 +414,8 @@ class SAOScraperLocalidades:
             self.logger.info(f"=== Procesando localidad: {localidad} ===")
             
             # Extraer empresas de la localidad
-            empresas = self.extraer_empresas_por_localidad(localidad)
+            if empresas is None:
+                empresas = self.extraer_empresas_por_localidad(localidad)
             
             if not empresas:
                 self.logger.warning(f"No se encontraron empresas en {localidad}")
@@ -499,25 +424,50 @@ class SAOScraperLocalidades:
             # Extraer detalles de cada empresa
             empresas_completas = []
             for i, empresa in enumerate(empresas, 1):
-                self.logger.info(f"Procesando empresa {i}/{len(empresas)}: {empresa.id_empresa}")
-                empresa_completa = self.extraer_detalle_empresa(empresa)
+                self.logger.info("Procesando empresa %d/%d: %s", i, len(empresas), empresa.id_empresa, extra=MUESTREO)
+                self.metricas.establecer_cola(len(empresas) - i)
+                empresa_completa = self._extraer_detalle_vigilado(empresa)
+                self.indice.agregar(empresa_completa)
+                self.metricas.empresa_completada()
+                self.progreso.avanzar()
                 empresas_completas.append(empresa_completa)
             
             # Guardar archivo por localidad
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             archivo_salida = f"output/empresas_{localidad}_{timestamp}.json"
             
-            resultado = ScrapingResult(
-                empresas=empresas_completas,
-                timestamp=datetime.now().isoformat(),
-                total_empresas=len(empresas_completas),
-                errores=self.errores,
-                tiempo_total=None
-            )
-            
-            resultado.to_json(archivo_salida)
-            
-            self.logger.info(f"Localidad {localidad} completada: {len(empresas_completas)} empresas guardadas en {archivo_salida}")
+            with self.tiempos.medir("normalizacion"):
+                validacion = normalizar_empresas(empresas_completas)
+            
+            # Solo se escriben las empresas nuevas o cambiadas desde la última escritura; las métricas
+            # y la validación quedan en el resumen de la ejecución aunque no haya cambiado ninguna
+            cambiadas = self.hashes.cambiadas(empresas_completas)
+            with self.tiempos.medir("escritura"):
+                self.indice.localidad_guardada()
+                self.catalogo.agregar_varias(empresas_completas)
+                self.catalogo.guardar()
+            
+            if cambiadas:
+                resultado = ScrapingResult(
+                    empresas=cambiadas,
+                    timestamp=datetime.now().isoformat(),
+                    total_empresas=len(cambiadas),
+                    errores=self.errores,
+                    tiempo_total=None,
+                    metricas=self.tiempos.resumen(),
+                    validacion=validacion,
+                    sin_cambios=len(empresas_completas) - len(cambiadas)
+                )
+                with self.tiempos.medir("escritura"):
+                    resultado.to_json(archivo_salida)
+                    self.hashes.registrar(cambiadas)
+                    self.hashes.guardar()
+                self.logger.info(f"Localidad {localidad} completada: {len(cambiadas)} de {len(empresas_completas)} empresas "
+                                 f"nuevas o cambiadas guardadas en {archivo_salida}")
+            else:
+                self.logger.info(f"Ninguna empresa de {localidad} ha cambiado desde la última escritura, no se genera archivo")
+            self.ejecucion.anotar(localidad, len(empresas_completas), len(cambiadas),
+                                  archivo_salida if cambiadas else None, validacion)
             
             # Guardar progreso
             self.guardar_progreso(localidad)
@@ -542,7 +492,7 @@ class SAOScraperLocalidades:
             self._setup_driver()
             
             # Login
-            if not self.login():
+            if not self.iniciar_sesion():
                 raise Exception("Error en el login")
             
             # Cargar progreso previo
@@ -569,15 +519,23 @@ class SAOScraperLocalidades:
             
             self.logger.info(f"Procesando {len(localidades_a_procesar)} localidades: {localidades_a_procesar}")
             
+            # Listado de cada localidad antes de los detalles: el progreso global
+            # tiene así el total real de empresas de esta ejecución
+            empresas_por_localidad = {localidad: self.extraer_empresas_por_localidad(localidad)
+                                      for localidad in localidades_a_procesar}
+            self.progreso.iniciar(sum(len(e) for e in empresas_por_localidad.values()), completadas=0)
+            
             # Procesar cada localidad
             for i, localidad in enumerate(localidades_a_procesar, 1):
                 self.logger.info(f"\n--- Procesando localidad {i}/{len(localidades_a_procesar)}: {localidad} ---")
                 
-                if self.procesar_localidad(localidad):
+                if self.procesar_localidad(localidad, empresas_por_localidad.pop(localidad)):
                     self.logger.info(f"Localidad {localidad} completada exitosamente")
                 else:
                     self.logger.error(f"Error procesando localidad {localidad}")
             
+            self.progreso.finalizar()
+            
             # Calcular tiempo total
             fin = datetime.now()
             tiempo_total = str(fin - inicio)
@@ -586,6 +544,7 @@ class SAOScraperLocalidades:
             self.logger.info(f"Tiempo total: {tiempo_total}")
             self.logger.info(f"Localidades procesadas: {len(localidades_a_procesar)}")
             self.logger.info(f"Errores totales: {self.errores}")
+            self.logger.info(f"Tiempos por etapa:\n{self.tiempos.formatear_resumen()}")
             
         except Exception as e:
             self.logger.error(f"Error en el proceso de scraping: {e}")
@@ -595,6 +554,7 @@ class SAOScraperLocalidades:
 
     def cerrar_navegador(self):
         """Cierra el navegador y libera recursos"""
+        self._detener_componentes()
         if self.driver:
             try:
                 self.driver.quit()
@@ -605,12 +565,20 @@ class SAOScraperLocalidades:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae las empresas de SAÓ FCT localidad a localidad")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar la ejecución (cProfile y comandos WebDriver por método y empresa)")
+    args = parser.parse_args()
+    
+    perfil = Perfilador("localidades").iniciar() if args.profile else None
     try:
         # Crear directorio de salida
         Path("output").mkdir(exist_ok=True)
         
         # Inicializar scraper
         scraper = SAOScraperLocalidades(headless=False)  # Cambiar a True para ejecución sin interfaz
+        if perfil:
+            perfil.observar(scraper)
         
         # Ejecutar scraping (procesar todas las localidades)
         scraper.procesar_localidades(max_localidades=None)
@@ -618,6 +586,9 @@ def main():
     except Exception as e:
         print(f"❌ Error en el scraping: {e}")
         return 1
+    finally:
+        if perfil:
+            perfil.finalizar()
     
     return 0
 
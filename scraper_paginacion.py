@@ -2,7 +2,7 @@
 Script mejorado para extraer datos de empresas del sistema SAÓ FCT con paginación
 """
 import os
-import time
+import argparse
 import json
 import logging
 import re
@@ -21,9 +21,16 @@ from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from webdriver_manager.firefox import GeckoDriverManager
 
 from models import EmpresaCompleta, ScrapingResult
+from sesion_cookies import AlmacenCookies
+from componentes_scraper import ComponentesScraper
+from configuracion import obtener_base_url
+from vigilancia import aplicar_timeouts
+from normalizacion import normalizar_empresas
+from logs_estructurados import configurar_logging, MUESTREO
+from perfilado import Perfilador
 
 
-class SAOScraperPaginacion:
+class SAOScraperPaginacion(ComponentesScraper):
     """Clase principal para el scraping del sistema SAÓ FCT con paginación"""
     
     def __init__(self, headless: bool = False):
@@ -53,6 +60,15 @@ class SAOScraperPaginacion:
         if not self.usuario or not self.password:
             raise ValueError("Credenciales no encontradas en .env")
         
+        # Cookies de sesión cifradas, compartidas entre ejecuciones y workers
+        self.almacen_cookies = AlmacenCookies(self.usuario, self.password)
+        
+        # URL base del sistema (SAO_BASE_URL permite usar el servidor simulado)
+        self.base_url = obtener_base_url()
+        
+        # Componentes comunes: se crean tras comprobar las credenciales porque arrancan hilos
+        self._iniciar_componentes("paginacion")
+        
         # Cargar progreso previo
         self.cargar_progreso()
         
@@ -60,19 +76,12 @@ class SAOScraperPaginacion:
         self._setup_driver()
         
         # Realizar login
-        if not self.login():
+        if not self.iniciar_sesion():
             raise Exception("No se pudo realizar el login")
 
     def _setup_logging(self):
-        """Configura el sistema de logging"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('scraper_paginacion.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """Configura el sistema de logging (JSONL rotado, escrito en segundo plano)"""
+        configurar_logging('scraper_paginacion.jsonl')
         self.logger = logging.getLogger(__name__)
 
     def _setup_driver(self):
@@ -105,7 +114,7 @@ class SAOScraperPaginacion:
             self.driver = webdriver.Firefox(service=service, options=firefox_options)
             
             # Configurar timeouts más largos
-            self.driver.set_page_load_timeout(30)
+            aplicar_timeouts(self.driver)
             self.driver.implicitly_wait(10)
             self.wait = WebDriverWait(self.driver, 20)
             
@@ -118,6 +127,21 @@ class SAOScraperPaginacion:
             self.logger.error(f"Error configurando WebDriver: {e}")
             raise
 
+    def iniciar_sesion(self) -> bool:
+        """
+        Inicia sesión reutilizando las cookies guardadas y solo rellena el
+        formulario de login si el servidor las rechaza
+
+        Returns:
+            bool: True si la sesión quedó iniciada
+        """
+        with self.tiempos.medir("login"):
+            if self.almacen_cookies.restaurar_en_driver(self.driver, self.base_url):
+                self.logger.info("Sesión restaurada desde cookies guardadas")
+                return True
+
+            return self.login()
+
     def login(self) -> bool:
         """
         Realiza el login en el sistema SAÓ FCT
@@ -129,9 +153,9 @@ class SAOScraperPaginacion:
             self.logger.info("Iniciando proceso de login...")
             
             # Navegar a la página de login
-            login_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0"
+            login_url = f"{self.base_url}/index.php?op=4&subop=0"
             self.driver.get(login_url)
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Buscar campos de login
             usuario_field = self.driver.find_element(By.NAME, "usuario")
@@ -147,10 +171,11 @@ class SAOScraperPaginacion:
             # Enviar formulario
             submit_button = self.driver.find_element(By.XPATH, "//input[@type='submit']")
             submit_button.click()
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             # Verificar si el login fue exitoso
             if "login" not in self.driver.current_url.lower():
+                self.almacen_cookies.guardar(self.driver.get_cookies())
                 self.logger.info("Login exitoso")
                 return True
             else:
@@ -172,10 +197,11 @@ class SAOScraperPaginacion:
             self.logger.info("Obteniendo todas las empresas de todas las páginas...")
             
             # Navegar a la página con ordenamiento por localidad
-            listado_url = "https://foremp.edu.gva.es/index.php?op=4&subop=0&orden=localidad&sentido=asc"
-            self.driver.get(listado_url)
+            listado_url = f"{self.base_url}/index.php?op=4&subop=0&orden=localidad&sentido=asc"
+            with self.tiempos.medir("pagina_listado"):
+                self.driver.get(listado_url)
             self.logger.info(f"Navegando a: {listado_url}")
-            time.sleep(3)
+            self.tiempos.esperar(3)
             
             todas_las_empresas = []
             pagina_actual = 1
@@ -212,7 +238,8 @@ class SAOScraperPaginacion:
                                 )
                                 todas_las_empresas.append(empresa)
                                 empresas_en_pagina += 1
-                                self.logger.info(f"Empresa {total_empresas + empresas_en_pagina}: {id_empresa} - {nombre} ({localidad})")
+                                self.logger.info("Empresa %d: %s - %s (%s)", total_empresas + empresas_en_pagina,
+                                                 id_empresa, nombre, localidad, extra=MUESTREO)
                                 
                     except Exception as e:
                         self.logger.warning(f"Error procesando fila {i}: {e}")
@@ -234,8 +261,9 @@ class SAOScraperPaginacion:
                             break
                     
                     if siguiente_enlace:
-                        siguiente_enlace.click()
-                        time.sleep(3)
+                        with self.tiempos.medir("pagina_listado"):
+                            siguiente_enlace.click()
+                        self.tiempos.esperar(3)
                         pagina_actual += 1
                     else:
                         self.logger.info("No hay más páginas disponibles")
@@ -272,6 +300,8 @@ class SAOScraperPaginacion:
                 empresas_por_localidad[localidad].append(empresa)
             
             self.logger.info(f"Empresas agrupadas en {len(empresas_por_localidad)} localidades")
+            self.progreso.iniciar(len(empresas), completadas=sum(
+                len(grupo) for localidad, grupo in empresas_por_localidad.items() if localidad in self.localidades_procesadas))
             
             # Procesar cada localidad
             for localidad, empresas_localidad in empresas_por_localidad.items():
@@ -284,18 +314,24 @@ class SAOScraperPaginacion:
                 # Procesar cada empresa de la localidad
                 for i, empresa in enumerate(empresas_localidad, 1):
                     try:
-                        self.logger.info(f"Procesando empresa {i}/{len(empresas_localidad)}: {empresa.id_empresa}")
+                        self.logger.info("Procesando empresa %d/%d: %s", i, len(empresas_localidad), empresa.id_empresa,
+                                         extra=MUESTREO)
+                        self.metricas.establecer_cola(len(empresas_localidad) - i)
                         
                         # Extraer detalles de la empresa
-                        empresa_completa = self.extraer_detalle_empresa(empresa)
+                        empresa_completa = self._extraer_detalle_vigilado(empresa)
+                        self.indice.agregar(empresa_completa)
+                        self.metricas.empresa_completada()
+                        self.progreso.avanzar()
                         empresas_localidad[i-1] = empresa_completa
                         
                         # Delay entre peticiones
-                        time.sleep(2.0)
+                        self.tiempos.esperar(2.0)
                         
                     except Exception as e:
                         self.logger.error(f"Error procesando empresa {empresa.id_empresa}: {e}")
                         self.errores += 1
+                        self.metricas.registrar_error(e)
                         continue
                 
                 # Guardar archivo para esta localidad
@@ -307,6 +343,7 @@ class SAOScraperPaginacion:
                 
                 self.logger.info(f"Localidad {localidad} completada: {len(empresas_localidad)} empresas guardadas")
             
+            self.progreso.finalizar()
             return empresas_por_localidad
             
         except Exception as e:
@@ -325,29 +362,24 @@ class SAOScraperPaginacion:
         """
         try:
             # Navegar a la página de detalle
-            detalle_url = f"https://foremp.edu.gva.es/index.php?accion=19&idEmpresa={empresa.id_empresa}"
-            self.driver.get(detalle_url)
-            time.sleep(2)
+            detalle_url = f"{self.base_url}/index.php?accion=19&idEmpresa={empresa.id_empresa}"
+            with self.tiempos.medir("navegacion_detalle"):
+                self.driver.get(detalle_url)
+            self.tiempos.esperar(2)
             
             # Extraer datos detallados
             try:
-                empresa.cif = self._extraer_campo("CIF")
-                empresa.nombre = self._extraer_campo("Nombre")
-                empresa.direccion = self._extraer_campo("Dirección")
-                empresa.provincia = self._extraer_campo("Provincia")
-                empresa.localidad = self._extraer_campo("Localidad")
-                empresa.cp = self._extraer_campo("CP")
-                empresa.telefono = self._extraer_campo("Teléfono")
-                empresa.fax = self._extraer_campo("Fax")
-                empresa.actividad = self._extraer_campo("Actividad")
-                empresa.nombre_gerente = self._extraer_campo("Nombre de gerente")
-                empresa.nif_gerente = self._extraer_campo("NIF gerente")
-                empresa.email = self._extraer_campo("E-mail")
-                empresa.tipo = self._extraer_campo("Tipo")
+                if self.archivo_html:
+                    with self.tiempos.medir("archivo_html"):
+                        self.archivo_html.guardar(empresa.id_empresa, self.driver.page_source)
+                with self.tiempos.medir("extraccion_campos"):
+                    for campo, valor in self.extractor_detalle.extraer_de_driver(self.driver).items():
+                        setattr(empresa, campo, valor)
                 
             except Exception as e:
                 self.logger.warning(f"Error extrayendo detalles de empresa {empresa.id_empresa}: {e}")
                 self.errores += 1
+                self.metricas.registrar_error(e)
             
             return empresa
             
@@ -355,35 +387,6 @@ class SAOScraperPaginacion:
             self.logger.error(f"Error navegando a detalle de empresa {empresa.id_empresa}: {e}")
             return empresa
 
-    def _extraer_campo(self, nombre_campo: str) -> str:
-        """
-        Extrae un campo específico de la página de detalle
-        
-        Args:
-            nombre_campo: Nombre del campo a extraer
-            
-        Returns:
-            str: Valor del campo
-        """
-        try:
-            # Buscar tabla de información
-            tabla_info = self.driver.find_element(By.CSS_SELECTOR, "table.infoUsuario.infoEmpresa")
-            filas = tabla_info.find_elements(By.TAG_NAME, "tr")
-            
-            if len(filas) >= 2:
-                headers = filas[0].find_elements(By.TAG_NAME, "th")
-                valores = filas[1].find_elements(By.TAG_NAME, "td")
-                
-                for i, header in enumerate(headers):
-                    if header.text.strip() == nombre_campo and i < len(valores):
-                        return valores[i].text.strip()
-            
-            return ""
-            
-        except Exception as e:
-            self.logger.warning(f"Error extrayendo campo {nombre_campo}: {e}")
-            return ""
-
     def guardar_empresas_localidad(self, localidad: str, empresas: List[EmpresaCompleta]):
         """
         Guarda las empresas de una localidad en un archivo JSON
@@ -400,18 +403,37 @@ class SAOScraperPaginacion:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"output/empresas_{localidad}_{timestamp}.json"
             
-            # Crear resultado
-            resultado = ScrapingResult(
-                empresas=empresas,
-                timestamp=datetime.now().isoformat(),
-                total_empresas=len(empresas),
-                errores=self.errores,
-                tiempo_total=None
-            )
-            
-            # Guardar archivo
-            resultado.to_json(filename)
-            self.logger.info(f"Archivo guardado: {filename}")
+            with self.tiempos.medir("normalizacion"):
+                validacion = normalizar_empresas(empresas)
+            
+            # Solo se escriben las empresas nuevas o cambiadas desde la última escritura; las métricas
+            # y la validación quedan en el resumen de la ejecución aunque no haya cambiado ninguna
+            cambiadas = self.hashes.cambiadas(empresas)
+            with self.tiempos.medir("escritura"):
+                self.indice.localidad_guardada()
+                self.catalogo.agregar_varias(empresas)
+                self.catalogo.guardar()
+            
+            if cambiadas:
+                resultado = ScrapingResult(
+                    empresas=cambiadas,
+                    timestamp=datetime.now().isoformat(),
+                    total_empresas=len(cambiadas),
+                    errores=self.errores,
+                    tiempo_total=None,
+                    metricas=self.tiempos.resumen(),
+                    validacion=validacion,
+                    sin_cambios=len(empresas) - len(cambiadas)
+                )
+                with self.tiempos.medir("escritura"):
+                    resultado.to_json(filename)
+                    self.hashes.registrar(cambiadas)
+                    self.hashes.guardar()
+                self.logger.info(f"Archivo guardado: {filename} ({len(cambiadas)} de {len(empresas)} empresas nuevas o cambiadas)")
+            else:
+                self.logger.info(f"Ninguna empresa de {localidad} ha cambiado desde la última escritura, no se genera archivo")
+            self.ejecucion.anotar(localidad, len(empresas), len(cambiadas),
+                                  filename if cambiadas else None, validacion)
             
         except Exception as e:
             self.logger.error(f"Error guardando archivo para {localidad}: {e}")
@@ -437,7 +459,7 @@ class SAOScraperPaginacion:
                 "ultima_actualizacion": datetime.now().isoformat()
             }
             
-            with open(self.archivo_progreso, 'w', encoding='utf-8') as f:
+            with self.tiempos.medir("escritura"), open(self.archivo_progreso, 'w', encoding='utf-8') as f:
                 json.dump(progreso, f, ensure_ascii=False, indent=2)
             
             self.logger.info("Progreso guardado")
@@ -463,12 +485,14 @@ class SAOScraperPaginacion:
             self.logger.info("Procesamiento completado!")
             self.logger.info(f"Total localidades procesadas: {len(empresas_por_localidad)}")
             self.logger.info(f"Errores totales: {self.errores}")
+            self.logger.info(f"Tiempos por etapa:\n{self.tiempos.formatear_resumen()}")
             
         except Exception as e:
             self.logger.error(f"Error en el procesamiento: {e}")
 
     def cerrar(self):
         """Cierra el navegador"""
+        self._detener_componentes()
         if self.driver:
             self.driver.quit()
             self.logger.info("Navegador cerrado")
@@ -476,6 +500,12 @@ class SAOScraperPaginacion:
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description="Extrae las empresas de SAÓ FCT recorriendo todas las páginas")
+    parser.add_argument("--profile", action="store_true",
+                        help="Perfilar la ejecución (cProfile y comandos WebDriver por método y empresa)")
+    args = parser.parse_args()
+    
+    perfil = Perfilador("paginacion").iniciar() if args.profile else None
     scraper = None
     try:
         # Crear directorio de salida
@@ -483,6 +513,8 @@ def main():
         
         # Inicializar scraper
         scraper = SAOScraperPaginacion(headless=False)  # Cambiar a True para ejecución sin interfaz
+        if perfil:
+            perfil.observar(scraper)
         
         # Procesar todas las empresas
         scraper.procesar_todas_las_empresas()
@@ -493,6 +525,8 @@ def main():
     finally:
         if scraper:
             scraper.cerrar()
+        if perfil:
+            perfil.finalizar()
     
     return 0
 
@@ -0,0 +1,438 @@
+"""
+Servidor HTTP local que simula el sistema SAÓ FCT para pruebas y benchmarks sin conexión
+
+Sirve el formulario de login, el listado paginado (op=4&subop=0 con orden/sentido)
+y las páginas de detalle (accion=19&idEmpresa=...) con el mismo marcado que el
+sistema real, a partir de empresas sintéticas reproducibles.
+
+Uso:
+    python servidor_simulado.py --puerto 8000 --empresas 500 --latencia 0.05
+
+y en .env (o en el entorno):
+    SAO_BASE_URL=http://127.0.0.1:8000
+"""
+import argparse
+import html
+import random
+import secrets
+import threading
+import time
+from datetime import date, timedelta
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from models import EmpresaCompleta
+
+
+LOCALIDADES = [
+    ("Alacant", "Alicante", "03"), ("Alcoi", "Alicante", "03"), ("Benidorm", "Alicante", "03"),
+    ("Elx", "Alicante", "03"), ("Orihuela", "Alicante", "03"), ("Castelló de la Plana", "Castellón", "12"),
+    ("Vila-real", "Castellón", "12"), ("Vinaròs", "Castellón", "12"), ("Alzira", "Valencia", "46"),
+    ("Gandia", "Valencia", "46"), ("Paterna", "Valencia", "46"), ("Sagunt", "Valencia", "46"),
+    ("Torrent", "Valencia", "46"), ("València", "Valencia", "46"), ("Xàtiva", "Valencia", "46"),
+]
+ACTIVIDADES = [
+    "Desarrollo de software", "Consultoría informática", "Comercio al por menor", "Hostelería",
+    "Administración pública", "Mantenimiento industrial", "Telecomunicaciones", "Servicios sanitarios",
+]
+TIPOS = ["PYME", "Gran empresa", "Autónomo", "Administración", "ONG"]
+NOMBRES = ["Ana", "Joan", "María", "Pau", "Laura", "Vicent", "Carmen", "Jordi", "Lucía", "Pere"]
+APELLIDOS = ["García", "Martínez", "Ferrer", "Navarro", "Sanchis", "Pérez", "Llorens", "Ribera"]
+SUFIJOS = ["S.L.", "S.A.", "S.L.U.", "Coop. V.", ""]
+RAICES = ["Tecno", "Info", "Levante", "Mediterrània", "Turia", "Serveis", "Digital", "Grupo", "Taller", "Sistemas"]
+
+COLUMNAS_LISTADO = ["ID", "Nombre", "CIF", "Teléfono", "Registrado", "Provincia", "Localidad", "Último acceso"]
+CABECERAS_DETALLE = [
+    ["CIF", "Nombre", "Nombre comercial", "Dirección", "Provincia", "Localidad", "CP"],
+    ["Teléfono", "Fax", "Actividad", "Nombre de gerente", "NIF gerente", "E-mail", "Tipo"],
+]
+
+LETRAS_NIF = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def _cif_valido(rng: random.Random) -> str:
+    """Genera un CIF con dígito de control correcto"""
+    letra = rng.choice("ABEFGHJ")
+    digitos = f"{rng.randrange(10 ** 7):07d}"
+    suma = 0
+    for i, d in enumerate(digitos):
+        n = int(d)
+        if i % 2 == 0:
+            n *= 2
+            n = n // 10 + n % 10
+        suma += n
+    control = (10 - suma % 10) % 10
+    return f"{letra}{digitos}{control}"
+
+
+def _nif_valido(rng: random.Random) -> str:
+    """Genera un NIF con letra de control correcta"""
+    numero = rng.randrange(10 ** 8)
+    return f"{numero:08d}{LETRAS_NIF[numero % 23]}"
+
+
+def generar_empresas(n: int, semilla: int = 1) -> List[Dict]:
+    """
+    Genera empresas sintéticas reproducibles
+
+    Args:
+        n: Número de empresas
+        semilla: Semilla del generador aleatorio
+
+    Returns:
+        List[Dict]: Empresas con los campos de EmpresaCompleta
+    """
+    rng = random.Random(semilla)
+    inicio = date(2015, 1, 1)
+    empresas = []
+
+    for i in range(n):
+        localidad, provincia, prefijo_cp = rng.choice(LOCALIDADES)
+        raiz = rng.choice(RAICES)
+        nombre = f"{raiz} {rng.choice(APELLIDOS)} {rng.choice(SUFIJOS)}".strip()
+        gerente = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+        registrado = inicio + timedelta(days=i * 3650 // max(n, 1))
+        dominio = raiz.lower().replace("à", "a") + str(i)
+
+        empresa = EmpresaCompleta(
+            id_empresa=str(60000 + i),
+            registrado=registrado.strftime("%d/%m/%Y"),
+            ultimo_acceso=(registrado + timedelta(days=rng.randint(0, 900))).strftime("%d/%m/%Y"),
+            cif=_cif_valido(rng),
+            nombre=nombre,
+            direccion=f"Calle {rng.choice(APELLIDOS)} {rng.randint(1, 200)}",
+            provincia=provincia,
+            localidad=localidad,
+            cp=f"{prefijo_cp}{rng.randint(1, 999):03d}",
+            telefono=f"96{rng.randint(0, 9999999):07d}",
+            fax=f"96{rng.randint(0, 9999999):07d}" if rng.random() < 0.3 else "",
+            actividad=rng.choice(ACTIVIDADES),
+            nombre_gerente=gerente,
+            nif_gerente=_nif_valido(rng),
+            email=f"info@{dominio}.es" if rng.random() < 0.8 else "",
+            tipo=rng.choice(TIPOS)
+        ).to_dict()
+        empresas.append(empresa)
+
+    return empresas
+
+
+def _pagina(titulo: str, cuerpo: str) -> str:
+    """Envuelve el cuerpo en una página HTML completa"""
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>{titulo}</title></head>"
+            f"<body><h1>SAÓ FCT</h1>{cuerpo}</body></html>")
+
+
+def renderizar_login(error: bool = False) -> str:
+    """
+    HTML del formulario de login
+
+    Args:
+        error: Si True, muestra el aviso de credenciales incorrectas
+    """
+    aviso = "<p class=\"error\">Usuario o contraseña incorrectos</p>" if error else ""
+    return _pagina("Acceso", (
+        f"{aviso}<form method=\"post\" action=\"index.php?op=4&amp;subop=0\">"
+        "<label>Usuario <input type=\"text\" name=\"usuario\"></label>"
+        "<label>Contraseña <input type=\"password\" name=\"password\"></label>"
+        "<input type=\"submit\" value=\"Entrar\"></form>"
+    ))
+
+
+def renderizar_listado(empresas: List[Dict], pagina: int, total_paginas: int, parametros: Dict[str, str],
+                       con_filtro: bool = True) -> str:
+    """
+    HTML de una página del listado de empresas
+
+    Args:
+        empresas: Empresas de la página
+        pagina: Número de página (empezando en 1)
+        total_paginas: Número total de páginas
+        parametros: Parámetros de orden y filtro a conservar en la paginación
+        con_filtro: Si True, incluye el formulario de búsqueda por localidad
+    """
+    def url(n: int) -> str:
+        return html.escape("index.php?" + urlencode({"op": 4, "subop": 0, **parametros, "pagina": n}))
+
+    filas = ["<tr>" + "".join(f"<th>{c}</th>" for c in COLUMNAS_LISTADO) + "</tr>"]
+    for emp in empresas:
+        celdas = [
+            f"<a href=\"index.php?accion=19&amp;idEmpresa={emp['id_empresa']}\">{emp['id_empresa']}</a>",
+            emp['nombre'], emp['cif'], emp['telefono'], emp['registrado'], emp['provincia'],
+            emp['localidad'], emp['ultimo_acceso']
+        ]
+        filas.append("<tr>" + "".join(f"<td>{c if i == 0 else html.escape(c)}</td>" for i, c in enumerate(celdas)) + "</tr>")
+
+    enlaces = []
+    if pagina > 1:
+        enlaces.append(f"<a href=\"{url(pagina - 1)}\">Anterior</a>")
+    for n in range(max(1, pagina - 3), min(total_paginas, pagina + 3) + 1):
+        enlaces.append(f"<span>{n}</span>" if n == pagina else f"<a href=\"{url(n)}\">{n}</a>")
+    if pagina < total_paginas:
+        enlaces.append(f"<a href=\"{url(pagina + 1)}\">Siguiente</a>")
+
+    formulario = ""
+    if con_filtro:
+        formulario = ("<form method=\"get\" action=\"index.php\"><input type=\"hidden\" name=\"op\" value=\"4\">"
+                      "<input type=\"hidden\" name=\"subop\" value=\"0\">"
+                      "<input type=\"text\" name=\"localidad\"><input type=\"submit\" value=\"Buscar\"></form>")
+
+    return _pagina("Empresas", (
+        f"<table class=\"listado\">{''.join(filas)}</table>"
+        f"<div class=\"paginacion\">{' '.join(enlaces)}</div>{formulario}"
+    ))
+
+
+def renderizar_detalle(empresa: Dict) -> str:
+    """
+    HTML de la página de detalle de una empresa (table.infoUsuario.infoEmpresa)
+
+    Args:
+        empresa: Datos de la empresa
+    """
+    valores = [
+        [empresa['cif'], empresa['nombre'], empresa['nombre'].upper(), empresa['direccion'],
+         empresa['provincia'], empresa['localidad'], empresa['cp']],
+        [empresa['telefono'], empresa['fax'], empresa['actividad'], empresa['nombre_gerente'],
+         empresa['nif_gerente'], empresa['email'], empresa['tipo']],
+    ]
+    filas = []
+    for cabeceras, datos in zip(CABECERAS_DETALLE, valores):
+        filas.append("<tr>" + "".join(f"<th>{html.escape(c)}</th>" for c in cabeceras) + "</tr>")
+        filas.append("<tr>" + "".join(f"<td>{html.escape(v)}</td>" for v in datos) + "</tr>")
+
+    return _pagina(f"Empresa {empresa['id_empresa']}", (
+        "<div class=\"menu\"><a href=\"index.php?op=4&amp;subop=0\">Volver al listado</a></div>"
+        f"<table class=\"infoUsuario infoEmpresa\">{''.join(filas)}</table>"
+    ))
+
+
+class ServidorSAOSimulado:
+    """Servidor simulado con latencia, tasa de error y caducidad de sesión configurables"""
+
+    def __init__(self, empresas: int = 200, puerto: int = 0, latencia: float = 0.0, tasa_error: float = 0.0,
+                 caducidad_sesion: Optional[float] = None, por_pagina: int = 50, con_filtro: bool = True,
+                 usuario: Optional[str] = None, password: Optional[str] = None, semilla: int = 1):
+        """
+        Inicializa el servidor (sin arrancarlo)
+
+        Args:
+            empresas: Número de empresas sintéticas
+            puerto: Puerto local (0 para uno libre)
+            latencia: Segundos de retardo por petición
+            tasa_error: Probabilidad (0-1) de responder con un error 500
+            caducidad_sesion: Segundos de vida de cada sesión (None para no caducar)
+            por_pagina: Empresas por página del listado
+            con_filtro: Si True, el listado admite el filtro por localidad
+            usuario: Usuario aceptado (None acepta cualquiera no vacío)
+            password: Contraseña aceptada (None acepta cualquiera no vacía)
+            semilla: Semilla para generar las empresas y los errores
+        """
+        self.empresas = generar_empresas(empresas, semilla)
+        self.por_id = {emp['id_empresa']: emp for emp in self.empresas}
+        self.latencia = latencia
+        self.tasa_error = tasa_error
+        self.caducidad_sesion = caducidad_sesion
+        self.por_pagina = por_pagina
+        self.con_filtro = con_filtro
+        self.usuario = usuario
+        self.password = password
+        self.rng = random.Random(semilla)
+        self.sesiones: Dict[str, float] = {}
+        self.peticiones = 0
+        self.logins = 0
+        self.ids_detalle = set()
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", puerto), self._crear_handler())
+        self.httpd.daemon_threads = True
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """URL base para SAO_BASE_URL"""
+        host, puerto = self.httpd.server_address[:2]
+        return f"http://{host}:{puerto}"
+
+    def iniciar(self) -> 'ServidorSAOSimulado':
+        """Arranca el servidor en un hilo en segundo plano"""
+        self._hilo = threading.Thread(target=self.httpd.serve_forever, name="servidor-sao-simulado", daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Detiene el servidor"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'ServidorSAOSimulado':
+        return self.iniciar()
+
+    def __exit__(self, *args) -> None:
+        self.detener()
+
+    def _sesion_valida(self, token: Optional[str]) -> bool:
+        """Comprueba si un token de sesión existe y no ha caducado"""
+        with self._lock:
+            creada = self.sesiones.get(token) if token else None
+            if creada is None:
+                return False
+            if self.caducidad_sesion is not None and time.time() - creada > self.caducidad_sesion:
+                del self.sesiones[token]
+                return False
+            return True
+
+    def _listado(self, query: Dict[str, str]) -> str:
+        """Página del listado según orden, sentido, filtro y página"""
+        empresas = self.empresas
+        parametros = {}
+
+        localidad = query.get('localidad')
+        if localidad and self.con_filtro:
+            empresas = [emp for emp in empresas if emp['localidad'] == localidad]
+            parametros['localidad'] = localidad
+
+        orden = query.get('orden')
+        if orden:
+            sentido = query.get('sentido', 'asc')
+            if orden == 'registrado':
+                clave = lambda emp: (emp['registrado'][6:], emp['registrado'][3:5], emp['registrado'][:2], emp['id_empresa'])
+            elif orden in ('localidad', 'nombre', 'provincia'):
+                clave = lambda emp: (emp[orden].casefold(), emp['id_empresa'])
+            else:
+                clave = lambda emp: emp['id_empresa']
+            empresas = sorted(empresas, key=clave, reverse=(sentido == 'desc'))
+            parametros.update({'orden': orden, 'sentido': sentido})
+
+        total_paginas = max(1, -(-len(empresas) // self.por_pagina))
+        try:
+            pagina = min(max(1, int(query.get('pagina', 1))), total_paginas)
+        except ValueError:
+            pagina = 1
+
+        inicio = (pagina - 1) * self.por_pagina
+        return renderizar_listado(empresas[inicio:inicio + self.por_pagina], pagina, total_paginas,
+                                  parametros, self.con_filtro)
+
+    def _crear_handler(self):
+        """Crea la clase de handler HTTP ligada a este servidor"""
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, formato, *args):
+                pass
+
+            def _token(self) -> Optional[str]:
+                cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                return cookie['PHPSESSID'].value if 'PHPSESSID' in cookie else None
+
+            def _responder(self, codigo: int, cuerpo: str, cabeceras: Optional[Dict[str, str]] = None) -> None:
+                datos = cuerpo.encode('utf-8')
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(datos)))
+                for nombre, valor in (cabeceras or {}).items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def _preparar(self) -> bool:
+                """Aplica latencia y errores simulados; False si ya se respondió con error"""
+                with servidor._lock:
+                    servidor.peticiones += 1
+                    fallo = servidor.rng.random() < servidor.tasa_error
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                if fallo:
+                    self._responder(500, _pagina("Error", "<p>Error interno del servidor</p>"))
+                    return False
+                return True
+
+            def do_GET(self):
+                if not self._preparar():
+                    return
+
+                partes = urlsplit(self.path)
+                if partes.path not in ('/', '/index.php'):
+                    self._responder(404, _pagina("No encontrado", "<p>Página no encontrada</p>"))
+                    return
+
+                query = {k: v[0] for k, v in parse_qs(partes.query).items()}
+                if not servidor._sesion_valida(self._token()):
+                    self._responder(200, renderizar_login())
+                    return
+
+                if query.get('accion') == '19':
+                    empresa = servidor.por_id.get(query.get('idEmpresa', ''))
+                    if empresa is None:
+                        self._responder(200, _pagina("Empresa", "<p>Empresa no encontrada</p>"))
+                    else:
+                        with servidor._lock:
+                            servidor.ids_detalle.add(empresa['id_empresa'])
+                        self._responder(200, renderizar_detalle(empresa))
+                    return
+
+                self._responder(200, servidor._listado(query))
+
+            def do_POST(self):
+                if not self._preparar():
+                    return
+
+                longitud = int(self.headers.get('Content-Length', 0))
+                datos = {k: v[0] for k, v in parse_qs(self.rfile.read(longitud).decode('utf-8')).items()}
+                usuario, password = datos.get('usuario', ''), datos.get('password', '')
+
+                correcto = bool(usuario and password) and \
+                    servidor.usuario in (None, usuario) and servidor.password in (None, password)
+                if not correcto:
+                    self._responder(200, renderizar_login(error=True))
+                    return
+
+                token = secrets.token_hex(16)
+                with servidor._lock:
+                    servidor.sesiones[token] = time.time()
+                    servidor.logins += 1
+
+                self.send_response(303)
+                self.send_header('Location', '/index.php?op=4&subop=0')
+                self.send_header('Set-Cookie', f"PHPSESSID={token}; Path=/; HttpOnly")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        return Handler
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Servidor local que simula SAÓ FCT")
+    parser.add_argument("--puerto", type=int, default=8000)
+    parser.add_argument("--empresas", type=int, default=500, help="Número de empresas sintéticas")
+    parser.add_argument("--por-pagina", type=int, default=50, help="Empresas por página del listado")
+    parser.add_argument("--latencia", type=float, default=0.0, help="Segundos de retardo por petición")
+    parser.add_argument("--tasa-error", type=float, default=0.0, help="Probabilidad de error 500 (0-1)")
+    parser.add_argument("--caducidad-sesion", type=float, default=None, help="Segundos de vida de una sesión")
+    parser.add_argument("--sin-filtro", action="store_true", help="El listado ignora el filtro por localidad")
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    servidor = ServidorSAOSimulado(
+        empresas=args.empresas, puerto=args.puerto, latencia=args.latencia, tasa_error=args.tasa_error,
+        caducidad_sesion=args.caducidad_sesion, por_pagina=args.por_pagina, con_filtro=not args.sin_filtro,
+        semilla=args.semilla
+    )
+
+    print(f"🖥️  Servidor SAÓ simulado en {servidor.url} ({len(servidor.empresas)} empresas)")
+    print(f"   Usa SAO_BASE_URL={servidor.url} para apuntar los scrapers a él")
+    try:
+        servidor.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServidor detenido")
+    finally:
+        servidor.httpd.server_close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,193 @@
+"""
+Persistencia cifrada de las cookies de sesión del sistema SAÓ FCT
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Dict, List
+
+from cryptography.fernet import Fernet, InvalidToken
+
+from configuracion import BASE_URL_SAO
+
+
+ARCHIVO_COOKIES = ".sao_cookies.enc"
+
+logger = logging.getLogger(__name__)
+
+
+class AlmacenCookies:
+    """Guarda y restaura las cookies autenticadas en un archivo cifrado"""
+
+    def __init__(self, usuario: str, password: str, archivo: str = ARCHIVO_COOKIES,
+                 caducidad_horas: float = 8.0):
+        """
+        Inicializa el almacén de cookies
+
+        Args:
+            usuario: Usuario de SAÓ (se usa como sal de la clave)
+            password: Contraseña de SAÓ (origen de la clave si no hay SAO_COOKIES_KEY)
+            archivo: Ruta del archivo cifrado
+            caducidad_horas: Antigüedad máxima de las cookies guardadas
+        """
+        self.archivo = archivo
+        self.caducidad_segundos = caducidad_horas * 3600
+        self.fernet = Fernet(self._derivar_clave(usuario, password))
+
+    @staticmethod
+    def _derivar_clave(usuario: str, password: str) -> bytes:
+        """Obtiene la clave Fernet de SAO_COOKIES_KEY o la deriva de las credenciales"""
+        clave = os.getenv('SAO_COOKIES_KEY')
+        if clave:
+            return clave.encode('utf-8')
+
+        derivada = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'),
+                                       f"sao-cookies:{usuario}".encode('utf-8'), 200_000)
+        return base64.urlsafe_b64encode(derivada)
+
+    def guardar(self, cookies: List[Dict]) -> None:
+        """
+        Cifra y guarda las cookies tras un login correcto
+
+        Args:
+            cookies: Cookies tal y como las devuelve driver.get_cookies()
+        """
+        try:
+            contenido = json.dumps({"guardado": time.time(), "cookies": cookies}).encode('utf-8')
+            temporal = f"{self.archivo}.tmp"
+
+            with open(temporal, 'wb') as f:
+                f.write(self.fernet.encrypt(contenido))
+            os.chmod(temporal, 0o600)
+            os.replace(temporal, self.archivo)
+
+            logger.info(f"Cookies de sesión guardadas ({len(cookies)} cookies)")
+
+        except Exception as e:
+            logger.warning(f"Error guardando cookies de sesión: {e}")
+
+    def cargar(self) -> List[Dict]:
+        """
+        Descifra las cookies guardadas
+
+        Returns:
+            List[Dict]: Cookies guardadas o lista vacía si no hay o han caducado
+        """
+        if not os.path.exists(self.archivo):
+            return []
+
+        try:
+            with open(self.archivo, 'rb') as f:
+                datos = json.loads(self.fernet.decrypt(f.read()))
+
+            if time.time() - datos.get('guardado', 0) > self.caducidad_segundos:
+                logger.info("Cookies de sesión caducadas, se descartan")
+                return []
+
+            return datos.get('cookies', [])
+
+        except InvalidToken:
+            logger.warning("No se pudieron descifrar las cookies (clave distinta), se descartan")
+            return []
+        except Exception as e:
+            logger.warning(f"Error cargando cookies de sesión: {e}")
+            return []
+
+    def borrar(self) -> None:
+        """Elimina el archivo de cookies (p. ej. cuando el servidor las rechaza)"""
+        try:
+            if os.path.exists(self.archivo):
+                os.remove(self.archivo)
+        except Exception as e:
+            logger.warning(f"Error borrando cookies de sesión: {e}")
+
+    def restaurar_en_driver(self, driver, base_url: str = BASE_URL_SAO) -> bool:
+        """
+        Inyecta las cookies guardadas en un WebDriver y comprueba que siguen siendo válidas
+
+        Args:
+            driver: WebDriver recién creado
+            base_url: URL base del sistema SAÓ
+
+        Returns:
+            bool: True si la sesión quedó autenticada sin pasar por el formulario
+        """
+        cookies = self.cargar()
+        if not cookies:
+            return False
+
+        try:
+            # Las cookies solo se pueden añadir estando ya en el dominio
+            driver.get(f"{base_url}/index.php")
+            driver.delete_all_cookies()
+
+            for cookie in cookies:
+                cookie = {k: v for k, v in cookie.items() if k != 'sameSite' or v in ('Strict', 'Lax', 'None')}
+                driver.add_cookie(cookie)
+
+            if sesion_autenticada(driver, base_url):
+                return True
+
+            logger.info("Cookies guardadas rechazadas por el servidor")
+            self.borrar()
+            return False
+
+        except Exception as e:
+            logger.warning(f"Error restaurando cookies en el navegador: {e}")
+            return False
+
+    def aplicar_a_sesion_http(self, sesion, base_url: str = BASE_URL_SAO) -> bool:
+        """
+        Copia las cookies guardadas a una sesión HTTP (interfaz de requests.Session)
+
+        Args:
+            sesion: Objeto con la interfaz de requests.Session (cookies.set y get)
+            base_url: URL base del sistema SAÓ
+
+        Returns:
+            bool: True si las cookies se aplicaron y el servidor las acepta
+        """
+        cookies = self.cargar()
+        if not cookies:
+            return False
+
+        dominio_defecto = base_url.split('://', 1)[-1].split('/', 1)[0].split(':', 1)[0]
+
+        try:
+            for cookie in cookies:
+                sesion.cookies.set(cookie['name'], cookie['value'],
+                                   domain=cookie.get('domain') or dominio_defecto,
+                                   path=cookie.get('path', '/'))
+
+            respuesta = sesion.get(f"{base_url}/index.php?op=4&subop=0")
+            if 'name="password"' not in respuesta.text:
+                return True
+
+            logger.info("Cookies guardadas rechazadas por el servidor")
+            self.borrar()
+            return False
+
+        except Exception as e:
+            logger.warning(f"Error aplicando cookies a la sesión HTTP: {e}")
+            return False
+
+
+def sesion_autenticada(driver, base_url: str = BASE_URL_SAO) -> bool:
+    """
+    Comprueba si el navegador tiene una sesión válida cargando el listado
+
+    Args:
+        driver: WebDriver a comprobar
+        base_url: URL base del sistema SAÓ
+
+    Returns:
+        bool: True si el listado se muestra sin formulario de login
+    """
+    driver.get(f"{base_url}/index.php?op=4&subop=0")
+
+    # execute_script no sufre la espera implícita de find_elements cuando el campo no existe
+    campos_password = driver.execute_script("return document.getElementsByName('password').length")
+    return campos_password == 0
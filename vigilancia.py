@@ -0,0 +1,170 @@
+"""
+Timeouts de los comandos WebDriver y vigilante de navegadores colgados
+
+Los timeouts acotan cada comando por separado (carga de página, scripts y la
+respuesta HTTP del driver). El vigilante cubre lo que se les escapa: un hilo
+comprueba que el RegistroTiempos del scraper sigue avanzando y, si pasan
+SAO_VIGILANTE_SEGUNDOS sin registrar ninguna etapa, mata el árbol de procesos
+del driver. El comando bloqueado falla de inmediato y el scraper reinicia el
+navegador y repite la empresa en curso.
+"""
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+import psutil
+
+from configuracion import obtener_limite_vigilante, obtener_timeouts
+from instrumentacion import RegistroTiempos
+
+
+logger = logging.getLogger(__name__)
+
+
+def aplicar_timeouts(driver) -> None:
+    """
+    Fija los timeouts de carga de página, de scripts y de respuesta del driver
+
+    Args:
+        driver: WebDriver recién creado
+    """
+    pagina, script, comando = obtener_timeouts()
+    driver.set_page_load_timeout(pagina)
+    driver.set_script_timeout(script)
+    try:
+        # Sin este timeout una petición al driver que no responde espera indefinidamente
+        driver.command_executor.set_timeout(comando)
+    except Exception as e:
+        logger.warning(f"No se pudo fijar el timeout de los comandos WebDriver: {e}")
+
+
+def matar_arbol_procesos(pid: int) -> int:
+    """
+    Mata un proceso y todos sus descendientes
+
+    Args:
+        pid: Proceso raíz (geckodriver/chromedriver)
+
+    Returns:
+        int: Número de procesos terminados
+    """
+    try:
+        raiz = psutil.Process(pid)
+        procesos = raiz.children(recursive=True) + [raiz]
+    except psutil.Error:
+        return 0
+
+    for proceso in procesos:
+        try:
+            proceso.kill()
+        except psutil.Error:
+            pass
+    _, vivos = psutil.wait_procs(procesos, timeout=10)
+    return len(procesos) - len(vivos)
+
+
+class Vigilante:
+    """Mata el navegador cuando el scraping deja de avanzar"""
+
+    def __init__(self, tiempos: RegistroTiempos, obtener_driver: Callable, limite: float = 300.0):
+        """
+        Inicializa el vigilante
+
+        Args:
+            tiempos: RegistroTiempos del scraper (cada etapa registrada cuenta como progreso)
+            obtener_driver: Devuelve el WebDriver actual
+            limite: Segundos sin progreso antes de matar el navegador (0 lo desactiva)
+        """
+        self.tiempos = tiempos
+        self.obtener_driver = obtener_driver
+        self.limite = limite
+
+        self._registros = -1
+        self._ultimo_progreso = time.monotonic()
+        self._disparado = threading.Event()
+        self._parar = threading.Event()
+        self._hilo: Optional[threading.Thread] = None
+
+    @classmethod
+    def desde_entorno(cls, tiempos: RegistroTiempos, obtener_driver: Callable) -> 'Vigilante':
+        """
+        Crea el vigilante con el límite configurado en el entorno y lo arranca
+
+        Args:
+            tiempos: RegistroTiempos del scraper
+            obtener_driver: Devuelve el WebDriver actual
+        """
+        return cls(tiempos, obtener_driver, limite=obtener_limite_vigilante()).iniciar()
+
+    def _registros_totales(self) -> int:
+        """Etapas registradas hasta ahora en el RegistroTiempos"""
+        return sum(h.n for h in list(self.tiempos.histogramas.values()))
+
+    def comprobar(self) -> bool:
+        """
+        Comprueba si ha habido progreso y mata el navegador si lleva demasiado sin haberlo
+
+        Returns:
+            bool: True si se ha matado el navegador
+        """
+        ahora = time.monotonic()
+        registros = self._registros_totales()
+        if registros != self._registros:
+            self._registros = registros
+            self._ultimo_progreso = ahora
+            return False
+
+        parado = ahora - self._ultimo_progreso
+        if parado < self.limite:
+            return False
+
+        try:
+            driver = self.obtener_driver()
+            proceso = driver.service.process if driver else None
+        except Exception:
+            proceso = None
+        if proceso is None or proceso.poll() is not None:
+            return False
+
+        terminados = matar_arbol_procesos(proceso.pid)
+        logger.warning(f"Vigilante: {parado:.0f}s sin progreso, navegador colgado terminado "
+                       f"({terminados} procesos)")
+        self.tiempos.registrar("vigilante", parado)
+        self._disparado.set()
+        self._ultimo_progreso = ahora
+        return True
+
+    def atender(self) -> bool:
+        """
+        Indica si el vigilante ha matado el navegador desde la última llamada
+
+        Returns:
+            bool: True si hay que reiniciar el navegador
+        """
+        if self._disparado.is_set():
+            self._disparado.clear()
+            return True
+        return False
+
+    def _bucle(self) -> None:
+        """Comprueba el progreso periódicamente hasta que se detiene el vigilante"""
+        while not self._parar.wait(min(10.0, self.limite / 4)):
+            try:
+                self.comprobar()
+            except Exception as e:
+                logger.warning(f"Error en el vigilante del navegador: {e}")
+
+    def iniciar(self) -> 'Vigilante':
+        """Arranca el hilo del vigilante, si el límite no es 0"""
+        if self.limite > 0:
+            self._hilo = threading.Thread(target=self._bucle, name="vigilante", daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        """Detiene el hilo del vigilante"""
+        self._parar.set()
+        if self._hilo:
+            self._hilo.join(timeout=5)
+            self._hilo = None